@@ -3,26 +3,45 @@ import logging
 from flask import Flask
 from app.config import config
 from app.extensions import db, login_manager, migrate, csrf
+from app.generations import init_generations, reset as reset_generations
 from app.models import User
+from app.utils.assets import init_assets
+from app.utils.compression import init_compression
+from app.utils.fragment_cache import init_fragment_cache
+from app.utils.ids import UUIDStringConverter, parse_uuid
+from app.utils.log_queue import start_logging, restart_after_fork
+from app.utils.metrics import init_metrics
 
 
 def setup_logging(app):
     log_level = getattr(logging, app.config.get("LOG_LEVEL", "INFO"))
-    log_file = app.config.get("LOG_FILE", "app.log")
 
-    logging.basicConfig(
+    start_logging(
         level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        handlers=[logging.FileHandler(log_file), logging.StreamHandler()],
+        log_file=app.config.get("LOG_FILE", "app.log"),
+        log_format=app.config.get("LOG_FORMAT", "json"),
+        max_bytes=app.config.get("LOG_MAX_BYTES", 10 * 1024 * 1024),
+        backup_count=app.config.get("LOG_BACKUP_COUNT", 5),
+        queue_size=app.config.get("LOG_QUEUE_SIZE", 10000),
     )
 
     app.logger.setLevel(log_level)
     return app.logger
 
 
+def reinit_after_fork(app):
+    """Reset per-process state inherited from a preloading parent process."""
+    restart_after_fork()
+    reset_generations()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
 def create_app(config_name="default"):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.url_map.converters["uuid_str"] = UUIDStringConverter
 
     setup_logging(app)
 
@@ -30,10 +49,16 @@ def create_app(config_name="default"):
     login_manager.init_app(app)
     migrate.init_app(app, db)
     csrf.init_app(app)
+    init_metrics(app)
+    init_generations(app)
+    init_compression(app)
+    init_assets(app)
+    init_fragment_cache(app)
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(user_id)
+        user_id = parse_uuid(user_id)
+        return User.query.get(user_id) if user_id else None
 
     from app.auth import auth as auth_blueprint
 
@@ -47,14 +72,52 @@ def create_app(config_name="default"):
 
     app.register_blueprint(tags_blueprint, url_prefix="/tags")
 
+    from app.api import api as api_blueprint
+
+    # Token-authenticated, so form CSRF tokens do not apply.
+    csrf.exempt(api_blueprint)
+    app.register_blueprint(api_blueprint, url_prefix="/api/v1")
+
+    from app.attachments import attachments as attachments_blueprint
+
+    app.register_blueprint(attachments_blueprint, url_prefix="/attachments")
+
     from app.admin import admin as admin_blueprint
 
     app.register_blueprint(admin_blueprint, url_prefix="/admin")
 
-    from app.cli import create_admin, import_files, import_onenote
+    from app.cli import (
+        create_admin,
+        import_files,
+        import_onenote,
+        import_bundle,
+        sync_users,
+        compact_revisions,
+        archive_sweep,
+        merge_tags,
+        export,
+        worker,
+        reindex_search,
+        rebuild_related,
+        find_duplicates,
+        create_api_token,
+        revoke_api_token,
+    )
 
     app.cli.add_command(create_admin)
     app.cli.add_command(import_files)
     app.cli.add_command(import_onenote)
+    app.cli.add_command(import_bundle)
+    app.cli.add_command(sync_users)
+    app.cli.add_command(compact_revisions)
+    app.cli.add_command(archive_sweep)
+    app.cli.add_command(merge_tags)
+    app.cli.add_command(export)
+    app.cli.add_command(worker)
+    app.cli.add_command(reindex_search)
+    app.cli.add_command(rebuild_related)
+    app.cli.add_command(find_duplicates)
+    app.cli.add_command(create_api_token)
+    app.cli.add_command(revoke_api_token)
 
     return app
@@ -1,6 +1,6 @@
 # file: app/admin/forms.py
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField
+from wtforms import StringField, PasswordField, BooleanField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Email, Length
 
 
@@ -18,3 +18,10 @@ class UserForm(FlaskForm):
 class ResetPasswordForm(FlaskForm):
     password = PasswordField("New Password", validators=[DataRequired(), Length(min=6)])
     submit = SubmitField("Reset Password")
+
+
+class BulkUserForm(FlaskForm):
+    action = SelectField(
+        "Action", choices=[("deactivate", "Deactivate"), ("activate", "Activate")]
+    )
+    submit = SubmitField("Apply to selected users")
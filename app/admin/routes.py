@@ -1,10 +1,32 @@
 # file: app/admin/routes.py
-from flask import render_template, redirect, url_for, flash, request, abort
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from flask import (
+    current_app,
+    render_template,
+    redirect,
+    url_for,
+    flash,
+    request,
+    abort,
+    Response,
+    stream_with_context,
+)
 from flask_login import login_required, current_user
 from app.admin import admin
-from app.admin.forms import UserForm, ResetPasswordForm
+from app.admin.forms import BulkUserForm, UserForm, ResetPasswordForm
 from app.extensions import db
 from app.models import User
+from app.export import (
+    ARCHIVED_CHOICES,
+    export_query,
+    iter_jsonl,
+    iter_markdown_zip,
+    parse_since,
+)
+from app.jobs import render_queue_metrics
+from app.utils.ids import parse_uuid
+from app.utils.metrics import render_prometheus
 
 
 def admin_required():
@@ -17,8 +39,67 @@ def admin_required():
 def users():
     admin_required()
 
-    all_users = User.query.order_by(User.created_at.desc()).all()
-    return render_template("admin/users.html", users=all_users)
+    search = request.args.get("q", "").strip()
+    status = request.args.get("status", "all")
+    page = request.args.get("page", 1, type=int)
+
+    query = User.query
+    if search:
+        # Prefix matches, so the lower(email) and lower(display_name)
+        # indexes can serve them.
+        escaped = search.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        prefix = f"{escaped}%"
+        query = query.filter(
+            sa.or_(
+                sa.func.lower(User.email).like(prefix, escape="\\"),
+                sa.func.lower(User.display_name).like(prefix, escape="\\"),
+            )
+        )
+    if status == "active":
+        query = query.filter(User.is_active.is_(True))
+    elif status == "inactive":
+        query = query.filter(User.is_active.isnot(True))
+
+    pagination = query.order_by(User.created_at.desc(), User.id.desc()).paginate(
+        page=page,
+        per_page=current_app.config["ADMIN_USERS_PER_PAGE"],
+        error_out=False,
+    )
+    return render_template(
+        "admin/users.html",
+        pagination=pagination,
+        search=search,
+        status=status,
+        bulk_form=BulkUserForm(),
+    )
+
+
+@admin.route("/users/bulk", methods=["POST"])
+@login_required
+def bulk_users():
+    admin_required()
+
+    # The list filters travel in the query string, the selection in the form.
+    back = url_for("admin.users", **request.args)
+    form = BulkUserForm()
+    user_ids = {parse_uuid(value) for value in request.form.getlist("user_ids")}
+    user_ids.discard(None)
+    # Admins cannot lock themselves out.
+    user_ids.discard(current_user.id)
+    if not form.validate_on_submit() or not user_ids:
+        flash("Select some users and an action.", "warning")
+        return redirect(back)
+
+    active = form.action.data == "activate"
+    changed = db.session.execute(
+        sa.update(User)
+        .where(User.id.in_(user_ids), User.is_active.is_distinct_from(active))
+        .values(is_active=active),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.session.commit()
+    flash(f"{form.action.data.capitalize()}d {changed} user(s).", "success")
+    return redirect(back)
 
 
 @admin.route("/users/new", methods=["GET", "POST"])
@@ -49,7 +130,7 @@ def new_user():
     return render_template("admin/user_new.html", form=form)
 
 
-@admin.route("/users/<user_id>/deactivate", methods=["POST"])
+@admin.route("/users/<uuid_str:user_id>/deactivate", methods=["POST"])
 @login_required
 def deactivate_user(user_id):
     admin_required()
@@ -66,7 +147,7 @@ def deactivate_user(user_id):
     return redirect(url_for("admin.users"))
 
 
-@admin.route("/users/<user_id>/activate", methods=["POST"])
+@admin.route("/users/<uuid_str:user_id>/activate", methods=["POST"])
 @login_required
 def activate_user(user_id):
     admin_required()
@@ -78,7 +159,9 @@ def activate_user(user_id):
     return redirect(url_for("admin.users"))
 
 
-@admin.route("/users/<user_id>/reset-password", methods=["GET", "POST"])
+@admin.route(
+    "/users/<uuid_str:user_id>/reset-password", methods=["GET", "POST"]
+)
 @login_required
 def reset_password(user_id):
     admin_required()
@@ -93,3 +176,51 @@ def reset_password(user_id):
         return redirect(url_for("admin.users"))
 
     return render_template("admin/user_edit.html", form=form, user=user)
+
+
+@admin.route("/metrics")
+@login_required
+def metrics():
+    admin_required()
+
+    body = render_prometheus() + render_queue_metrics()
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
+@admin.route("/export")
+@login_required
+def export():
+    admin_required()
+
+    export_format = request.args.get("format", "jsonl")
+    tags = request.args.getlist("tag")
+    archived = request.args.get("archived", "exclude")
+    if export_format not in ("jsonl", "markdown") or archived not in ARCHIVED_CHOICES:
+        abort(400)
+    try:
+        since = parse_since(request.args.get("updated_since"))
+    except ValueError:
+        abort(400)
+
+    query = export_query(tags=tags, updated_since=since, archived=archived)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+
+    if export_format == "markdown":
+        body = iter_markdown_zip(query)
+        mimetype = "application/zip"
+        filename = f"notes-{stamp}.zip"
+    else:
+        filters = {
+            "tags": tags,
+            "updated_since": since.isoformat() if since else None,
+            "archived": archived,
+        }
+        body = iter_jsonl(query, filters)
+        mimetype = "application/x-ndjson"
+        filename = f"notes-{stamp}.jsonl"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
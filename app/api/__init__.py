@@ -0,0 +1,6 @@
+# file: app/api/__init__.py
+from flask import Blueprint
+
+api = Blueprint("api", __name__)
+
+from app.api import routes
@@ -0,0 +1,300 @@
+# file: app/api/routes.py
+"""JSON API, version 1.
+
+Every request needs ``Authorization: Bearer <token>`` (``flask
+create-api-token``). Each endpoint runs a fixed number of SQL statements
+whatever the page or batch size; tests/test_api.py checks this.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+import sqlalchemy as sa
+from flask import g, jsonify, request
+from werkzeug.exceptions import HTTPException
+
+from app.api import api
+from app.api.writes import ApiError, save_notes
+from app.extensions import db
+from app.models import ApiToken, Note, Tag, User, note_tags
+from app.notes.query import SORT_MODES, NoteFilters
+from app.utils.ids import parse_uuid
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_BATCH = 200
+
+COLUMNS = {
+    "id": Note.id,
+    "title": Note.title,
+    "summary": Note.summary,
+    "body": Note.body,
+    "source": Note.source,
+    "is_archived": Note.is_archived,
+    "tags": Note.tag_ids,
+    "created_at": Note.created_at,
+    "updated_at": Note.updated_at,
+    "created_by_id": Note.created_by_id,
+    "updated_by_id": Note.updated_by_id,
+    "version": Note.version,
+}
+LIST_FIELDS = [name for name in COLUMNS if name != "body"]
+
+
+@api.errorhandler(ApiError)
+def api_error(error):
+    payload = {"error": error.message}
+    if error.details:
+        payload["details"] = error.details
+    response = jsonify(payload)
+    response.status_code = error.status
+    if error.status == 401:
+        response.headers["WWW-Authenticate"] = "Bearer"
+    return response
+
+
+@api.errorhandler(HTTPException)
+def http_error(error):
+    response = jsonify({"error": error.description})
+    response.status_code = error.code
+    return response
+
+
+@api.before_request
+def authenticate():
+    scheme, _, secret = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secret.strip():
+        raise ApiError(401, "Missing bearer token")
+    user = db.session.execute(
+        sa.select(User)
+        .join(ApiToken, ApiToken.user_id == User.id)
+        .where(ApiToken.token_hash == ApiToken.hash(secret.strip()), User.is_active.is_(True))
+    ).scalar_one_or_none()
+    if user is None:
+        raise ApiError(401, "Invalid token")
+    g.api_user = user
+
+
+def _fields(default):
+    """The fields named by ``?fields=a,b`` (always with ``id``), or ``default``."""
+    raw = request.args.get("fields")
+    if not raw:
+        return default
+    names = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(COLUMNS))
+    if unknown:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown)}")
+    return ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
+
+
+def _serialize(rows, fields):
+    """Rows (mappings) as JSON-ready dicts; one query resolves tag names."""
+    tag_names = {}
+    if "tags" in fields:
+        tag_ids = {tag_id for row in rows for tag_id in (row["tags"] or ())}
+        if tag_ids:
+            tag_names = dict(
+                db.session.execute(sa.select(Tag.id, Tag.name).where(Tag.id.in_(tag_ids))).all()
+            )
+    items = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            value = row[name]
+            if name == "tags":
+                value = sorted(tag_names[t] for t in value or () if t in tag_names)
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            item[name] = value
+        items.append(item)
+    return items
+
+
+def _saved(rows, fields):
+    return _serialize([dict(row, tags=row["tag_ids"]) for row in rows], fields)
+
+
+def _select(fields):
+    return db.session.query(*[COLUMNS[name].label(name) for name in fields])
+
+
+def _encode_cursor(payload):
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise ApiError(400, "Invalid cursor")
+    if not isinstance(payload, dict):
+        raise ApiError(400, "Invalid cursor")
+    return payload
+
+
+def _limit():
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "limit must be a number")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _list_notes(filters):
+    """One page of ``filters``, continued from ``?cursor=``.
+
+    Sorted lists page by keyset on the sort mode's ``(key, id)`` index;
+    search results are ranked, so their cursor holds an offset.
+    """
+    fields = _fields(LIST_FIELDS)
+    limit = _limit()
+    cursor = request.args.get("cursor")
+    payload = _decode_cursor(cursor) if cursor else {}
+
+    query = filters.apply(_select(fields))
+    offset = 0
+    if filters.query:
+        offset = payload.get("offset", 0)
+        if not isinstance(offset, int) or offset < 0:
+            raise ApiError(400, "Invalid cursor")
+        query = filters.order(query).offset(offset)
+    else:
+        mode = SORT_MODES[filters.sort]
+        key = mode.key(Note)
+        query = query.add_columns(key.label("sort_key")).order_by(*mode.order_by())
+        if payload:
+            last_id = parse_uuid(payload.get("id"))
+            if payload.get("sort") != filters.sort or last_id is None:
+                raise ApiError(400, "Cursor does not match sort")
+            last_key = payload.get("key")
+            if payload.get("datetime"):
+                try:
+                    last_key = datetime.fromisoformat(last_key)
+                except (TypeError, ValueError):
+                    raise ApiError(400, "Invalid cursor")
+            position = sa.tuple_(
+                sa.bindparam("last_key", last_key, type_=key.type),
+                sa.bindparam("last_id", last_id, type_=Note.id.type),
+            )
+            after = sa.tuple_(key, Note.id)
+            query = query.filter(after < position if mode.descending else after > position)
+
+    rows = [row._mapping for row in query.limit(limit + 1)]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if filters.query:
+            next_cursor = _encode_cursor({"offset": offset + limit})
+        else:
+            last_key = last["sort_key"]
+            next_cursor = _encode_cursor(
+                {
+                    "sort": filters.sort,
+                    "key": last_key.isoformat() if isinstance(last_key, datetime) else last_key,
+                    "datetime": isinstance(last_key, datetime),
+                    "id": last["id"],
+                }
+            )
+    return jsonify({"data": _serialize(rows, fields), "next_cursor": next_cursor})
+
+
+@api.route("/notes", methods=["GET"])
+def list_notes():
+    """Notes filtered like the HTML list: ``tag``, ``q``, ``archived``, ``sort``."""
+    return _list_notes(NoteFilters.from_args(request.args))
+
+
+@api.route("/search", methods=["GET"])
+def search():
+    if not request.args.get("q", "").strip():
+        raise ApiError(400, "q is required")
+    return _list_notes(NoteFilters.from_args(request.args))
+
+
+@api.route("/notes/<uuid_str:note_id>", methods=["GET"])
+def get_note(note_id):
+    fields = _fields(list(COLUMNS))
+    row = _select(fields).filter(Note.id == note_id).first()
+    if row is None:
+        raise ApiError(404, "Note not found")
+    return jsonify({"data": _serialize([row._mapping], fields)[0]})
+
+
+@api.route("/notes/batch", methods=["GET"])
+def get_notes():
+    """Up to MAX_BATCH notes by ``?ids=a,b,c``, in the order asked for."""
+    raw = [value for value in request.args.get("ids", "").split(",") if value.strip()]
+    if len(raw) > MAX_BATCH:
+        raise ApiError(400, f"At most {MAX_BATCH} ids per request")
+    ids = [parse_uuid(value.strip()) for value in raw]
+    if None in ids:
+        raise ApiError(400, "ids must be note ids")
+    fields = _fields(list(COLUMNS))
+    found = {}
+    if ids:
+        found = {row.id: row._mapping for row in _select(fields).filter(Note.id.in_(ids))}
+    rows = [found[note_id] for note_id in dict.fromkeys(ids) if note_id in found]
+    missing = [note_id for note_id in dict.fromkeys(ids) if note_id not in found]
+    return jsonify({"data": _serialize(rows, fields), "missing": missing})
+
+
+def _json_body():
+    payload = request.get_json(silent=True)
+    if payload is None:
+        raise ApiError(400, "Expected a JSON body")
+    return payload
+
+
+def _save(creates, updates, status):
+    fields = _fields(list(COLUMNS))
+    saved = save_notes(creates, updates, g.api_user.id)
+    db.session.commit()
+    return _saved(saved, fields), status
+
+
+@api.route("/notes", methods=["POST"])
+def create_note():
+    data, status = _save([_json_body()], [], 201)
+    return jsonify({"data": data[0]}), status
+
+
+@api.route("/notes/<uuid_str:note_id>", methods=["PATCH"])
+def update_note(note_id):
+    item = _json_body()
+    if not isinstance(item, dict):
+        raise ApiError(400, "Expected a JSON object")
+    data, status = _save([], [dict(item, id=note_id)], 200)
+    return jsonify({"data": data[0]}), status
+
+
+@api.route("/notes/batch", methods=["POST"])
+def batch_notes():
+    """``{"create": [...], "update": [...]}``, applied in one transaction."""
+    payload = _json_body()
+    if not isinstance(payload, dict):
+        raise ApiError(400, "Expected a JSON object")
+    creates = payload.get("create", [])
+    updates = payload.get("update", [])
+    if not isinstance(creates, list) or not isinstance(updates, list):
+        raise ApiError(400, "create and update must be lists")
+    if len(creates) + len(updates) > MAX_BATCH:
+        raise ApiError(400, f"At most {MAX_BATCH} notes per request")
+    data, status = _save(creates, updates, 200)
+    return jsonify({"data": data}), status
+
+
+@api.route("/tags", methods=["GET"])
+def list_tags():
+    rows = db.session.execute(
+        sa.select(Tag.id, Tag.name, sa.func.count(note_tags.c.note_id))
+        .outerjoin(note_tags, note_tags.c.tag_id == Tag.id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(Tag.name)
+    )
+    return jsonify(
+        {"data": [{"id": id_, "name": name, "note_count": count} for id_, name, count in rows]}
+    )
@@ -0,0 +1,268 @@
+# file: app/api/writes.py
+"""Batched note writes for the API.
+
+``save_notes`` creates and updates any number of notes with a fixed number
+of statements: one read of the notes being updated, one of the tags (plus
+one INSERT for new tags), one bulk INSERT of notes, two UPDATEs of notes,
+the ``note_tags`` rewrite, the revision chains and their INSERT, and the
+two refresh jobs.
+
+Updates are optimistic. An update item may carry the ``version`` its client
+last saw, and the first UPDATE bumps every note's version only where it
+still matches the one read at the start. Either kind of mismatch fails the
+whole batch with a 409; nothing stays locked longer than the transaction.
+"""
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from sqlalchemy.orm import undefer
+
+from app import duplicates
+from app.attachments.store import extract_images
+from app.extensions import db
+from app.jobs import enqueue
+from app.models import Note, Tag, note_tags
+from app.revisions import record_revisions
+from app.utils.ids import parse_uuid, uuid7
+from app.utils.sections import with_sections
+
+TEXT_FIELDS = {"title": 255, "body": None, "summary": None, "source": 500}
+EDITABLE = set(TEXT_FIELDS) | {"tags", "is_archived"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+
+def _clean(item, creating):
+    """Validated field values of one create or update item, and its errors."""
+    if not isinstance(item, dict):
+        return {}, ["must be an object"]
+    errors = []
+    allowed = EDITABLE if creating else EDITABLE | {"id", "version"}
+    errors += [f"unknown field: {name}" for name in sorted(set(item) - allowed)]
+    values = {}
+    for name, max_length in TEXT_FIELDS.items():
+        if name not in item:
+            continue
+        value = item[name]
+        if value is None and name in ("summary", "source"):
+            values[name] = None
+        elif not isinstance(value, str):
+            errors.append(f"{name} must be a string")
+        elif max_length and len(value) > max_length:
+            errors.append(f"{name} is longer than {max_length} characters")
+        else:
+            values[name] = value
+    for name in ("title", "body"):
+        if name in values and not values[name].strip():
+            errors.append(f"{name} must not be empty")
+        elif creating and name not in item:
+            errors.append(f"{name} is required")
+    if "tags" in item:
+        tags = item["tags"]
+        if not isinstance(tags, list) or not all(isinstance(t, str) for t in tags):
+            errors.append("tags must be a list of strings")
+        else:
+            values["tags"] = sorted({t.strip().lower() for t in tags if t.strip()})
+    if "is_archived" in item:
+        if not isinstance(item["is_archived"], bool):
+            errors.append("is_archived must be true or false")
+        else:
+            values["is_archived"] = item["is_archived"]
+    if "version" in item:
+        version = item["version"]
+        if not isinstance(version, int) or isinstance(version, bool):
+            errors.append("version must be an integer")
+        else:
+            values["version"] = version
+    return values, errors
+
+
+def _validate(creates, updates):
+    errors = []
+    cleaned_creates, cleaned_updates = [], []
+    for index, item in enumerate(creates):
+        values, problems = _clean(item, creating=True)
+        errors += [{"create": index, "error": problem} for problem in problems]
+        cleaned_creates.append(values)
+    seen = set()
+    for index, item in enumerate(updates):
+        values, problems = _clean(item, creating=False)
+        note_id = parse_uuid(item.get("id")) if isinstance(item, dict) else None
+        if note_id is None:
+            problems.append("id must be a note id")
+        elif note_id in seen:
+            problems.append("id appears more than once")
+        seen.add(note_id)
+        errors += [{"update": index, "error": problem} for problem in problems]
+        cleaned_updates.append((note_id, values))
+    if errors:
+        raise ApiError(400, "Invalid notes", errors)
+    return cleaned_creates, cleaned_updates
+
+
+def _resolve_tags(names):
+    """Tag ids by name, creating missing tags with one INSERT."""
+    if not names:
+        return {}
+    ids = dict(db.session.execute(sa.select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+    missing = sorted(set(names) - set(ids))
+    if missing:
+        rows = db.session.execute(
+            sa.insert(Tag).returning(Tag.name, Tag.id), [{"name": name} for name in missing]
+        )
+        ids.update(rows.all())
+    return ids
+
+
+def _claim_versions(versions):
+    """Bump the notes' versions where they are still ``{id: version}``.
+
+    One conditional UPDATE; it also holds the rows for the rest of the
+    transaction. Raises a 409 when another writer got there first.
+    """
+    expected = sa.case(*[(Note.id == note_id, version) for note_id, version in versions.items()])
+    claimed = db.session.execute(
+        sa.update(Note)
+        .where(Note.id.in_(list(versions)), Note.version == expected)
+        .values(version=Note.version + 1, updated_at=Note.updated_at),
+        execution_options={"synchronize_session": False},
+    )
+    if claimed.rowcount != len(versions):
+        raise ApiError(409, "A note was changed by someone else; fetch it and retry")
+
+
+def save_notes(creates, updates, user_id):
+    """Apply ``creates`` and ``updates`` (lists of dicts). The caller commits.
+
+    Raises ApiError before writing anything when an item is invalid or an
+    update names a note that does not exist. Returns the saved notes as
+    column dicts, creates first, in request order.
+    """
+    creates, updates = _validate(creates, updates)
+    for values in creates + [values for _, values in updates]:
+        if "body" in values:
+            values["body"] = extract_images(values["body"])
+
+    update_ids = [note_id for note_id, _ in updates]
+    current = {}
+    if update_ids:
+        rows = db.session.execute(
+            sa.select(Note).options(undefer(Note.body)).where(Note.id.in_(update_ids))
+        )
+        current = {note.id: note for note in rows.scalars()}
+    missing = [
+        {"update": index, "error": "no such note"}
+        for index, note_id in enumerate(update_ids)
+        if note_id not in current
+    ]
+    if missing:
+        raise ApiError(404, "Unknown notes", missing)
+    conflicts = [
+        {"update": index, "error": "note has changed", "version": current[note_id].version}
+        for index, (note_id, values) in enumerate(updates)
+        if values.get("version", current[note_id].version) != current[note_id].version
+    ]
+    if conflicts:
+        raise ApiError(409, "Conflicting notes", conflicts)
+
+    names = {name for values in creates for name in values.get("tags", ())}
+    names |= {name for _, values in updates for name in values.get("tags", ())}
+    tag_ids_by_name = _resolve_tags(names)
+
+    now = datetime.now(timezone.utc)
+    saved, revisions, retagged, replaced = [], [], [], []
+
+    new_rows = []
+    for values in creates:
+        row = {
+            "id": uuid7(),
+            "title": values["title"],
+            "body": values["body"],
+            "summary": values.get("summary"),
+            "source": values.get("source"),
+            "is_archived": values.get("is_archived", False),
+            "tag_ids": sorted(tag_ids_by_name[name] for name in values.get("tags", ())),
+            "note_metadata": with_sections(
+                duplicates.with_signature({}, duplicates.body_signature(values["body"])),
+                values["body"],
+            ),
+            "created_by_id": user_id,
+            "updated_by_id": user_id,
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+        }
+        new_rows.append(row)
+        revisions.append((row["id"], row["title"], row["body"], None))
+        retagged.append(row)
+        saved.append(row)
+
+    update_rows = []
+    for note_id, values in updates:
+        note = current[note_id]
+        row = {
+            "id": note_id,
+            "title": values.get("title", note.title),
+            "body": values.get("body", note.body),
+            "summary": values.get("summary", note.summary),
+            "source": values.get("source", note.source),
+            "is_archived": values.get("is_archived", note.is_archived),
+            "tag_ids": note.tag_ids or [],
+            "note_metadata": note.note_metadata,
+            "updated_by_id": user_id,
+            "updated_at": now,
+        }
+        if "tags" in values:
+            row["tag_ids"] = sorted(tag_ids_by_name[name] for name in values["tags"])
+            retagged.append(row)
+            replaced.append(note_id)
+        if "body" in values:
+            row["note_metadata"] = with_sections(
+                duplicates.with_signature(
+                    note.note_metadata, duplicates.body_signature(row["body"])
+                ),
+                row["body"],
+            )
+        update_rows.append(row)
+        before = (note.title, note.body, note.updated_by_id, note.updated_at)
+        revisions.append((note_id, row["title"], row["body"], before))
+        saved.append(
+            dict(
+                row,
+                created_by_id=note.created_by_id,
+                created_at=note.created_at,
+                version=note.version + 1,
+            )
+        )
+
+    if new_rows:
+        db.session.execute(sa.insert(Note), new_rows)
+    if update_rows:
+        _claim_versions({note_id: note.version for note_id, note in current.items()})
+        table = Note.__table__
+        db.session.execute(
+            table.update().where(table.c.id == sa.bindparam("note_id")),
+            [
+                dict({k: v for k, v in row.items() if k != "id"}, note_id=row["id"])
+                for row in update_rows
+            ],
+        )
+    if replaced:
+        db.session.execute(note_tags.delete().where(note_tags.c.note_id.in_(replaced)))
+    pairs = [
+        {"note_id": row["id"], "tag_id": tag_id} for row in retagged for tag_id in row["tag_ids"]
+    ]
+    if pairs:
+        db.session.execute(note_tags.insert(), pairs)
+    record_revisions(revisions, user_id, now)
+
+    note_ids = [row["id"] for row in saved]
+    enqueue("notes.refresh_search", {"note_ids": note_ids})
+    enqueue("notes.refresh_related", {"note_ids": note_ids})
+    return saved
@@ -0,0 +1,117 @@
+# file: app/archive.py
+"""Archive table mode.
+
+With ``NOTES_ARCHIVE_TABLE`` set, ``flask archive-sweep`` moves notes that
+have been archived for ``ARCHIVE_AFTER_DAYS`` out of ``notes`` into
+``notes_archive``, and their revisions into ``note_revisions_archive``. The
+hot table and its indexes then hold only the active set plus recently
+archived notes. The list page reads the archive only when archived notes are
+requested, and unarchiving a swept note moves it back.
+"""
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy as sa
+from flask import abort, current_app
+
+from app.extensions import db
+from app.models import (
+    ArchivedNote,
+    Note,
+    NoteRevision,
+    Tag,
+    note_revisions_archive,
+    note_tags,
+)
+
+
+def enabled():
+    return current_app.config.get("NOTES_ARCHIVE_TABLE", False)
+
+
+def _copy(source, target, condition):
+    names = [column.name for column in source.columns]
+    db.session.execute(
+        sa.insert(target).from_select(
+            names, sa.select(*[source.c[name] for name in names]).where(condition)
+        )
+    )
+    db.session.execute(sa.delete(source).where(condition))
+
+
+def sweep(older_than_days=None, batch_size=1000):
+    """Move archived notes not updated for ``older_than_days`` to the archive.
+
+    Commits after each batch and returns the number of notes moved.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config["ARCHIVE_AFTER_DAYS"]
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+    moved = 0
+    while True:
+        note_ids = (
+            db.session.execute(
+                sa.select(Note.id)
+                .where(Note.is_archived.is_(True), Note.updated_at < cutoff)
+                .limit(batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if not note_ids:
+            break
+
+        # tag_ids travels with the row; note_tags is rebuilt on restore.
+        db.session.execute(note_tags.delete().where(note_tags.c.note_id.in_(note_ids)))
+        _copy(
+            NoteRevision.__table__,
+            note_revisions_archive,
+            NoteRevision.__table__.c.note_id.in_(note_ids),
+        )
+        _copy(Note.__table__, ArchivedNote.__table__, Note.__table__.c.id.in_(note_ids))
+        db.session.commit()
+        moved += len(note_ids)
+    return moved
+
+
+def restore(note_id):
+    """Move a swept note back into ``notes``. The caller commits.
+
+    Returns the restored Note, still flagged as archived, or None when the
+    archive has no such note. Tags deleted since the sweep are dropped.
+    """
+    archived = db.session.get(ArchivedNote, note_id)
+    if archived is None:
+        return None
+    tag_ids = list(archived.tag_ids or [])
+    db.session.expunge(archived)
+
+    _copy(
+        ArchivedNote.__table__, Note.__table__, ArchivedNote.__table__.c.id == note_id
+    )
+    _copy(
+        note_revisions_archive,
+        NoteRevision.__table__,
+        note_revisions_archive.c.note_id == note_id,
+    )
+    if tag_ids:
+        db.session.execute(
+            sa.insert(note_tags).from_select(
+                ["note_id", "tag_id"],
+                sa.select(sa.literal(note_id, Note.id.type), Tag.id).where(
+                    Tag.id.in_(tag_ids)
+                ),
+            )
+        )
+    Note.refresh_tag_ids([note_id])
+    return db.session.get(Note, note_id)
+
+
+def get_or_404(note_id):
+    """Look a note up in ``notes``, then in the archive when the mode is on."""
+    note = db.session.get(Note, note_id)
+    if note is None and enabled():
+        note = db.session.get(ArchivedNote, note_id)
+    if note is None:
+        abort(404)
+    return note
@@ -0,0 +1,6 @@
+# file: app/attachments/__init__.py
+from flask import Blueprint
+
+attachments = Blueprint("attachments", __name__)
+
+from app.attachments import routes
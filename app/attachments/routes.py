@@ -0,0 +1,29 @@
+# file: app/attachments/routes.py
+from flask import abort, request, send_file
+from flask_login import login_required
+
+from app.attachments import attachments
+from app.attachments.store import DIGEST, TYPES, current_store
+
+# A digest names its content for good, so clients may keep it for a year.
+MAX_AGE = 365 * 24 * 3600
+
+
+@attachments.route("/<digest>.<ext>", methods=["GET"])
+@login_required
+def get(digest, ext):
+    if not DIGEST.fullmatch(digest) or ext not in TYPES:
+        abort(404)
+    store = current_store()
+    if not store.exists(digest):
+        abort(404)
+
+    response = send_file(
+        store.open(digest), mimetype=TYPES[ext], etag=digest, conditional=False
+    )
+    # Ranges and If-None-Match, whatever the backend: it only has to say
+    # how long the file is.
+    response.make_conditional(request, accept_ranges=True, complete_length=store.size(digest))
+    response.headers["Cache-Control"] = f"private, max-age={MAX_AGE}, immutable"
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    return response
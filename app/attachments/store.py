@@ -0,0 +1,146 @@
+# file: app/attachments/store.py
+"""Content-addressed storage of images referenced by note bodies.
+
+An attachment is stored once under the SHA-256 of its bytes, whichever
+notes use it, and is served from ``/attachments/<sha256>.<ext>``. The URL
+names the content, so it never changes meaning and can be cached forever.
+
+Where the bytes live is up to a backend chosen by ``ATTACHMENT_STORE_URL``.
+``file://<dir>`` keeps them on the local filesystem; other schemes can be
+added with ``register_backend``. A backend provides ``exists``, ``put``,
+``open`` (a seekable binary file) and ``size``, all keyed by the digest.
+"""
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = "/attachments/"
+
+# Types accepted, recognised by their leading bytes rather than by what the
+# uploader claims. SVG is left out: it can carry script.
+TYPES = {"png": "image/png", "jpg": "image/jpeg", "gif": "image/gif", "webp": "image/webp"}
+
+DIGEST = re.compile(r"[0-9a-f]{64}")
+# A base64 ``data:`` URI of an image, in Markdown ``![](...)`` or an HTML src.
+DATA_URI = re.compile(r"data:image/[a-zA-Z0-9.+-]+;base64,([A-Za-z0-9+/\s]+=*)")
+
+
+def sniff(data):
+    """The extension of the image type ``data`` holds, or None."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+class FileStore:
+    """Attachments as files under ``root``, fanned out by digest prefix."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self._path(digest))
+
+    def put(self, digest, data):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so readers never see a partial file.
+        # Concurrent writers of one digest write the same bytes.
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.unlink(temp)
+            raise
+
+    def open(self, digest):
+        return open(self._path(digest), "rb")
+
+    def size(self, digest):
+        return os.path.getsize(self._path(digest))
+
+
+def _file_store(location, app):
+    return FileStore(os.path.join(app.instance_path, location))
+
+
+BACKENDS = {"file": _file_store}
+
+
+def register_backend(scheme, factory):
+    """Make ``<scheme>://<location>`` URLs build ``factory(location, app)``."""
+    BACKENDS[scheme] = factory
+
+
+def current_store():
+    """The backend named by the app's ``ATTACHMENT_STORE_URL``."""
+    app = current_app._get_current_object()
+    url = app.config.get("ATTACHMENT_STORE_URL", "file://attachments")
+    cached = app.extensions.get("attachment_store")
+    if cached is None or cached[0] != url:
+        scheme, _, location = url.partition("://")
+        if scheme not in BACKENDS:
+            raise ValueError(f"Unknown ATTACHMENT_STORE_URL: {url}")
+        cached = (url, BACKENDS[scheme](location, app))
+        app.extensions["attachment_store"] = cached
+    return cached[1]
+
+
+def save(data, write=True):
+    """Store image bytes once; their URL, or None if they are not an image.
+
+    With ``write=False`` only the URL is worked out, e.g. for a dry run.
+    """
+    ext = sniff(data)
+    if ext is None:
+        return None
+    digest = hashlib.sha256(data).hexdigest()
+    if write:
+        store = current_store()
+        if not store.exists(digest):
+            store.put(digest, data)
+    return f"{URL_PREFIX}{digest}.{ext}"
+
+
+def extract_images(text, write=True):
+    """``text`` with its base64 data URI images stored and linked instead.
+
+    Images that fail to decode, are not a known type or are larger than
+    ``ATTACHMENT_MAX_BYTES`` are left where they are.
+    """
+    if not text or "data:image/" not in text:
+        return text
+    max_bytes = current_app.config.get("ATTACHMENT_MAX_BYTES", 20 * 1024 * 1024)
+
+    def replace(match):
+        encoded = re.sub(r"\s+", "", match.group(1))
+        if len(encoded) * 3 // 4 > max_bytes:
+            logger.warning("Left an inline image of %d bytes in place", len(encoded) * 3 // 4)
+            return match.group(0)
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+        return save(data, write) or match.group(0)
+
+    return DATA_URI.sub(replace, text)
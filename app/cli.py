@@ -1,11 +1,22 @@
 # file: app/cli.py
+import gzip
+import json
+import sys
 import click
-from app import create_app
+from flask.cli import FlaskGroup
 from app.extensions import db
 from app.models import User
 
 
-@click.group()
+def _create_app():
+    from app import create_app
+
+    return create_app()
+
+
+# FlaskGroup commands run inside the app the ``flask`` CLI already loaded; the
+# group only builds one itself when run directly (``python -m app.cli``).
+@click.group(cls=FlaskGroup, create_app=_create_app, add_default_commands=False)
 def cli():
     """Support Notes KB CLI commands."""
     pass
@@ -17,24 +28,21 @@ def cli():
 @click.option("--password", required=True, help="Admin password")
 def create_admin(email, name, password):
     """Create or update an admin user."""
-    app = create_app()
+    user = User.query.filter_by(email=email).first()
 
-    with app.app_context():
-        user = User.query.filter_by(email=email).first()
+    if user:
+        user.display_name = name
+        user.set_password(password)
+        user.is_admin = True
+        user.is_active = True
+        click.echo(f"Updated existing user: {email}")
+    else:
+        user = User(email=email, display_name=name, is_admin=True, is_active=True)
+        user.set_password(password)
+        db.session.add(user)
+        click.echo(f"Created new admin user: {email}")
 
-        if user:
-            user.display_name = name
-            user.set_password(password)
-            user.is_admin = True
-            user.is_active = True
-            click.echo(f"Updated existing user: {email}")
-        else:
-            user = User(email=email, display_name=name, is_admin=True, is_active=True)
-            user.set_password(password)
-            db.session.add(user)
-            click.echo(f"Created new admin user: {email}")
-
-        db.session.commit()
+    db.session.commit()
 
 
 @cli.command("import-files")
@@ -46,18 +54,29 @@ def create_admin(email, name, password):
 @click.option(
     "--dry-run", is_flag=True, help="Show what would be imported without saving"
 )
-def import_files(path, tag_from_folders, default_tags, dry_run):
+@click.option(
+    "--user-id",
+    default=None,
+    help="User ID to set as creator (defaults to first admin)",
+)
+@click.option(
+    "--on-duplicate",
+    type=click.Choice(["keep", "skip", "merge"]),
+    default="keep",
+    show_default=True,
+    help="What to do with new files that nearly match an existing note",
+)
+def import_files(path, tag_from_folders, default_tags, dry_run, user_id, on_duplicate):
     """Import .txt and .md files as notes."""
     from importers.import_files import import_files as do_import
 
-    ctx = click.Context(do_import)
-    ctx.invoke(
-        do_import,
+    do_import(
         path=path,
         tag_from_folders=tag_from_folders,
         default_tags=default_tags,
         dry_run=dry_run,
-        user_id=None,
+        user_id=user_id,
+        on_duplicate=on_duplicate,
     )
 
 
@@ -66,12 +85,364 @@ def import_files(path, tag_from_folders, default_tags, dry_run):
 @click.option(
     "--dry-run", is_flag=True, help="Show what would be imported without saving"
 )
-def import_onenote(path, dry_run):
+@click.option(
+    "--user-id",
+    default=None,
+    help="User ID to set as creator (defaults to first admin)",
+)
+@click.option(
+    "--on-duplicate",
+    type=click.Choice(["keep", "skip", "merge"]),
+    default="keep",
+    show_default=True,
+    help="What to do with new files that nearly match an existing note",
+)
+def import_onenote(path, dry_run, user_id, on_duplicate):
     """Import OneNote HTML exports as notes."""
     from importers.import_onenote_html import import_onenote as do_import
 
-    ctx = click.Context(do_import)
-    ctx.invoke(do_import, path=path, dry_run=dry_run, user_id=None)
+    do_import(path=path, dry_run=dry_run, user_id=user_id, on_duplicate=on_duplicate)
+
+
+@cli.command("import-bundle")
+@click.option("--path", required=True, help="JSONL bundle written by export (.jsonl or .jsonl.gz)")
+@click.option("--batch-size", default=1000, show_default=True, help="Notes per batch")
+@click.option(
+    "--dry-run", is_flag=True, help="Load everything, then roll back instead of saving"
+)
+def import_bundle(path, batch_size, dry_run):
+    """Restore notes, tags and users from an export bundle."""
+    from importers.import_bundle import import_bundle as do_import
+
+    do_import(path=path, batch_size=batch_size, dry_run=dry_run)
+
+
+@cli.command("sync-users")
+@click.option("--path", required=True, help="Directory export: .csv with a header row, or .json")
+@click.option(
+    "--deactivate-missing",
+    is_flag=True,
+    help="Deactivate non-admin accounts the file does not list",
+)
+@click.option(
+    "--workers",
+    default=None,
+    type=int,
+    help="Processes hashing new accounts' passwords (default: CPU count)",
+)
+@click.option("--dry-run", is_flag=True, help="Report the changes, then roll back")
+def sync_users(path, deactivate_missing, workers, dry_run):
+    """Create, update and deactivate users to match a directory export."""
+    from importers.sync_users import sync_users as do_sync
+
+    do_sync(path=path, deactivate_missing=deactivate_missing, workers=workers, dry_run=dry_run)
+
+
+@cli.command("compact-revisions")
+@click.option(
+    "--keep-last",
+    default=None,
+    type=int,
+    help="Always keep this many newest revisions per note (REVISION_KEEP_LAST)",
+)
+@click.option(
+    "--keep-days",
+    default=None,
+    type=int,
+    help="Always keep revisions newer than this (REVISION_KEEP_DAYS)",
+)
+@click.option("--note-id", default=None, help="Only compact this note")
+@click.option(
+    "--reencode",
+    is_flag=True,
+    help="Rewrite every chain with the current snapshot interval",
+)
+def compact_revisions(keep_last, keep_days, note_id, reencode):
+    """Prune old note revisions and re-encode the remaining history."""
+    from flask import current_app
+    from app.models import NoteRevision
+    from app.revisions import compact_note, history_stats
+
+    if keep_last is None:
+        keep_last = current_app.config["REVISION_KEEP_LAST"]
+    if keep_days is None:
+        keep_days = current_app.config["REVISION_KEEP_DAYS"]
+
+    before = history_stats()
+
+    if note_id:
+        note_ids = [note_id]
+    else:
+        note_ids = [
+            row[0]
+            for row in db.session.query(NoteRevision.note_id).distinct().all()
+        ]
+
+    dropped = 0
+    for current_id in note_ids:
+        dropped += compact_note(current_id, keep_last, keep_days, reencode=reencode)
+        db.session.commit()
+
+    revisions, stored, live = history_stats()
+    click.echo(f"Dropped {dropped} revisions from {len(note_ids)} notes")
+    click.echo(f"  Revisions: {before[0]} -> {revisions}")
+    click.echo(f"  Stored history: {before[1]:,} -> {stored:,} bytes")
+    if live:
+        click.echo(f"  History / live body size: {stored / live:.2f}x")
+
+
+@cli.command("archive-sweep")
+@click.option(
+    "--days",
+    default=None,
+    type=int,
+    help="Move notes archived and untouched this long (ARCHIVE_AFTER_DAYS)",
+)
+@click.option("--batch-size", default=1000, show_default=True, help="Notes per commit")
+def archive_sweep(days, batch_size):
+    """Move long-archived notes from notes to notes_archive."""
+    from flask import current_app
+    from app.archive import sweep
+
+    if not current_app.config["NOTES_ARCHIVE_TABLE"]:
+        raise click.ClickException(
+            "Set NOTES_ARCHIVE_TABLE=1 first; otherwise swept notes are hidden."
+        )
+    moved = sweep(days, batch_size=batch_size)
+    click.echo(f"Moved {moved} archived notes to notes_archive")
+
+
+@cli.command("merge-tags")
+@click.argument("source")
+@click.argument("target")
+def merge_tags(source, target):
+    """Move every note tagged SOURCE to TARGET and delete SOURCE."""
+    from app.models import Tag
+    from app.tags.bulk import merge_tags as do_merge
+
+    source_tag = Tag.query.filter_by(name=source.strip().lower()).first()
+    if source_tag is None:
+        raise click.ClickException(f"No tag named {source!r}")
+    target_tag = Tag.get_or_create(target)
+    db.session.flush()
+
+    admin = User.query.filter_by(is_admin=True).first()
+    if admin is None:
+        raise click.ClickException("Create an admin user first.")
+
+    source_name, target_name = source_tag.name, target_tag.name
+    count = do_merge(source_tag, target_tag, admin.id)
+    db.session.commit()
+    click.echo(f"Merged {source_name!r} into {target_name!r}: {count} notes")
+
+
+@cli.command("export")
+@click.option(
+    "--output", required=True, help="Output file (.jsonl, .jsonl.gz or .zip), or -"
+)
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(["jsonl", "markdown"]),
+    default="jsonl",
+    help="JSONL bundle or zip of Markdown files with front-matter",
+)
+@click.option("--tag", "tags", multiple=True, help="Only notes with this tag")
+@click.option("--updated-since", default=None, help="Only notes updated after (ISO)")
+@click.option(
+    "--archived",
+    type=click.Choice(["exclude", "include", "only"]),
+    default="exclude",
+    help="Whether to export archived notes",
+)
+@click.option(
+    "--state-file",
+    default=None,
+    help="Incremental export: read and update the updated_at watermark here",
+)
+def export(output, export_format, tags, updated_since, archived, state_file):
+    """Stream notes to a JSONL bundle or a Markdown zip."""
+    from app.export import (
+        ExportStats,
+        export_query,
+        iter_jsonl,
+        iter_markdown_zip,
+        parse_since,
+    )
+
+    try:
+        since = parse_since(updated_since)
+    except ValueError:
+        raise click.BadParameter(
+            f"{updated_since!r} is not an ISO 8601 date", param_hint="--updated-since"
+        )
+    if state_file and since is None:
+        try:
+            with open(state_file, "r", encoding="utf-8") as f:
+                since = parse_since(json.load(f).get("watermark"))
+        except FileNotFoundError:
+            pass
+        except (AttributeError, TypeError, ValueError):
+            raise click.ClickException(
+                f"{state_file} does not hold a valid watermark; fix or delete it"
+            )
+
+    query = export_query(tags=tags, updated_since=since, archived=archived)
+    stats = ExportStats()
+    filters = {
+        "tags": list(tags),
+        "updated_since": since.isoformat() if since else None,
+        "archived": archived,
+    }
+
+    if export_format == "markdown":
+        chunks = iter_markdown_zip(query, stats=stats)
+        if output == "-":
+            out = sys.stdout.buffer
+        else:
+            out = open(output, "wb")
+    else:
+        chunks = (line.encode("utf-8") for line in iter_jsonl(query, filters, stats))
+        if output == "-":
+            out = sys.stdout.buffer
+        elif output.endswith(".gz"):
+            out = gzip.open(output, "wb")
+        else:
+            out = open(output, "wb")
+
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+    watermark = stats.watermark or since
+    if state_file:
+        with open(state_file, "w", encoding="utf-8") as f:
+            json.dump({"watermark": watermark.isoformat() if watermark else None}, f)
+
+    click.echo(f"Exported {stats.notes} notes", err=True)
+
+
+@cli.command("worker")
+@click.option(
+    "--threads", default=None, type=int, help="Jobs run at once (WORKER_THREADS)"
+)
+@click.option(
+    "--poll",
+    default=None,
+    type=float,
+    help="Seconds between polls while idle (WORKER_POLL_SECONDS)",
+)
+@click.option("--burst", is_flag=True, help="Exit once no job is due")
+@click.option(
+    "--metrics-port",
+    default=None,
+    type=int,
+    help="Serve this worker's Prometheus metrics on this port",
+)
+def worker(threads, poll, burst, metrics_port):
+    """Run queued background jobs until stopped."""
+    from flask import current_app
+    from app.jobs import Worker
+
+    if metrics_port:
+        import threading
+        from wsgiref.simple_server import make_server
+        from app.utils.metrics import render_prometheus
+
+        def metrics_app(environ, start_response):
+            start_response("200 OK", [("Content-Type", "text/plain; version=0.0.4")])
+            return [render_prometheus().encode("utf-8")]
+
+        server = make_server("", metrics_port, metrics_app)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        click.echo(f"Serving worker metrics on :{metrics_port}")
+
+    app = current_app._get_current_object()
+    Worker(app, threads=threads, poll_seconds=poll).run(burst=burst)
+
+
+@cli.command("reindex-search")
+@click.option("--inline", is_flag=True, help="Rebuild now instead of queueing a job")
+def reindex_search(inline):
+    """Rebuild the full-text search vectors of every note."""
+    from app.jobs import enqueue
+    from app.models import Note
+
+    if inline:
+        Note.refresh_search_vectors()
+        db.session.commit()
+        click.echo("Search vectors rebuilt")
+    else:
+        enqueue("notes.refresh_search", dedupe_key="search:all")
+        db.session.commit()
+        click.echo("Queued a search rebuild for flask worker")
+
+
+@cli.command("rebuild-related")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per insert")
+def rebuild_related(batch_size):
+    """Recompute the related-notes lists of every active note."""
+    from app.similarity import rebuild
+
+    notes, pairs = rebuild(batch_size=batch_size, progress=click.echo)
+    click.echo(f"Stored {pairs} related-note links for {notes} notes")
+
+
+@cli.command("find-duplicates")
+@click.option(
+    "--threshold",
+    default=None,
+    type=float,
+    help="Similarity at which notes are duplicates (DUPLICATE_THRESHOLD)",
+)
+@click.option("--include-archived", is_flag=True, help="Also compare archived notes")
+@click.option("--batch-size", default=1000, show_default=True, help="Notes per batch")
+def find_duplicates(threshold, include_archived, batch_size):
+    """Report clusters of near-duplicate notes."""
+    from app.duplicates import find_clusters
+
+    clusters, backfilled = find_clusters(
+        threshold, include_archived=include_archived, batch_size=batch_size
+    )
+    if backfilled:
+        click.echo(f"Stored signatures for {backfilled} notes")
+    for number, members in enumerate(clusters, start=1):
+        click.echo(f"\nCluster {number} ({len(members)} notes)")
+        for note_id, title, source in members:
+            click.echo(f"  {note_id}  {title}" + (f"  [{source}]" if source else ""))
+    click.echo(f"\n{len(clusters)} clusters, {sum(map(len, clusters))} notes")
+
+
+@cli.command("create-api-token")
+@click.option("--email", required=True, help="User the token acts as")
+@click.option("--name", required=True, help="What the token is for, e.g. the tool using it")
+def create_api_token(email, name):
+    """Create a bearer token for /api/v1 and print it once."""
+    from app.models import ApiToken
+
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}")
+    token, secret = ApiToken.issue(user, name)
+    db.session.commit()
+    click.echo(f"Token {token.id} for {email}: {secret}")
+
+
+@cli.command("revoke-api-token")
+@click.argument("token_id", type=int)
+def revoke_api_token(token_id):
+    """Delete an API token by the id printed when it was created."""
+    from app.models import ApiToken
+
+    token = db.session.get(ApiToken, token_id)
+    if token is None:
+        raise click.ClickException(f"No API token {token_id}")
+    db.session.delete(token)
+    db.session.commit()
+    click.echo(f"Revoked token {token_id} ({token.name})")
 
 
 if __name__ == "__main__":
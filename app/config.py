@@ -24,6 +24,7 @@ class Config:
     WTF_CSRF_TIME_LIMIT = None
 
     ALLOW_SELF_REGISTER = os.environ.get("ALLOW_SELF_REGISTER", "0") == "1"
+    ADMIN_USERS_PER_PAGE = int(os.environ.get("ADMIN_USERS_PER_PAGE", "50"))
 
     MARKDOWN_EXTENSIONS = ["extra", "codehilite", "toc", "tables", "fenced_code"]
 
@@ -66,18 +67,111 @@ class Config:
         "th": ["colspan", "rowspan"],
     }
 
+    # Bodies longer than NOTE_PROGRESSIVE_CHARS are shown progressively: the
+    # first NOTE_FIRST_SECTIONS sections of about NOTE_SECTION_CHARS render
+    # with the page, the rest are fetched as the reader scrolls.
+    NOTE_PROGRESSIVE_CHARS = int(os.environ.get("NOTE_PROGRESSIVE_CHARS", "200000"))
+    NOTE_SECTION_CHARS = int(os.environ.get("NOTE_SECTION_CHARS", "50000"))
+    NOTE_FIRST_SECTIONS = int(os.environ.get("NOTE_FIRST_SECTIONS", "2"))
+
+    # A full snapshot is stored at least every N revisions, which bounds how
+    # many deltas are applied to rebuild any revision.
+    REVISION_SNAPSHOT_INTERVAL = int(os.environ.get("REVISION_SNAPSHOT_INTERVAL", "20"))
+    REVISIONS_PER_PAGE = 20
+    REVISION_KEEP_LAST = int(os.environ.get("REVISION_KEEP_LAST", "50"))
+    REVISION_KEEP_DAYS = int(os.environ.get("REVISION_KEEP_DAYS", "180"))
+
+    # Archive table mode (app/archive.py): archived notes older than
+    # ARCHIVE_AFTER_DAYS are moved to notes_archive by `flask archive-sweep`.
+    NOTES_ARCHIVE_TABLE = os.environ.get("NOTES_ARCHIVE_TABLE", "0") == "1"
+    ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "30"))
+
+    # Response compression (app/utils/compression.py); buffered bodies
+    # smaller than COMPRESS_MIN_SIZE bytes are sent as they are.
+    COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "1") == "1"
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "500"))
+    COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))
+
+    # The notes list is streamed (app/utils/streaming.py), reading rows from
+    # a server-side cursor LIST_STREAM_BATCH_SIZE at a time.
+    STREAM_LIST_PAGES = os.environ.get("STREAM_LIST_PAGES", "1") == "1"
+    LIST_STREAM_BATCH_SIZE = int(os.environ.get("LIST_STREAM_BATCH_SIZE", "200"))
+
+    # Images in note bodies (app/attachments/store.py). "file://<dir>" keeps
+    # them under <dir>, relative to the instance folder unless absolute.
+    # Inline base64 images up to ATTACHMENT_MAX_BYTES are moved there.
+    ATTACHMENT_STORE_URL = os.environ.get("ATTACHMENT_STORE_URL", "file://attachments")
+    ATTACHMENT_MAX_BYTES = int(
+        os.environ.get("ATTACHMENT_MAX_BYTES", str(20 * 1024 * 1024))
+    )
+
+    # Cache invalidation counters (app/generations.py). On PostgreSQL a
+    # LISTEN thread picks up changes; otherwise each worker polls at most
+    # every CACHE_BUS_POLL_SECONDS.
+    CACHE_BUS_LISTEN = os.environ.get("CACHE_BUS_LISTEN", "1") == "1"
+    CACHE_BUS_POLL_SECONDS = float(os.environ.get("CACHE_BUS_POLL_SECONDS", "1.0"))
+
+    # Template fragment cache (app/utils/fragment_cache.py): "memory" for a
+    # per-process LRU, "sqlite:///path" to share entries between the workers
+    # on a host, "none" to turn it off.
+    FRAGMENT_CACHE_URL = os.environ.get("FRAGMENT_CACHE_URL", "memory")
+    FRAGMENT_CACHE_MAX_BYTES = int(
+        os.environ.get("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+    )
+
+    # Static URLs carry a content hash and are cached as immutable
+    # (app/utils/assets.py).
+    STATIC_FINGERPRINT = os.environ.get("STATIC_FINGERPRINT", "1") == "1"
+
+    # Related notes (app/similarity.py): top-K neighbours stored per note,
+    # scored by body term similarity plus RELATED_TAG_WEIGHT * tag overlap.
+    RELATED_NOTES_K = int(os.environ.get("RELATED_NOTES_K", "10"))
+    RELATED_NOTES_SHOWN = int(os.environ.get("RELATED_NOTES_SHOWN", "5"))
+    RELATED_MIN_SCORE = float(os.environ.get("RELATED_MIN_SCORE", "0.1"))
+    RELATED_TAG_WEIGHT = float(os.environ.get("RELATED_TAG_WEIGHT", "0.4"))
+
+    # Near-duplicate detection (app/duplicates.py): estimated Jaccard
+    # similarity of body 3-shingles at which two notes count as duplicates.
+    DUPLICATE_THRESHOLD = float(os.environ.get("DUPLICATE_THRESHOLD", "0.8"))
+
+    # Background jobs (app/jobs). In eager mode jobs run inline in the request
+    # that enqueues them, so no worker is needed.
+    JOBS_EAGER = os.environ.get("JOBS_EAGER", "0") == "1"
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "5"))
+    JOB_VISIBILITY_TIMEOUT = int(os.environ.get("JOB_VISIBILITY_TIMEOUT", "300"))
+    JOB_RETRY_BASE_SECONDS = int(os.environ.get("JOB_RETRY_BASE_SECONDS", "10"))
+    JOB_KEEP_FINISHED_HOURS = int(os.environ.get("JOB_KEEP_FINISHED_HOURS", "72"))
+    WORKER_THREADS = int(os.environ.get("WORKER_THREADS", "4"))
+    WORKER_POLL_SECONDS = float(os.environ.get("WORKER_POLL_SECONDS", "1.0"))
+
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+    SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", "500"))
+
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
     LOG_FILE = os.environ.get("LOG_FILE", "app.log")
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+    LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+    LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
     WTF_CSRF_SESSION_ENABLED = True
+    JOBS_EAGER = os.environ.get("JOBS_EAGER", "1") == "1"
 
 
 class ProductionConfig(Config):
     DEBUG = False
 
+    # Size the pool to the number of threads each worker runs.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "5")),
+        "pool_pre_ping": True,
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+    }
+
 
 config = {
     "development": DevelopmentConfig,
@@ -0,0 +1,197 @@
+# file: app/duplicates.py
+"""Near-duplicate notes.
+
+Each note's body is summarised as a MinHash signature of its word 3-shingles,
+stored in ``note_metadata`` with the note's LSH band keys::
+
+    {"minhash": [64 ints], "minhash_bands": ["0:1234", ...]}
+
+Notes sharing a band key are candidates; a candidate is a near-duplicate when
+the signatures agree on at least DUPLICATE_THRESHOLD of their positions. On
+PostgreSQL the band lookup is served by the GIN index on
+``note_metadata -> 'minhash_bands'``, so checking one note does not scan the
+KB.
+
+Signatures are written on every save and import. ``find_clusters`` backfills
+notes without one, e.g. notes restored from old bundles.
+"""
+from collections import defaultdict
+
+import click
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import undefer
+
+from app import archive
+from app.extensions import db
+from app.models import ArchivedNote, Note
+from app.utils import minhash
+
+# 16 bands of 4 rows: pairs at 0.8 similarity share a bucket with probability
+# ~0.9998, pairs at 0.5 with ~0.64 (and are then rejected by the estimate).
+DUPLICATE_BANDS = 16
+SIGNATURE_KEY = "minhash"
+BANDS_KEY = "minhash_bands"
+# Candidate notes loaded when checking a single signature.
+MAX_CANDIDATES = 200
+
+
+def body_signature(body):
+    return minhash.signature(minhash.shingles(body))
+
+
+def band_keys(sig):
+    return [f"{band}:{bucket}" for band, bucket in minhash.band_buckets(sig, DUPLICATE_BANDS)]
+
+
+def with_signature(metadata, sig):
+    """A copy of ``metadata`` holding ``sig`` and its band keys."""
+    metadata = {
+        key: value
+        for key, value in (metadata or {}).items()
+        if key not in (SIGNATURE_KEY, BANDS_KEY)
+    }
+    if sig is not None:
+        metadata[SIGNATURE_KEY] = sig
+        metadata[BANDS_KEY] = band_keys(sig)
+    return metadata
+
+
+def stamp(note, sig=None):
+    """Store the signature of ``note.body`` (or ``sig``) in its metadata."""
+    if sig is None:
+        sig = body_signature(note.body)
+    # A new dict, so the JSON column is seen as changed.
+    note.note_metadata = with_signature(note.note_metadata, sig)
+    return sig
+
+
+def merge_source(note, source):
+    """Record that the file at ``source`` was merged into ``note``."""
+    metadata = dict(note.note_metadata or {})
+    sources = metadata.get("merged_sources", [])
+    if source not in sources:
+        metadata["merged_sources"] = sources + [source]
+    note.note_metadata = metadata
+
+
+def _shares_band(keys):
+    if db.engine.dialect.name == "postgresql":
+        # Spelled like the ix_notes_minhash_bands expression, so it is used.
+        bands = Note.note_metadata.op("->")(sa.literal_column(f"'{BANDS_KEY}'"))
+        return bands.op("?|")(
+            sa.cast(postgresql.array(keys), postgresql.ARRAY(sa.Text))
+        )
+    element = sa.func.json_each(Note.note_metadata, f"$.{BANDS_KEY}").table_valued("value")
+    return sa.exists(sa.select(1).select_from(element).where(element.c.value.in_(keys)))
+
+
+def matches(sig, exclude_id=None, threshold=None):
+    """``(score, note)`` pairs of stored notes near-identical to ``sig``, best first."""
+    if sig is None:
+        return []
+    if threshold is None:
+        threshold = current_app.config["DUPLICATE_THRESHOLD"]
+    query = Note.query.filter(_shares_band(band_keys(sig)))
+    if exclude_id is not None:
+        query = query.filter(Note.id != exclude_id)
+    found = []
+    for note in query.limit(MAX_CANDIDATES):
+        score = minhash.similarity(sig, (note.note_metadata or {}).get(SIGNATURE_KEY))
+        if score >= threshold:
+            found.append((score, note))
+    found.sort(key=lambda pair: pair[0], reverse=True)
+    return found
+
+
+def best_match(sig, exclude_id=None):
+    found = matches(sig, exclude_id)
+    return found[0] if found else None
+
+
+def report(near_duplicates):
+    """Print the ``(source, (score, note))`` pairs an importer collected."""
+    if not near_duplicates:
+        return
+    click.echo(f"\nNear-duplicates: {len(near_duplicates)}")
+    for source, (score, note) in near_duplicates:
+        click.echo(f"  {source}")
+        click.echo(f"    ~ {note.title} ({note.source or note.id}) {score:.2f}")
+
+
+def find_clusters(threshold=None, include_archived=False, batch_size=1000):
+    """Group every note into near-duplicate clusters. Commits backfilled signatures.
+
+    With ``include_archived``, notes swept into the archive table are
+    compared too. Bodies are read only for notes without a stored signature.
+
+    Returns ``(clusters, backfilled)``: lists of ``(id, title, source)`` rows,
+    largest cluster first, and the number of signatures written.
+    """
+    if threshold is None:
+        threshold = current_app.config["DUPLICATE_THRESHOLD"]
+
+    signatures = {}
+    rows_by_id = {}
+    buckets = defaultdict(list)
+    backfilled = 0
+
+    def add(note_id, sig):
+        signatures[note_id] = sig
+        for key in band_keys(sig):
+            buckets[key].append(note_id)
+
+    models = [Note]
+    if include_archived and archive.enabled():
+        models.append(ArchivedNote)
+    for model in models:
+        query = sa.select(model.id, model.title, model.source, model.note_metadata)
+        if not include_archived:
+            query = query.where(model.is_archived.is_(False))
+        missing = []
+        rows = db.session.execute(query.execution_options(yield_per=batch_size))
+        for note_id, title, source, metadata in rows:
+            rows_by_id[note_id] = (note_id, title, source)
+            sig = (metadata or {}).get(SIGNATURE_KEY)
+            if sig is None:
+                missing.append(note_id)
+            else:
+                add(note_id, sig)
+
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start : start + batch_size]
+            for note in model.query.options(undefer(model.body)).filter(model.id.in_(batch)):
+                sig = body_signature(note.body)
+                if sig is not None:
+                    stamp(note, sig)
+                    add(note.id, sig)
+                    backfilled += 1
+            db.session.commit()
+
+    parent = {}
+
+    def find(note_id):
+        while parent.get(note_id, note_id) != note_id:
+            note_id = parent[note_id]
+        return note_id
+
+    checked = set()
+    for members in buckets.values():
+        for i, left in enumerate(members):
+            for right in members[i + 1 :]:
+                pair = (left, right)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                if minhash.similarity(signatures[left], signatures[right]) >= threshold:
+                    parent[find(right)] = find(left)
+
+    clusters = defaultdict(list)
+    for note_id in parent:
+        clusters[find(note_id)].append(rows_by_id[note_id])
+    for root in list(clusters):
+        clusters[root].append(rows_by_id[root])
+    result = [sorted(set(members), key=lambda row: row[1]) for members in clusters.values()]
+    result.sort(key=len, reverse=True)
+    return result, backfilled
@@ -0,0 +1,215 @@
+# file: app/export.py
+import io
+import itertools
+import json
+import re
+import zipfile
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy.orm import selectinload, undefer
+
+from app.models import ArchivedNote, Note, Tag, User
+from app.notes.query import NoteFilters
+
+EXPORT_FORMAT_VERSION = 1
+
+# Rows fetched per round trip from the server-side cursor.
+EXPORT_BATCH_SIZE = 500
+
+ARCHIVED_CHOICES = ("exclude", "include", "only")
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def parse_since(value):
+    if not value:
+        return None
+    since = datetime.fromisoformat(value)
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+def export_query(tags=(), updated_since=None, archived="exclude"):
+    """Notes to export, oldest change first, streamed with a server-side cursor.
+
+    Tags and users are fetched with one extra query per batch, since joined
+    eager loading cannot be combined with ``yield_per``.
+    """
+    query = Note.query.options(
+        undefer(Note.body),
+        selectinload(Note.created_by),
+        selectinload(Note.updated_by),
+        selectinload(Note.tags),
+    )
+
+    if archived == "exclude":
+        query = query.filter(Note.is_archived.is_(False))
+    elif archived == "only":
+        query = query.filter(Note.is_archived.is_(True))
+
+    for tag_name in tags:
+        query = query.filter(Note.tags.any(Tag.name == tag_name.strip().lower()))
+
+    if updated_since is not None:
+        query = query.filter(Note.updated_at > updated_since)
+
+    query = query.order_by(Note.updated_at, Note.id).yield_per(EXPORT_BATCH_SIZE)
+    if archived == "exclude" or not current_app.config.get("NOTES_ARCHIVE_TABLE"):
+        return query
+
+    # Notes moved to notes_archive by archive-sweep follow the rest.
+    filters = NoteFilters(tag_names=tags, include_archived=True)
+    swept = (
+        ArchivedNote.query.options(
+            undefer(ArchivedNote.body),
+            selectinload(ArchivedNote.created_by),
+            selectinload(ArchivedNote.updated_by),
+        )
+        .filter(*filters.criteria(model=ArchivedNote))
+    )
+    if updated_since is not None:
+        swept = swept.filter(ArchivedNote.updated_at > updated_since)
+    swept = swept.order_by(ArchivedNote.updated_at, ArchivedNote.id)
+    return itertools.chain(query, swept.yield_per(EXPORT_BATCH_SIZE))
+
+
+def note_record(note):
+    return {
+        "type": "note",
+        "id": note.id,
+        "title": note.title,
+        "body": note.body,
+        "summary": note.summary,
+        "source": note.source,
+        "is_archived": bool(note.is_archived),
+        "metadata": note.note_metadata or {},
+        "tags": sorted(tag.name for tag in note.tags),
+        "created_by": note.created_by.email,
+        "updated_by": note.updated_by.email,
+        "created_at": _iso(note.created_at),
+        "updated_at": _iso(note.updated_at),
+    }
+
+
+class ExportStats:
+    def __init__(self):
+        self.notes = 0
+        self.watermark = None
+
+    def add(self, note):
+        self.notes += 1
+        if note.updated_at and (self.watermark is None or note.updated_at > self.watermark):
+            self.watermark = note.updated_at
+
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+
+def iter_jsonl(query, filters=None, stats=None):
+    """Yield the export as JSONL: header, users, tags, notes, then a footer."""
+    stats = stats if stats is not None else ExportStats()
+
+    yield _dump(
+        {
+            "type": "header",
+            "version": EXPORT_FORMAT_VERSION,
+            "exported_at": _iso(datetime.now(timezone.utc)),
+            "filters": filters or {},
+        }
+    )
+
+    for user in User.query.order_by(User.email).yield_per(EXPORT_BATCH_SIZE):
+        yield _dump(
+            {
+                "type": "user",
+                "email": user.email,
+                "display_name": user.display_name,
+                "is_admin": bool(user.is_admin),
+                "is_active": bool(user.is_active),
+                "created_at": _iso(user.created_at),
+            }
+        )
+
+    for tag in Tag.query.order_by(Tag.id):
+        yield _dump({"type": "tag", "id": tag.id, "name": tag.name})
+
+    for note in query:
+        stats.add(note)
+        yield _dump(note_record(note))
+
+    yield _dump(
+        {"type": "footer", "notes": stats.notes, "watermark": _iso(stats.watermark)}
+    )
+
+
+def _front_matter(record):
+    lines = ["---"]
+    for key in (
+        "id",
+        "title",
+        "summary",
+        "source",
+        "tags",
+        "is_archived",
+        "created_by",
+        "updated_by",
+        "created_at",
+        "updated_at",
+    ):
+        # JSON scalars and arrays are valid YAML flow values.
+        lines.append(f"{key}: {json.dumps(record[key], ensure_ascii=False)}")
+    lines.append("---")
+    return "\n".join(lines) + "\n\n"
+
+
+def _filename(record):
+    slug = re.sub(r"[^a-z0-9]+", "-", record["title"].lower()).strip("-")[:60]
+    return f"notes/{slug or 'note'}-{record['id']}.md"
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable file that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_markdown_zip(query, stats=None):
+    """Yield a zip of Markdown files with front-matter, one note at a time."""
+    stats = stats if stats is not None else ExportStats()
+    sink = _ChunkSink()
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for note in query:
+            stats.add(note)
+            record = note_record(note)
+            archive.writestr(_filename(record), _front_matter(record) + record["body"])
+            data = sink.drain()
+            if data:
+                yield data
+
+    data = sink.drain()
+    if data:
+        yield data
@@ -0,0 +1,223 @@
+# file: app/generations.py
+"""Generation counters for cache invalidation across workers and hosts.
+
+``cache_generations`` holds one counter per namespace (``notes``, ``tags``,
+``users``). A transaction that writes to a namespace's tables bumps its
+counter in the same transaction, so the new value becomes visible exactly
+when the data does. Writes are noticed by session events: ORM flushes
+of those models and DML statements run through ``db.session.execute``.
+Other writes call ``bump_after_commit`` themselves.
+
+Each process keeps a snapshot of the counters. ``current(namespace)``
+reads it, so checking a cache entry costs one integer comparison. The
+snapshot is refreshed:
+
+- on PostgreSQL, when a ``NOTIFY cache_generations`` arrives. A listener
+  thread waits for these, and bumps send them on commit.
+- otherwise, at most every ``CACHE_BUS_POLL_SECONDS``, with one query.
+"""
+import logging
+import os
+import select
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.extensions import db
+from app.models import CacheGeneration
+
+logger = logging.getLogger(__name__)
+
+NAMESPACES = ("notes", "tags", "users")
+CHANNEL = "cache_generations"
+
+# Writes to these tables bump the namespace.
+TABLE_NAMESPACES = {
+    "notes": "notes",
+    "notes_archive": "notes",
+    "note_tags": "notes",
+    "tags": "tags",
+    "users": "users",
+}
+
+_lock = threading.Lock()
+_snapshot = {}
+_checked_at = None
+_listener = None
+_pid = None
+
+
+def reset():
+    """Forget the snapshot and listener, e.g. in a freshly forked worker."""
+    global _checked_at, _listener, _pid
+    with _lock:
+        _snapshot.clear()
+        _checked_at = None
+        _listener = None
+        _pid = os.getpid()
+
+
+def _stale():
+    global _checked_at
+    with _lock:
+        _checked_at = None
+
+
+def _load():
+    global _checked_at
+    rows = db.session.execute(
+        sa.select(CacheGeneration.namespace, CacheGeneration.value)
+    ).all()
+    with _lock:
+        _snapshot.clear()
+        _snapshot.update(rows)
+        _checked_at = time.monotonic()
+
+
+def _listening(app):
+    """Start the NOTIFY listener of this process once; True while it runs."""
+    global _listener
+    if db.engine.dialect.name != "postgresql" or not app.config.get("CACHE_BUS_LISTEN", True):
+        return False
+    if _pid != os.getpid():
+        reset()
+    with _lock:
+        if _listener is None:
+            _listener = threading.Thread(
+                target=_listen, args=(app,), name="cache-bus", daemon=True
+            )
+            _listener.start()
+    return _listener.is_alive()
+
+
+def _listen(app):
+    # A connection of its own, in autocommit mode. It is held for the life
+    # of the process, so it comes from an unpooled engine rather than
+    # taking one of the app pool's slots for good.
+    try:
+        with app.app_context():
+            engine = sa.create_engine(db.engine.url, poolclass=NullPool)
+        conn = engine.raw_connection()
+        raw = conn.driver_connection
+        raw.autocommit = True
+        raw.cursor().execute(f"LISTEN {CHANNEL}")
+    except Exception:
+        logger.exception("Cache bus listener could not start; polling instead")
+        return
+    # Changes made before LISTEN took effect are picked up by this reload.
+    _stale()
+    try:
+        while True:
+            if select.select([raw], [], [], 60) == ([], [], []):
+                continue
+            raw.poll()
+            if raw.notifies:
+                raw.notifies.clear()
+                _stale()
+    except Exception:
+        logger.exception("Cache bus listener stopped; polling instead")
+        _stale()
+    finally:
+        conn.close()
+        engine.dispose()
+
+
+def current(namespace):
+    """The generation of ``namespace`` as this process last saw it."""
+    if not has_app_context():
+        return 0
+    app = current_app._get_current_object()
+    listening = _listening(app)
+    checked_at = _checked_at
+    if checked_at is None or (
+        not listening
+        and time.monotonic() - checked_at >= app.config.get("CACHE_BUS_POLL_SECONDS", 1.0)
+    ):
+        _load()
+    return _snapshot.get(namespace, 0)
+
+
+def bump_after_commit(*namespaces):
+    """Bump ``namespaces`` as part of the current transaction's commit."""
+    db.session.info.setdefault("generation_bumps", set()).update(namespaces)
+
+
+def _note_writes(session, namespaces):
+    session.info.setdefault("generation_bumps", set()).update(namespaces)
+
+
+def _namespace(obj):
+    table = getattr(type(obj), "__table__", None)
+    return TABLE_NAMESPACES.get(getattr(table, "name", None))
+
+
+def _before_flush(session, flush_context, instances):
+    changed = list(session.new | session.deleted)
+    changed += [obj for obj in session.dirty if session.is_modified(obj)]
+    namespaces = {_namespace(obj) for obj in changed}
+    namespaces.discard(None)
+    if namespaces:
+        _note_writes(session, namespaces)
+
+
+def _do_orm_execute(state):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    namespace = TABLE_NAMESPACES.get(getattr(table, "name", None))
+    if namespace:
+        _note_writes(state.session, {namespace})
+
+
+def _before_commit(session):
+    # Commit flushes after this hook runs; flush now to see those writes.
+    session.flush()
+    namespaces = session.info.pop("generation_bumps", None)
+    if not namespaces:
+        return
+    conn = session.connection()
+    table = CacheGeneration.__table__
+    # A fixed order, so concurrent commits lock the rows the same way round.
+    for namespace in sorted(namespaces):
+        updated = conn.execute(
+            table.update()
+            .where(table.c.namespace == namespace)
+            .values(value=table.c.value + 1)
+        )
+        if not updated.rowcount:
+            conn.execute(table.insert().values(namespace=namespace, value=1))
+        if conn.dialect.name == "postgresql":
+            conn.execute(sa.select(sa.func.pg_notify(CHANNEL, namespace)))
+    session.info["generation_bumped"] = True
+
+
+def _after_commit(session):
+    if session.info.pop("generation_bumped", False):
+        # This process sees its own bumps straight away.
+        _stale()
+
+
+def _after_rollback(session):
+    session.info.pop("generation_bumps", None)
+    session.info.pop("generation_bumped", None)
+
+
+_events_installed = False
+
+
+def init_generations(app):
+    global _events_installed
+    reset()
+    if _events_installed:
+        return
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "before_commit", _before_commit)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+    _events_installed = True
@@ -0,0 +1,340 @@
+# file: app/jobs/__init__.py
+"""Database-backed background jobs.
+
+A handler is a function registered with ``@job("kind")``. It runs inside an
+app context on ``db.session`` and must not commit: the worker commits the
+handler's writes together with marking the job done, and rolls both back if
+the handler raises. Handlers may run more than once (retries, visibility
+timeouts), so they must be idempotent.
+
+``enqueue`` adds a row to ``jobs`` in the caller's transaction, so the job
+becomes visible to ``flask worker`` when the caller commits. With
+``JOBS_EAGER`` set the handler runs inline instead.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from app.extensions import db
+from app.models import Job
+from app.utils.metrics import JOB_FAILURES, JOB_SECONDS, _escape
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def job(kind):
+    """Register the decorated function as the handler for ``kind``."""
+
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def enqueue(kind, payload=None, dedupe_key=None, delay=0, max_attempts=None):
+    """Queue ``kind`` to run with ``payload`` as keyword arguments.
+
+    A job is skipped while another queued job has the same ``dedupe_key``.
+    Returns the new Job, or None when it ran inline or was deduplicated.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    payload = payload or {}
+
+    if current_app.config.get("JOBS_EAGER"):
+        _run_handler(kind, payload)
+        return None
+
+    if dedupe_key is not None:
+        pending = db.session.execute(
+            select(Job.id)
+            .where(Job.dedupe_key == dedupe_key, Job.status == "queued")
+            .limit(1)
+        ).first()
+        if pending is not None:
+            return None
+
+    new_job = Job(
+        kind=kind,
+        payload=payload,
+        dedupe_key=dedupe_key,
+        run_at=_now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or current_app.config["JOB_MAX_ATTEMPTS"],
+    )
+    db.session.add(new_job)
+    return new_job
+
+
+def _run_handler(kind, payload):
+    started = time.perf_counter()
+    try:
+        HANDLERS[kind](**payload)
+    except Exception:
+        JOB_FAILURES.inc(kind)
+        raise
+    finally:
+        JOB_SECONDS.observe(kind, time.perf_counter() - started)
+
+
+def _fail_expired(now):
+    """Give up on running jobs that timed out on their last attempt."""
+    db.session.execute(
+        update(Job)
+        .where(
+            Job.status == "running",
+            Job.locked_until < now,
+            Job.attempts >= Job.max_attempts,
+        )
+        .values(
+            status="failed",
+            last_error="Visibility timeout expired on the last attempt",
+            finished_at=now,
+            locked_by=None,
+            locked_until=None,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def claim(worker_id, limit=1):
+    """Lock up to ``limit`` due jobs for ``worker_id`` and return them.
+
+    Due jobs are queued jobs whose ``run_at`` has passed and running jobs whose
+    lock expired (their worker died or overran ``JOB_VISIBILITY_TIMEOUT``). On
+    PostgreSQL concurrent workers skip each other's rows with ``FOR UPDATE
+    SKIP LOCKED``; SQLite serializes writers, so the same UPDATE is safe there.
+    Returns rows of (id, kind, payload, attempts, max_attempts).
+    """
+    now = _now()
+    _fail_expired(now)
+
+    due = (
+        select(Job.id)
+        .where(
+            or_(
+                and_(Job.status == "queued", Job.run_at <= now),
+                and_(Job.status == "running", Job.locked_until < now),
+            )
+        )
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+    )
+    if db.engine.dialect.name == "postgresql":
+        due = due.with_for_update(skip_locked=True)
+
+    timeout = current_app.config["JOB_VISIBILITY_TIMEOUT"]
+    rows = db.session.execute(
+        update(Job)
+        .where(Job.id.in_(due.scalar_subquery()))
+        .values(
+            status="running",
+            attempts=Job.attempts + 1,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=timeout),
+        )
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts),
+        execution_options={"synchronize_session": False},
+    ).all()
+    db.session.commit()
+    return rows
+
+
+def _release(job_id, worker_id, **values):
+    # A worker that lost its lock to a visibility timeout leaves the row alone.
+    return db.session.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.locked_by == worker_id)
+        .values(locked_by=None, locked_until=None, **values),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+
+def process(claimed, worker_id):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    job_id, kind, payload, attempts, max_attempts = claimed
+    try:
+        if kind not in HANDLERS:
+            raise LookupError(f"No handler for job kind {kind!r}")
+        _run_handler(kind, payload or {})
+        if not _release(job_id, worker_id, status="done", finished_at=_now()):
+            logger.warning("Job %s finished after its lock expired", job_id)
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc(limit=5)
+        if attempts >= max_attempts:
+            logger.error("Job %s (%s) failed permanently:\n%s", job_id, kind, error)
+            _release(
+                job_id, worker_id, status="failed", last_error=error, finished_at=_now()
+            )
+        else:
+            base = current_app.config["JOB_RETRY_BASE_SECONDS"]
+            backoff = base * 2 ** (attempts - 1)
+            logger.warning(
+                "Job %s (%s) attempt %d failed, retrying in %ds",
+                job_id,
+                kind,
+                attempts,
+                backoff,
+            )
+            _release(
+                job_id,
+                worker_id,
+                status="queued",
+                last_error=error,
+                run_at=_now() + timedelta(seconds=backoff),
+            )
+        db.session.commit()
+        return False
+
+
+def run_pending(worker_id="inline", limit=100):
+    """Claim and run due jobs one at a time in this thread. Returns the count."""
+    count = 0
+    while count < limit:
+        claimed = claim(worker_id, 1)
+        if not claimed:
+            break
+        process(claimed[0], worker_id)
+        count += 1
+    return count
+
+
+def purge_finished(hours=None):
+    """Delete jobs that finished successfully more than ``hours`` ago."""
+    if hours is None:
+        hours = current_app.config["JOB_KEEP_FINISHED_HOURS"]
+    result = db.session.execute(
+        delete(Job).where(
+            Job.status == "done", Job.finished_at < _now() - timedelta(hours=hours)
+        )
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+class Worker:
+    """Claims due jobs and runs them on a thread pool until stopped.
+
+    SIGTERM and SIGINT stop claiming; jobs already running are allowed to
+    finish before ``run`` returns.
+    """
+
+    PURGE_EVERY_SECONDS = 3600
+
+    def __init__(self, app, threads=None, poll_seconds=None, worker_id=None):
+        self.app = app
+        self.threads = threads or app.config["WORKER_THREADS"]
+        self.poll_seconds = poll_seconds or app.config["WORKER_POLL_SECONDS"]
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def stop(self, *args):
+        if not self._stop.is_set():
+            logger.info("Worker %s stopping after running jobs", self.worker_id)
+        self._stop.set()
+
+    def _process(self, claimed):
+        with self.app.app_context():
+            process(claimed, self.worker_id)
+
+    def _claim(self, limit):
+        with self.app.app_context():
+            return claim(self.worker_id, limit)
+
+    def _purge(self):
+        with self.app.app_context():
+            purged = purge_finished()
+        if purged:
+            logger.info("Purged %d finished jobs", purged)
+
+    def _wait(self, in_flight):
+        wait(in_flight, timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+
+    def run(self, burst=False):
+        """Work until stopped, or with ``burst`` until no job is due."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+
+        logger.info("Worker %s started with %d threads", self.worker_id, self.threads)
+        in_flight = set()
+        next_purge = 0.0
+        with ThreadPoolExecutor(self.threads, thread_name_prefix="job") as pool:
+            while not self._stop.is_set():
+                if time.monotonic() >= next_purge:
+                    self._purge()
+                    next_purge = time.monotonic() + self.PURGE_EVERY_SECONDS
+
+                in_flight = {future for future in in_flight if not future.done()}
+                free = self.threads - len(in_flight)
+                claimed = self._claim(free) if free else []
+                for row in claimed:
+                    in_flight.add(pool.submit(self._process, row))
+
+                if claimed and len(claimed) == free:
+                    # Every thread is busy: wait for one before claiming more.
+                    self._wait(in_flight)
+                elif not claimed:
+                    if burst and not in_flight:
+                        break
+                    if in_flight:
+                        self._wait(in_flight)
+                    else:
+                        self._stop.wait(self.poll_seconds)
+        logger.info("Worker %s stopped", self.worker_id)
+
+
+def queue_stats():
+    """Job counts by (status, kind) and the age in seconds of the oldest due job."""
+    counts = db.session.execute(
+        select(Job.status, Job.kind, func.count()).group_by(Job.status, Job.kind)
+    ).all()
+    now = _now()
+    oldest = db.session.execute(
+        select(func.min(Job.run_at)).where(Job.status == "queued", Job.run_at <= now)
+    ).scalar()
+    age = 0.0
+    if oldest is not None:
+        if oldest.tzinfo is None:
+            oldest = oldest.replace(tzinfo=timezone.utc)
+        age = max((now - oldest).total_seconds(), 0.0)
+    return counts, age
+
+
+def render_queue_metrics():
+    counts, age = queue_stats()
+    lines = [
+        "# HELP kb_jobs Background jobs by status and kind.",
+        "# TYPE kb_jobs gauge",
+    ]
+    for status, kind, count in sorted(counts):
+        lines.append(f'kb_jobs{{status="{status}",kind="{_escape(kind)}"}} {count}')
+    lines.extend(
+        [
+            "# HELP kb_job_oldest_due_seconds Age of the oldest job waiting to run.",
+            "# TYPE kb_job_oldest_due_seconds gauge",
+            f"kb_job_oldest_due_seconds {age}",
+        ]
+    )
+    return "\n".join(lines) + "\n"
+
+
+from app.jobs import tasks  # noqa: E402,F401  registers the handlers
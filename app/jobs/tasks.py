@@ -0,0 +1,18 @@
+# file: app/jobs/tasks.py
+from app.jobs import job
+from app.models import Note
+
+
+@job("notes.refresh_search")
+def refresh_search(note_ids=None):
+    """Recompute search vectors for ``note_ids``, or for every note."""
+    Note.refresh_search_vectors(note_ids)
+
+
+@job("notes.refresh_related")
+def refresh_related(note_ids):
+    """Recompute the related-notes lists of ``note_ids`` and their neighbours."""
+    from app import similarity
+
+    for note_id in note_ids:
+        similarity.refresh_note(note_id)
@@ -1,16 +1,19 @@
 # file: app/models.py
-import uuid
+import hashlib
+import secrets
 from datetime import datetime, timezone
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
-from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR, aggregate_order_by
 from app.extensions import db
+from app.utils.ids import uuid7
 
 
 class User(UserMixin, db.Model):
     __tablename__ = "users"
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Uuid(as_uuid=False), primary_key=True, default=uuid7)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
     display_name = db.Column(db.String(100), nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
@@ -37,6 +40,22 @@ class User(UserMixin, db.Model):
         lazy="dynamic",
     )
 
+    __table_args__ = (
+        # The admin list: newest first, paged, optionally searched by the
+        # start of an email or display name, case-insensitively.
+        db.Index("ix_users_created_at_id", "created_at", "id"),
+        db.Index(
+            "ix_users_email_lower",
+            func.lower(email).label("email_lower"),
+            postgresql_ops={"email_lower": "varchar_pattern_ops"},
+        ),
+        db.Index(
+            "ix_users_display_name_lower",
+            func.lower(display_name).label("display_name_lower"),
+            postgresql_ops={"display_name_lower": "varchar_pattern_ops"},
+        ),
+    )
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
 
@@ -47,12 +66,46 @@ class User(UserMixin, db.Model):
         return f"<User {self.email}>"
 
 
+class ApiToken(db.Model):
+    """A bearer token for /api/v1. Only the SHA-256 of the token is stored."""
+
+    __tablename__ = "api_tokens"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Uuid(as_uuid=False),
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    name = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    user = db.relationship("User")
+
+    @staticmethod
+    def hash(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def issue(cls, user, name):
+        """Create a token for ``user``; returns ``(ApiToken, secret)``."""
+        secret = secrets.token_urlsafe(32)
+        token = cls(user_id=user.id, name=name, token_hash=cls.hash(secret))
+        db.session.add(token)
+        return token, secret
+
+    def __repr__(self):
+        return f"<ApiToken {self.name}>"
+
+
 # Association table for notes and tags
 note_tags = db.Table(
     "note_tags",
     db.Column(
         "note_id",
-        db.String(36),
+        db.Uuid(as_uuid=False),
         db.ForeignKey("notes.id", ondelete="CASCADE"),
         primary_key=True,
     ),
@@ -88,12 +141,19 @@ class Tag(db.Model):
         return tag
 
 
+# The predicate of the active-set partial indexes. It renders exactly like the
+# list filter in app/notes/query.py, which the planners need to use them.
+ACTIVE_NOTES = db.column("is_archived").is_(False)
+
+
 class Note(db.Model):
     __tablename__ = "notes"
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.Uuid(as_uuid=False), primary_key=True, default=uuid7)
     title = db.Column(db.String(255), nullable=False)
-    body = db.Column(db.Text, nullable=False)
+    # Deferred: lists and lookups load a note without its body, which can
+    # run to megabytes. Bulk readers of bodies ask for it with undefer().
+    body = db.deferred(db.Column(db.Text, nullable=False))
     summary = db.Column(db.Text, nullable=True)
     source = db.Column(db.String(500), nullable=True, index=True)
     is_archived = db.Column(db.Boolean, default=False)
@@ -107,8 +167,23 @@ class Note(db.Model):
 
     search_vector = db.Column(TSVECTOR())
 
-    created_by_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
-    updated_by_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
+    # Optimistic locking: the ORM adds ``WHERE version = ?`` to every UPDATE
+    # of a note and bumps the value, and raises StaleDataError when no row
+    # matched because someone else saved first.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+
+    # Denormalized copy of note_tags, so list pages can filter by tag with an
+    # array containment check and render badges without joining tags.
+    tag_ids = db.Column(
+        ARRAY(db.Integer).with_variant(db.JSON(), "sqlite"), nullable=True, default=list
+    )
+
+    created_by_id = db.Column(
+        db.Uuid(as_uuid=False), db.ForeignKey("users.id"), nullable=False
+    )
+    updated_by_id = db.Column(
+        db.Uuid(as_uuid=False), db.ForeignKey("users.id"), nullable=False
+    )
 
     created_by = db.relationship(
         "User", foreign_keys=[created_by_id], back_populates="created_notes"
@@ -117,10 +192,286 @@ class Note(db.Model):
         "User", foreign_keys=[updated_by_id], back_populates="updated_notes"
     )
     tags = db.relationship("Tag", secondary=note_tags, back_populates="notes")
+    revisions = db.relationship(
+        "NoteRevision",
+        back_populates="note",
+        lazy="dynamic",
+        passive_deletes=True,
+        order_by="NoteRevision.number",
+    )
+
+    __mapper_args__ = {"version_id_col": version}
 
     __table_args__ = (
         db.Index("ix_notes_search_vector", "search_vector", postgresql_using="gin"),
+        db.Index("ix_notes_tag_ids", "tag_ids", postgresql_using="gin"),
+        # Partial indexes over the active set, matching the default list
+        # queries (``is_archived IS false``) so archived rows never bloat them.
+        # One ``(key, id)`` index per sort key in app/notes/query.SORT_MODES;
+        # descending modes scan them backwards.
+        db.Index(
+            "ix_notes_active_updated_at_id",
+            "updated_at",
+            "id",
+            postgresql_where=ACTIVE_NOTES,
+            sqlite_where=ACTIVE_NOTES,
+        ),
+        db.Index(
+            "ix_notes_active_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where=ACTIVE_NOTES,
+            sqlite_where=ACTIVE_NOTES,
+        ),
+        db.Index(
+            "ix_notes_active_lower_title_id",
+            func.lower(db.column("title")),
+            "id",
+            postgresql_where=ACTIVE_NOTES,
+            sqlite_where=ACTIVE_NOTES,
+        ),
+        db.Index(
+            "ix_notes_active_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+            postgresql_where=ACTIVE_NOTES,
+            sqlite_where=ACTIVE_NOTES,
+        ),
+        # Near-duplicate LSH band keys (app/duplicates.py), matched with ``?|``.
+        db.Index(
+            "ix_notes_minhash_bands",
+            db.text("(note_metadata -> 'minhash_bands')"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
     )
 
     def __repr__(self):
         return f"<Note {self.title}>"
+
+    def sync_tag_ids(self):
+        """Copy the ids of ``self.tags`` into ``tag_ids``.
+
+        New tags only have an id after a flush, so flush before calling this.
+        """
+        self.tag_ids = sorted(tag.id for tag in self.tags)
+
+    @staticmethod
+    def refresh_search_vectors(note_ids=None):
+        """Recompute ``search_vector`` with a single UPDATE (PostgreSQL only).
+
+        ``note_ids`` is a list of ids or a SELECT of ids; None means every note.
+        """
+        if db.engine.dialect.name != "postgresql":
+            return
+        stmt = db.update(Note).values(
+            search_vector=func.to_tsvector(
+                "english", func.concat_ws(" ", Note.title, Note.summary, Note.body)
+            ),
+            updated_at=Note.updated_at,
+        )
+        if note_ids is not None:
+            stmt = stmt.where(Note.id.in_(note_ids))
+        db.session.execute(stmt, execution_options={"synchronize_session": False})
+
+    @staticmethod
+    def refresh_tag_ids(note_ids=None):
+        """Recompute ``tag_ids`` from ``note_tags`` with a single UPDATE.
+
+        ``note_ids`` is a list of ids or a SELECT of ids; None means every note.
+        """
+        if db.engine.dialect.name == "postgresql":
+            tag_id = note_tags.c.tag_id
+            aggregated = func.coalesce(
+                func.array_agg(aggregate_order_by(tag_id, tag_id)),
+                literal_column("'{}'::integer[]"),
+            )
+        else:
+            aggregated = func.json_group_array(note_tags.c.tag_id)
+
+        stmt = db.update(Note).values(
+            tag_ids=select(aggregated)
+            .where(note_tags.c.note_id == Note.id)
+            .scalar_subquery(),
+            # Keep the column's onupdate hook from touching updated_at.
+            updated_at=Note.updated_at,
+        )
+        if note_ids is not None:
+            stmt = stmt.where(Note.id.in_(note_ids))
+        db.session.execute(stmt, execution_options={"synchronize_session": False})
+
+
+class NoteRevision(db.Model):
+    __tablename__ = "note_revisions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    note_id = db.Column(
+        db.Uuid(as_uuid=False),
+        db.ForeignKey("notes.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    number = db.Column(db.Integer, nullable=False)
+    # "snapshot" rows hold the whole body, "delta" rows the line edits against
+    # the previous stored revision. Both are zlib-compressed JSON.
+    kind = db.Column(db.String(10), nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)
+    body_size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_by_id = db.Column(
+        db.Uuid(as_uuid=False), db.ForeignKey("users.id"), nullable=True
+    )
+
+    note = db.relationship("Note", back_populates="revisions")
+    created_by = db.relationship("User")
+
+    __table_args__ = (
+        db.UniqueConstraint("note_id", "number", name="uq_note_revisions_note_number"),
+    )
+
+    def __repr__(self):
+        return f"<NoteRevision {self.note_id}#{self.number}>"
+
+
+class NoteSignature(db.Model):
+    """MinHash signature of a note's title and body terms (app/similarity.py)."""
+
+    __tablename__ = "note_signatures"
+
+    note_id = db.Column(
+        db.Uuid(as_uuid=False),
+        db.ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    minhash = db.Column(db.JSON().with_variant(JSONB(), "postgresql"), nullable=False)
+    computed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+# LSH buckets of each signature band; notes sharing a (band, bucket) are
+# candidate neighbours.
+note_signature_bands = db.Table(
+    "note_signature_bands",
+    db.Column(
+        "note_id",
+        db.Uuid(as_uuid=False),
+        db.ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    db.Column("band", db.SmallInteger, primary_key=True),
+    db.Column("bucket", db.BigInteger, nullable=False),
+    db.Index("ix_note_signature_bands_bucket", "band", "bucket"),
+)
+
+
+class NoteSimilarity(db.Model):
+    """One of a note's top-K related notes, refreshed by app/similarity.py."""
+
+    __tablename__ = "note_similarities"
+
+    note_id = db.Column(
+        db.Uuid(as_uuid=False),
+        db.ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    related_id = db.Column(
+        db.Uuid(as_uuid=False),
+        db.ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.Index("ix_note_similarities_related_id", "related_id"),)
+
+
+def _archive_table(table, name):
+    """A bare copy of ``table``'s columns: no defaults, foreign keys or indexes."""
+    return db.Table(
+        name,
+        db.metadata,
+        *[
+            db.Column(
+                column.name,
+                column.type,
+                primary_key=column.primary_key,
+                nullable=column.nullable,
+            )
+            for column in table.columns
+        ],
+    )
+
+
+note_revisions_archive = _archive_table(
+    NoteRevision.__table__, "note_revisions_archive"
+)
+
+
+class ArchivedNote(db.Model):
+    """A note moved out of ``notes`` by ``flask archive-sweep`` (see app/archive.py).
+
+    Tags are kept only in ``tag_ids``; ``note_tags`` rows are rebuilt when the
+    note is restored.
+    """
+
+    __table__ = _archive_table(Note.__table__, "notes_archive")
+
+    body = db.deferred(__table__.c.body)
+
+    created_by = db.relationship(
+        "User",
+        primaryjoin="foreign(ArchivedNote.created_by_id) == User.id",
+        viewonly=True,
+    )
+    updated_by = db.relationship(
+        "User",
+        primaryjoin="foreign(ArchivedNote.updated_by_id) == User.id",
+        viewonly=True,
+    )
+
+    @property
+    def tags(self):
+        if not self.tag_ids:
+            return []
+        return Tag.query.filter(Tag.id.in_(self.tag_ids)).order_by(Tag.name).all()
+
+    def __repr__(self):
+        return f"<ArchivedNote {self.title}>"
+
+
+class Job(db.Model):
+    """A unit of background work, claimed by ``flask worker`` (see app/jobs)."""
+
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON().with_variant(JSONB(), "postgresql"), default=dict)
+    # queued -> running -> done | failed; a running job whose locked_until has
+    # passed is claimed again.
+    status = db.Column(db.String(10), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    dedupe_key = db.Column(db.String(255), nullable=True)
+    run_at = db.Column(
+        db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc)
+    )
+    locked_until = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+        db.Index("ix_jobs_dedupe_key", "dedupe_key"),
+    )
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.status}>"
+
+
+class CacheGeneration(db.Model):
+    """A namespace's invalidation counter (see app/generations.py)."""
+
+    __tablename__ = "cache_generations"
+
+    namespace = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
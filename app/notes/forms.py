@@ -1,15 +1,33 @@
 # file: app/notes/forms.py
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, SelectMultipleField, SubmitField
+from wtforms import (
+    HiddenField,
+    StringField,
+    TextAreaField,
+    SelectField,
+    SelectMultipleField,
+    SubmitField,
+)
 from wtforms.validators import DataRequired, Length
 
 
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class NoteForm(FlaskForm):
     title = StringField("Title", validators=[DataRequired(), Length(max=255)])
     body = TextAreaField("Body", validators=[DataRequired()])
     summary = StringField("Summary")
     source = StringField("Source")
     tags = StringField("Tags (comma-separated)")
+    # The note version the form was filled from, and its latest revision:
+    # the base of the three-way merge when someone else saved first.
+    version = HiddenField(filters=[_int_or_none])
+    base_revision = HiddenField(filters=[_int_or_none])
     submit = SubmitField("Save Note")
 
 
@@ -19,3 +37,11 @@ class DeleteNoteForm(FlaskForm):
 
 class ArchiveNoteForm(FlaskForm):
     submit = SubmitField("Toggle Archive")
+
+
+class BulkTagForm(FlaskForm):
+    action = SelectField(
+        "Action", choices=[("add", "Add tag"), ("remove", "Remove tag")]
+    )
+    tag = StringField("Tag", validators=[DataRequired(), Length(max=100)])
+    submit = SubmitField("Apply to all matching notes")
@@ -0,0 +1,125 @@
+# file: app/notes/query.py
+from sqlalchemy import exists, false, func, select
+
+from app.extensions import db
+from app.models import Note, Tag
+
+
+class SortMode:
+    """A list order: ``key`` of the model, then ``id`` as the tie-breaker.
+
+    ``key`` is a function of the model (Note or ArchivedNote). Each mode needs
+    a partial ``(key, id)`` index in ``Note.__table_args__``; tests/test_notes.py
+    fails for a mode without one, and ``benchmarks.explain_active --check``
+    for a plan that still sorts.
+    """
+
+    def __init__(self, label, key, descending=False):
+        self.label = label
+        self.key = key
+        self.descending = descending
+
+    def order_by(self, model=Note):
+        columns = [self.key(model), model.id]
+        if self.descending:
+            return [column.desc() for column in columns]
+        return [column.asc() for column in columns]
+
+
+SORT_MODES = {
+    "updated_desc": SortMode(
+        "Recently Updated", lambda m: m.updated_at, descending=True
+    ),
+    "updated_asc": SortMode("Oldest Updated", lambda m: m.updated_at),
+    "title_asc": SortMode("Title A-Z", lambda m: func.lower(m.title)),
+    "title_desc": SortMode("Title Z-A", lambda m: func.lower(m.title), descending=True),
+    "created_desc": SortMode(
+        "Recently Created", lambda m: m.created_at, descending=True
+    ),
+}
+DEFAULT_SORT = "updated_desc"
+
+
+class NoteFilters:
+    """The notes list filters, shared by the list page and bulk actions."""
+
+    def __init__(self, query="", tag_names=(), include_archived=False, sort=DEFAULT_SORT):
+        self.query = query.strip()
+        self.tag_names = [name.strip().lower() for name in tag_names if name.strip()]
+        self.include_archived = include_archived
+        self.sort = sort if sort in SORT_MODES else DEFAULT_SORT
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(
+            query=args.get("q", ""),
+            tag_names=args.getlist("tag"),
+            include_archived=args.get("archived", "0") == "1",
+            sort=args.get("sort", DEFAULT_SORT),
+        )
+
+    def url_args(self):
+        """Arguments for ``url_for("notes.index", ...)`` that reproduce the filters."""
+        return {
+            "q": self.query,
+            "tag": self.tag_names,
+            "sort": self.sort,
+            "archived": "1" if self.include_archived else "0",
+        }
+
+    def criteria(self, tag_ids_by_name=None, model=Note):
+        """The WHERE clauses for the filters, as a list of SQL expressions.
+
+        ``model`` is Note or ArchivedNote; the archive table has no
+        ``note_tags`` rows, so its tag filter always reads ``tag_ids``.
+        """
+        criteria = []
+
+        if not self.include_archived:
+            # Must stay ``IS false`` to match the active-set partial indexes.
+            criteria.append(model.is_archived.is_(False))
+
+        if self.query:
+            search_query = func.plainto_tsquery("english", self.query)
+            criteria.append(model.search_vector.op("@@")(search_query))
+
+        if self.tag_names:
+            postgresql = db.engine.dialect.name == "postgresql"
+            if postgresql or model is not Note:
+                if tag_ids_by_name is None:
+                    tag_ids_by_name = dict(
+                        db.session.query(Tag.name, Tag.id).filter(
+                            Tag.name.in_(self.tag_names)
+                        )
+                    )
+                wanted = [tag_ids_by_name.get(name) for name in self.tag_names]
+                if None in wanted:
+                    criteria.append(false())
+                elif postgresql:
+                    # Served by the GIN index on notes.tag_ids.
+                    criteria.append(model.tag_ids.contains(wanted))
+                else:
+                    for tag_id in wanted:
+                        element = func.json_each(model.tag_ids).table_valued("value")
+                        match = select(1).select_from(element)
+                        criteria.append(exists(match.where(element.c.value == tag_id)))
+            else:
+                for tag_name in self.tag_names:
+                    criteria.append(Note.tags.any(Tag.name == tag_name))
+
+        return criteria
+
+    def apply(self, note_query=None, tag_ids_by_name=None, model=Note):
+        """Filter ``note_query`` (default ``model.query``) without ordering it."""
+        if note_query is None:
+            note_query = model.query
+        return note_query.filter(*self.criteria(tag_ids_by_name, model))
+
+    def order(self, note_query, model=Note):
+        if self.query:
+            search_query = func.plainto_tsquery("english", self.query)
+            return note_query.order_by(
+                func.ts_rank(model.search_vector, search_query).desc()
+            )
+
+        return note_query.order_by(*SORT_MODES[self.sort].order_by(model))
@@ -1,75 +1,151 @@
 # file: app/notes/routes.py
+import itertools
 import logging
 from datetime import datetime, timezone
 from flask import render_template, redirect, url_for, flash, request, abort, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import func, or_
+from sqlalchemy import and_, func, or_, true
+from sqlalchemy.orm import defer, selectinload
+from sqlalchemy.orm.exc import StaleDataError
 from app.notes import notes
-from app.notes.forms import NoteForm, DeleteNoteForm, ArchiveNoteForm
+from app.notes.query import SORT_MODES, NoteFilters
+from app.notes.forms import NoteForm, DeleteNoteForm, ArchiveNoteForm, BulkTagForm
+from app import archive, duplicates
+from app.attachments.store import extract_images
 from app.extensions import db
-from app.models import Note, Tag
+from app.jobs import enqueue
+from app.models import ArchivedNote, Note, NoteRevision, Tag
+from app.revisions import (
+    diff_lines,
+    ensure_history,
+    latest_revision,
+    merge_bodies,
+    previous_revision,
+    record_revision,
+    revision_body,
+)
+from app.similarity import related_notes
+from app.tags.bulk import add_tag, remove_tag
 from app.utils.markdown import render_markdown
+from app.utils.sections import split_sections, stored_sections, with_sections
+from app.utils.streaming import render_list
 
 logger = logging.getLogger(__name__)
 
 
+def _queue_search_refresh(note):
+    enqueue(
+        "notes.refresh_search",
+        {"note_ids": [note.id]},
+        dedupe_key=f"search:{note.id}",
+    )
+
+
+def _check_duplicates(note):
+    """Store the note's near-duplicate signature and warn about matches."""
+    match = duplicates.best_match(duplicates.stamp(note), exclude_id=note.id)
+    if match:
+        flash(f'This note looks like a near-duplicate of "{match[1].title}".', "warning")
+
+
+def _queue_related_refresh(note):
+    enqueue(
+        "notes.refresh_related",
+        {"note_ids": [note.id]},
+        dedupe_key=f"related:{note.id}",
+    )
+
+
+def _list_rows(query, model=Note):
+    """``query`` as a row iterator over a server-side cursor.
+
+    The list shows neither the body (deferred on the model) nor the search
+    columns, so they are not fetched; editors are loaded once per batch.
+    """
+    return query.options(
+        defer(model.search_vector),
+        defer(model.note_metadata),
+        selectinload(model.updated_by),
+    ).yield_per(current_app.config["LIST_STREAM_BATCH_SIZE"])
+
+
 @notes.route("/")
 @login_required
 def index():
-    query = request.args.get("q", "").strip()
-    tag_names = request.args.getlist("tag")
-    include_archived = request.args.get("archived", "0") == "1"
-    sort = request.args.get("sort", "updated_desc")
-
-    note_query = Note.query
-
-    if not include_archived:
-        note_query = note_query.filter_by(is_archived=False)
+    filters = NoteFilters.from_args(request.args)
 
-    if query:
-        search_query = func.plainto_tsquery("english", query)
-        note_query = note_query.filter(Note.search_vector.op("@@")(search_query))
-        note_query = note_query.order_by(
-            func.ts_rank(Note.search_vector, search_query).desc()
-        )
-    else:
-        if sort == "updated_desc":
-            note_query = note_query.order_by(Note.updated_at.desc())
-        elif sort == "updated_asc":
-            note_query = note_query.order_by(Note.updated_at.asc())
-        elif sort == "title_asc":
-            note_query = note_query.order_by(Note.title.asc())
-        elif sort == "title_desc":
-            note_query = note_query.order_by(Note.title.desc())
-        elif sort == "created_desc":
-            note_query = note_query.order_by(Note.created_at.desc())
-
-    if tag_names:
-        for tag_name in tag_names:
-            note_query = note_query.filter(Note.tags.any(Tag.name == tag_name.lower()))
-
-    notes_list = note_query.all()
     all_tags = Tag.query.order_by(Tag.name).all()
+    tag_ids_by_name = {tag.name: tag.id for tag in all_tags}
+
+    note_query = filters.apply(tag_ids_by_name=tag_ids_by_name)
+    notes_list = _list_rows(filters.order(note_query))
+    if filters.include_archived and archive.enabled():
+        # Swept notes are listed after the ones still in the notes table.
+        archived_query = filters.apply(
+            tag_ids_by_name=tag_ids_by_name, model=ArchivedNote
+        )
+        notes_list = itertools.chain(
+            notes_list,
+            _list_rows(filters.order(archived_query, model=ArchivedNote), ArchivedNote),
+        )
 
-    return render_template(
+    return render_list(
         "notes/index.html",
         notes=notes_list,
         all_tags=all_tags,
-        query=query,
-        selected_tags=tag_names,
-        include_archived=include_archived,
-        sort=sort,
+        tag_names_by_id={tag.id: tag.name for tag in all_tags},
+        query=filters.query,
+        selected_tags=filters.tag_names,
+        include_archived=filters.include_archived,
+        sort=filters.sort,
+        sort_modes=SORT_MODES,
+        bulk_form=BulkTagForm(),
     )
 
 
+@notes.route("/notes/bulk-tag", methods=["POST"])
+@login_required
+def bulk_tag():
+    # The list filters travel in the query string, the action in the form.
+    filters = NoteFilters.from_args(request.args)
+    form = BulkTagForm()
+
+    if form.validate_on_submit():
+        condition = and_(true(), *filters.criteria())
+        try:
+            if form.action.data == "add":
+                tag = Tag.get_or_create(form.tag.data)
+                db.session.flush()
+                count = add_tag(condition, tag, current_user.id)
+                message = f'Added tag "{tag.name}" to {count} note(s).'
+            else:
+                tag_name = form.tag.data.strip().lower()
+                tag = Tag.query.filter_by(name=tag_name).first()
+                count = remove_tag(condition, tag, current_user.id) if tag else 0
+                message = f'Removed tag "{tag_name}" from {count} note(s).'
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Bulk tag update failed")
+            flash("Bulk tag update failed; no notes were changed.", "danger")
+        else:
+            logger.info("%s by %s", message, current_user.email)
+            flash(message, "success")
+    else:
+        flash("Choose an action and a tag name.", "warning")
+
+    return redirect(url_for("notes.index", **filters.url_args()))
+
+
 @notes.route("/notes/new", methods=["GET", "POST"])
 @login_required
 def new():
-    logger.info(f"User {current_user.email} accessing new note form")
+    logger.info("User %s accessing new note form", current_user.email)
     form = NoteForm()
 
     if form.validate_on_submit():
-        logger.info(f"Creating new note: {form.title.data} by {current_user.email}")
+        logger.info("Creating new note: %s by %s", form.title.data, current_user.email)
+        form.body.data = extract_images(form.body.data)
         note = Note(
             title=form.title.data,
             body=form.body.data,
@@ -87,64 +163,282 @@ def new():
                 note.tags.append(tag)
 
         db.session.add(note)
+        db.session.flush()
+        note.sync_tag_ids()
+        _check_duplicates(note)
+        note.note_metadata = with_sections(note.note_metadata, note.body)
+        record_revision(note, current_user.id)
+        _queue_search_refresh(note)
+        _queue_related_refresh(note)
         db.session.commit()
 
-        logger.info(f"Note created successfully: {note.id}")
+        logger.info("Note created successfully: %s", note.id)
 
         flash("Note created successfully!", "success")
         return redirect(url_for("notes.view", note_id=note.id))
 
-    logger.debug(f"Form validation failed: {form.errors}")
+    if form.is_submitted():
+        logger.debug("Form validation failed: %s", form.errors)
     return render_template("notes/edit.html", form=form, action="Create")
 
 
-@notes.route("/notes/<note_id>", methods=["GET"])
+def _related(note):
+    if note.is_archived:
+        return []
+    return related_notes(note.id, current_app.config["RELATED_NOTES_SHOWN"])
+
+
+def _version(note):
+    return note.updated_at.isoformat() if note.updated_at else ""
+
+
+def _sections(note):
+    """The first sections of a long body, rendered, and URLs for the rest.
+
+    Returns ``(html, urls)``. Short bodies render whole with no URLs. Long
+    ones use the offsets stored at save time, and only the first sections
+    are read from the database.
+    """
+    config = current_app.config
+    model = type(note)
+    length = db.session.execute(
+        db.select(func.length(model.body)).where(model.id == note.id)
+    ).scalar()
+    if not length or length <= config["NOTE_PROGRESSIVE_CHARS"]:
+        return render_markdown(note.body), []
+
+    sections = stored_sections(note.note_metadata, length)
+    if sections is None:
+        # Saved before offsets were stored: split the whole body this once.
+        sections = split_sections(note.body, config["NOTE_SECTION_CHARS"])
+    shown = sections[: config["NOTE_FIRST_SECTIONS"]]
+    start, end = shown[0][0], shown[-1][1]
+    text = db.session.execute(
+        db.select(func.substr(model.body, start + 1, end - start)).where(model.id == note.id)
+    ).scalar()
+    html = render_markdown(text)
+    urls = [
+        url_for("notes.section", note_id=note.id, start=start, end=end, v=_version(note))
+        for start, end in sections[len(shown) :]
+    ]
+    return html, urls
+
+
+@notes.route("/notes/<uuid_str:note_id>", methods=["GET"])
 @login_required
 def view(note_id):
-    note = Note.query.get_or_404(note_id)
-    rendered_body = render_markdown(note.body)
+    note = archive.get_or_404(note_id)
+    rendered_body, section_urls = _sections(note)
 
-    return render_template("notes/view.html", note=note, rendered_body=rendered_body)
+    return render_template(
+        "notes/view.html",
+        note=note,
+        rendered_body=rendered_body,
+        section_urls=section_urls,
+        swept=isinstance(note, ArchivedNote),
+        related=_related(note),
+    )
 
 
-@notes.route("/notes/<note_id>/edit", methods=["GET", "POST"])
+@notes.route("/notes/<uuid_str:note_id>/section", methods=["GET"])
+@login_required
+def section(note_id):
+    """One slice of a long body, rendered, for the progressive view.
+
+    Only the slice is read from the database. ``v`` is the note's
+    ``updated_at`` when the page was rendered; if the note has changed
+    since, the offsets no longer apply and the page must be reloaded.
+    """
+    start = request.args.get("start", type=int)
+    end = request.args.get("end", type=int)
+    if start is None or end is None or start < 0 or end <= start:
+        abort(400)
+
+    row = None
+    for model in (Note, ArchivedNote) if archive.enabled() else (Note,):
+        row = db.session.execute(
+            db.select(func.substr(model.body, start + 1, end - start), model.updated_at)
+            .where(model.id == note_id)
+        ).first()
+        if row is not None:
+            break
+    if row is None:
+        abort(404)
+    text, updated_at = row
+    if (updated_at.isoformat() if updated_at else "") != request.args.get("v"):
+        abort(409)
+    return render_markdown(text)
+
+
+@notes.route("/notes/<uuid_str:note_id>/edit", methods=["GET", "POST"])
 @login_required
 def edit(note_id):
     note = Note.query.get_or_404(note_id)
-    logger.info(f"User {current_user.email} editing note: {note.id}")
+    logger.info("User %s editing note: %s", current_user.email, note.id)
     form = NoteForm(obj=note)
+    # Without it the field falls back to the note's own version, and a
+    # stale form would overwrite whatever was saved since.
+    if form.is_submitted() and not form.version.raw_data:
+        abort(400)
 
     if form.validate_on_submit():
-        logger.info(f"Updating note: {note.id} by {current_user.email}")
-        note.title = form.title.data
-        note.body = form.body.data
-        note.summary = form.summary.data
-        note.source = form.source.data
-        note.updated_by_id = current_user.id
-        note.updated_at = datetime.now(timezone.utc)
-
-        note.tags.clear()
-        tags_input = form.tags.data or ""
-        tag_names = [t.strip().lower() for t in tags_input.split(",") if t.strip()]
-        for tag_name in set(tag_names):
-            tag = Tag.get_or_create(tag_name)
-            if tag:
-                note.tags.append(tag)
-
+        form.body.data = extract_images(form.body.data)
+        if form.version.data != note.version:
+            return _conflict(note, form)
+        logger.info("Updating note: %s by %s", note.id, current_user.email)
+        try:
+            ensure_history(note)
+            tags_input = form.tags.data or ""
+            tag_names = [t.strip().lower() for t in tags_input.split(",") if t.strip()]
+            tags = [tag for tag in map(Tag.get_or_create, set(tag_names)) if tag]
+            # New tags get their ids before the note changes, so the note
+            # is written by the single conditional UPDATE below.
+            db.session.flush()
+
+            with db.session.no_autoflush:
+                note.title = form.title.data
+                note.body = form.body.data
+                note.summary = form.summary.data
+                note.source = form.source.data
+                note.updated_by_id = current_user.id
+                note.updated_at = datetime.now(timezone.utc)
+                note.tags = tags
+                note.sync_tag_ids()
+                _check_duplicates(note)
+                note.note_metadata = with_sections(note.note_metadata, note.body)
+            # UPDATE ... WHERE id = ? AND version = ?, the version checked above.
+            db.session.flush()
+        except StaleDataError:
+            db.session.rollback()
+            return _conflict(Note.query.get_or_404(note_id), form)
+
+        record_revision(note, current_user.id)
+        _queue_search_refresh(note)
+        _queue_related_refresh(note)
         db.session.commit()
 
-        logger.info(f"Note updated successfully: {note.id}")
+        logger.info("Note updated successfully: %s", note.id)
 
         flash("Note updated successfully!", "success")
         return redirect(url_for("notes.view", note_id=note.id))
 
     if not form.tags.data:
         form.tags.data = ", ".join([t.name for t in note.tags])
+    if not form.is_submitted():
+        latest = latest_revision(note.id)
+        form.base_revision.data = latest.number if latest else ""
 
     return render_template("notes/edit.html", form=form, action="Edit", note=note)
 
 
-@notes.route("/notes/<note_id>/delete", methods=["GET", "POST"])
+def _conflict(note, form):
+    """409: ``form`` was filled from an older version of ``note``.
+
+    Title and body are merged three ways against the revision the form
+    started from; the other fields keep the submitted values. The form is
+    re-rendered on top of the current version, ready to save again.
+    """
+    logger.info("Edit conflict on note %s by %s", note.id, current_user.email)
+    # A form filled before the note had any history started from the first
+    # revision, which the other save recorded. An unknown revision falls
+    # back to the current one: the merge then keeps your edit throughout.
+    number = form.base_revision.data if any(form.base_revision.raw_data) else 1
+    base = NoteRevision.query.filter_by(note_id=note.id, number=number).first()
+    if base is None:
+        base = latest_revision(note.id)
+    base_title = base.title if base else ""
+    base_body = revision_body(base) if base else ""
+
+    yours, theirs = form.body.data, note.body
+    body, conflicts = merge_bodies(base_body, yours, theirs)
+    if form.title.data == base_title:
+        form.title.data = note.title
+    form.body.data = body
+    form.version.data = note.version
+    latest = latest_revision(note.id)
+    form.base_revision.data = latest.number if latest else ""
+
+    return (
+        render_template(
+            "notes/conflict.html",
+            form=form,
+            note=note,
+            conflicts=conflicts,
+            current_tags=", ".join(t.name for t in note.tags),
+            their_changes=diff_lines(base_body, theirs),
+            your_changes=diff_lines(base_body, yours),
+        ),
+        409,
+    )
+
+
+@notes.route("/notes/<uuid_str:note_id>/history", methods=["GET"])
+@login_required
+def history(note_id):
+    note = Note.query.get_or_404(note_id)
+    page = request.args.get("page", 1, type=int)
+    pagination = (
+        note.revisions.options(defer(NoteRevision.data))
+        .order_by(None)
+        .order_by(NoteRevision.number.desc())
+        .paginate(
+            page=page,
+            per_page=current_app.config["REVISIONS_PER_PAGE"],
+            error_out=False,
+        )
+    )
+
+    return render_template("notes/history.html", note=note, pagination=pagination)
+
+
+def _get_revision_or_404(note_id, number):
+    return NoteRevision.query.filter_by(note_id=note_id, number=number).first_or_404()
+
+
+@notes.route("/notes/<uuid_str:note_id>/history/<int:number>", methods=["GET"])
+@login_required
+def revision(note_id, number):
+    note = Note.query.get_or_404(note_id)
+    rev = _get_revision_or_404(note_id, number)
+    rendered_body = render_markdown(revision_body(rev))
+
+    return render_template(
+        "notes/revision.html",
+        note=note,
+        revision=rev,
+        previous=previous_revision(rev),
+        rendered_body=rendered_body,
+    )
+
+
+@notes.route("/notes/<uuid_str:note_id>/diff", methods=["GET"])
+@login_required
+def diff(note_id):
+    note = Note.query.get_or_404(note_id)
+
+    to_number = request.args.get("to", type=int)
+    if to_number is None:
+        new = latest_revision(note_id)
+        if new is None:
+            abort(404)
+    else:
+        new = _get_revision_or_404(note_id, to_number)
+
+    from_number = request.args.get("from", type=int)
+    if from_number is None:
+        old = previous_revision(new)
+    else:
+        old = _get_revision_or_404(note_id, from_number)
+
+    old_body = revision_body(old) if old else ""
+    lines = diff_lines(old_body, revision_body(new))
+
+    return render_template(
+        "notes/diff.html", note=note, old=old, new=new, lines=lines
+    )
+
+
+@notes.route("/notes/<uuid_str:note_id>/delete", methods=["GET", "POST"])
 @login_required
 def delete(note_id):
     note = Note.query.get_or_404(note_id)
@@ -159,13 +453,19 @@ def delete(note_id):
     return render_template("notes/confirm_delete.html", form=form, note=note)
 
 
-@notes.route("/notes/<note_id>/archive", methods=["POST"])
+@notes.route("/notes/<uuid_str:note_id>/archive", methods=["POST"])
 @login_required
 def toggle_archive(note_id):
-    note = Note.query.get_or_404(note_id)
+    note = db.session.get(Note, note_id)
+    if note is None and archive.enabled():
+        note = archive.restore(note_id)
+    if note is None:
+        abort(404)
     note.is_archived = not note.is_archived
     note.updated_at = datetime.now(timezone.utc)
     note.updated_by_id = current_user.id
+    db.session.flush()
+    _queue_related_refresh(note)
     db.session.commit()
 
     status = "archived" if note.is_archived else "unarchived"
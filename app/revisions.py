@@ -0,0 +1,359 @@
+# file: app/revisions.py
+import difflib
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, func, insert
+
+from app.extensions import db
+from app.models import Note, NoteRevision
+
+SNAPSHOT = "snapshot"
+DELTA = "delta"
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def make_delta(old, new):
+    """Line edits turning ``old`` into ``new``, as ``[[start, end, lines], ...]``."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    return [
+        [i1, i2, new_lines[j1:j2]]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    lines = []
+    position = 0
+    for start, end, replacement in delta:
+        lines.extend(old_lines[position:start])
+        lines.extend(replacement)
+        position = end
+    lines.extend(old_lines[position:])
+    return "".join(lines)
+
+
+def _encode(previous, body, deltas_since_snapshot):
+    """Return ``(kind, data)`` for ``body`` stored after ``previous``."""
+    snapshot = _pack(body)
+    interval = current_app.config["REVISION_SNAPSHOT_INTERVAL"]
+    if previous is None or deltas_since_snapshot + 1 >= interval:
+        return SNAPSHOT, snapshot
+
+    delta = _pack(make_delta(previous, body))
+    # A rewrite can produce a delta larger than the text itself.
+    if len(delta) >= len(snapshot):
+        return SNAPSHOT, snapshot
+    return DELTA, delta
+
+
+def _chain(note_id, number):
+    """Revisions from the nearest snapshot up to ``number``, oldest first."""
+    base = (
+        db.session.query(func.max(NoteRevision.number))
+        .filter(
+            NoteRevision.note_id == note_id,
+            NoteRevision.kind == SNAPSHOT,
+            NoteRevision.number <= number,
+        )
+        .scalar()
+    )
+    return (
+        NoteRevision.query.filter(
+            NoteRevision.note_id == note_id,
+            NoteRevision.number.between(base, number),
+        )
+        .order_by(NoteRevision.number)
+        .all()
+    )
+
+
+def _rebuild(chain):
+    body = _unpack(chain[0].data)
+    for revision in chain[1:]:
+        body = apply_delta(body, _unpack(revision.data))
+    return body
+
+
+def revision_body(revision):
+    """Rebuild the body of ``revision``, applying at most one interval of deltas."""
+    if revision.kind == SNAPSHOT:
+        return _unpack(revision.data)
+    return _rebuild(_chain(revision.note_id, revision.number))
+
+
+def latest_revision(note_id):
+    return (
+        NoteRevision.query.filter_by(note_id=note_id)
+        .order_by(NoteRevision.number.desc())
+        .first()
+    )
+
+
+def _next_revision(chain, title, body):
+    """``(number, kind, data)`` of the revision after ``chain``, or None.
+
+    ``chain`` runs from the nearest snapshot to the latest revision (empty for
+    a note without history); None means nothing changed.
+    """
+    if not chain:
+        return (1,) + _encode(None, body, 0)
+    previous = _rebuild(chain)
+    last = chain[-1]
+    if previous == body and last.title == title:
+        return None
+    return (last.number + 1,) + _encode(previous, body, len(chain) - 1)
+
+
+def record_revision(note, user_id=None, created_at=None):
+    """Store the note's current title and body as its next revision.
+
+    Returns the new revision, or None when nothing changed since the last one.
+    """
+    last = latest_revision(note.id)
+    chain = _chain(note.id, last.number) if last is not None else []
+    revision = _next_revision(chain, note.title, note.body)
+    if revision is None:
+        return None
+
+    number, kind, data = revision
+    revision = NoteRevision(
+        note_id=note.id,
+        number=number,
+        kind=kind,
+        title=note.title,
+        data=data,
+        body_size=len(note.body.encode("utf-8")),
+        created_by_id=user_id or note.updated_by_id,
+        created_at=created_at or datetime.now(timezone.utc),
+    )
+    db.session.add(revision)
+    return revision
+
+
+def record_revisions(changes, user_id, created_at):
+    """Batched ``record_revision``: one query for every chain, one INSERT.
+
+    ``changes`` holds ``(note_id, title, body, before)`` tuples. ``before`` is
+    None for a new note, otherwise the ``(title, body, updated_by_id,
+    updated_at)`` the note had before the change; like ``ensure_history``,
+    it is stored first when the note has no revisions yet.
+    """
+    note_ids = [note_id for note_id, _, _, before in changes if before is not None]
+    chains = {}
+    if note_ids:
+        base = (
+            db.session.query(
+                NoteRevision.note_id, func.max(NoteRevision.number).label("number")
+            )
+            .filter(NoteRevision.note_id.in_(note_ids), NoteRevision.kind == SNAPSHOT)
+            .group_by(NoteRevision.note_id)
+            .subquery()
+        )
+        stored = (
+            NoteRevision.query.join(
+                base,
+                and_(
+                    NoteRevision.note_id == base.c.note_id,
+                    NoteRevision.number >= base.c.number,
+                ),
+            )
+            .order_by(NoteRevision.note_id, NoteRevision.number)
+            .all()
+        )
+        for revision in stored:
+            chains.setdefault(revision.note_id, []).append(revision)
+
+    rows = []
+    for note_id, title, body, before in changes:
+        chain = chains.get(note_id, [])
+        if before is not None and not chain:
+            old_title, old_body = before[:2]
+            rows.append(_row(note_id, 1, SNAPSHOT, _pack(old_body), *before))
+            if (old_title, old_body) == (title, body):
+                continue
+            revision = (2,) + _encode(old_body, body, 0)
+        else:
+            revision = _next_revision(chain, title, body)
+            if revision is None:
+                continue
+        number, kind, data = revision
+        rows.append(_row(note_id, number, kind, data, title, body, user_id, created_at))
+
+    if rows:
+        db.session.execute(insert(NoteRevision), rows)
+    return len(rows)
+
+
+def _row(note_id, number, kind, data, title, body, user_id, created_at):
+    """A ``note_revisions`` row for a bulk INSERT."""
+    return {
+        "note_id": note_id,
+        "number": number,
+        "kind": kind,
+        "title": title,
+        "data": data,
+        "body_size": len(body.encode("utf-8")),
+        "created_by_id": user_id,
+        "created_at": created_at,
+    }
+
+
+def ensure_history(note):
+    """Give notes written before revisions existed a first revision."""
+    if latest_revision(note.id) is None:
+        record_revision(note, user_id=note.updated_by_id, created_at=note.updated_at)
+
+
+def previous_revision(revision):
+    return (
+        NoteRevision.query.filter(
+            NoteRevision.note_id == revision.note_id,
+            NoteRevision.number < revision.number,
+        )
+        .order_by(NoteRevision.number.desc())
+        .first()
+    )
+
+
+def diff_lines(old, new, context=3):
+    """Unified diff of two bodies as ``(css_class, line)`` pairs."""
+    lines = []
+    for line in difflib.unified_diff(
+        old.splitlines(), new.splitlines(), lineterm="", n=context
+    ):
+        if line.startswith(("---", "+++")):
+            continue
+        if line.startswith("@@"):
+            css = "diff-hunk"
+        elif line.startswith("+"):
+            css = "diff-add"
+        elif line.startswith("-"):
+            css = "diff-del"
+        else:
+            css = ""
+        lines.append((css, line))
+    return lines
+
+
+def _changes(base, other):
+    """``(start, end, lines)`` edits turning ``base`` into ``other``."""
+    matcher = difflib.SequenceMatcher(None, base, other, autojunk=False)
+    return [
+        (i1, i2, other[j1:j2])
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def _apply(base, start, end, changes):
+    lines, position = [], start
+    for i1, i2, replacement in changes:
+        lines += base[position:i1] + replacement
+        position = i2
+    return lines + base[position:end]
+
+
+def merge_bodies(base, yours, theirs):
+    """Three-way merge of two edits of ``base``, line by line.
+
+    Returns ``(text, conflicts)``. Edits to separate parts of the body are
+    both kept; where the two touch the same lines differently, the text
+    holds both between conflict markers, yours first.
+    """
+    base = base.splitlines()
+    changes = sorted(
+        [(i1, i2, lines, "yours") for i1, i2, lines in _changes(base, yours.splitlines())]
+        + [(i1, i2, lines, "theirs") for i1, i2, lines in _changes(base, theirs.splitlines())],
+        key=lambda change: change[:2],
+    )
+    merged, conflicts, position, index = [], 0, 0, 0
+    while index < len(changes):
+        # A run of edits whose base ranges overlap or touch merges as one.
+        start, end = changes[index][:2]
+        group = [changes[index]]
+        index += 1
+        while index < len(changes) and changes[index][0] <= end:
+            end = max(end, changes[index][1])
+            group.append(changes[index])
+            index += 1
+        sides = {
+            side: _apply(base, start, end, [c[:3] for c in group if c[3] == side])
+            for side in ("yours", "theirs")
+            if any(c[3] == side for c in group)
+        }
+        merged += base[position:start]
+        if len(sides) == 1 or sides["yours"] == sides["theirs"]:
+            merged += next(iter(sides.values()))
+        else:
+            conflicts += 1
+            merged += ["<<<<<<< your edit"] + sides["yours"] + ["======="]
+            merged += sides["theirs"] + [">>>>>>> saved meanwhile"]
+        position = end
+    merged += base[position:]
+    return "\n".join(merged), conflicts
+
+
+def compact_note(note_id, keep_last, keep_days, reencode=False):
+    """Drop old revisions of one note and re-encode the rest.
+
+    A revision is dropped when it is older than ``keep_days`` and not among the
+    newest ``keep_last``. The surviving chain is rewritten so that every delta
+    is against the previous surviving revision. Returns the number dropped.
+    """
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=keep_days)
+    revisions = (
+        NoteRevision.query.filter_by(note_id=note_id)
+        .order_by(NoteRevision.number)
+        .all()
+    )
+    recent = {r.id for r in revisions[-keep_last:]} if keep_last else set()
+    dropped = [
+        r for r in revisions if r.id not in recent and r.created_at < cutoff
+    ]
+    if not dropped and not reencode:
+        return 0
+
+    dropped_ids = {r.id for r in dropped}
+    body = None
+    previous = None
+    deltas = 0
+    for revision in revisions:
+        if revision.kind == SNAPSHOT:
+            body = _unpack(revision.data)
+        else:
+            body = apply_delta(body, _unpack(revision.data))
+
+        if revision.id in dropped_ids:
+            db.session.delete(revision)
+            continue
+
+        kind, data = _encode(previous, body, deltas)
+        revision.kind = kind
+        revision.data = data
+        deltas = 0 if kind == SNAPSHOT else deltas + 1
+        previous = body
+
+    return len(dropped)
+
+
+def history_stats():
+    """``(revisions, stored bytes, live body bytes)`` across the KB."""
+    revisions, stored = db.session.query(
+        func.count(NoteRevision.id), func.coalesce(func.sum(func.length(NoteRevision.data)), 0)
+    ).one()
+    live = db.session.query(func.coalesce(func.sum(func.length(Note.body)), 0)).scalar()
+    return revisions, stored, live
@@ -0,0 +1,287 @@
+# file: app/similarity.py
+"""Related notes: precomputed top-K neighbours per note.
+
+A note's neighbours are scored as
+
+    score = (1 - w) * terms + w * tags
+
+where ``terms`` is the MinHash estimate of the Jaccard similarity of the
+notes' title and body terms, ``tags`` the Jaccard similarity of their tags
+and ``w`` RELATED_TAG_WEIGHT. Candidates come from shared LSH buckets
+(``note_signature_bands``) and shared tags, so a refresh never compares a
+note with the whole KB. Archived notes neither have nor appear as
+neighbours.
+
+``refresh_note`` runs after each save (``notes.refresh_related`` job) and
+fixes up the neighbour lists of the notes it touches; ``rebuild`` recomputes
+everything in memory (``flask rebuild-related``).
+"""
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from flask import current_app
+
+from app.extensions import db
+from app.models import (
+    Note,
+    NoteSignature,
+    NoteSimilarity,
+    note_signature_bands,
+    note_tags,
+)
+from app.utils import minhash
+
+# 32 bands of 2 rows: pairs with term similarity 0.2 share a bucket with
+# probability ~0.73, pairs at 0.4 with ~0.99.
+LSH_BANDS = 32
+# Candidates considered per note from each source.
+MAX_BAND_CANDIDATES = 1000
+MAX_TAG_CANDIDATES = 200
+# Buckets this large hold common term pairs and say little about topic.
+MAX_BUCKET_SIZE = 500
+
+
+def note_signature(title, body):
+    return minhash.signature(minhash.terms(f"{title}\n{body}"))
+
+
+def score(left_sig, left_tags, right_sig, right_tags, tag_weight):
+    return (1 - tag_weight) * minhash.similarity(
+        left_sig, right_sig
+    ) + tag_weight * minhash.jaccard(left_tags, right_tags)
+
+
+def _settings():
+    config = current_app.config
+    return (
+        config["RELATED_NOTES_K"],
+        config["RELATED_MIN_SCORE"],
+        config["RELATED_TAG_WEIGHT"],
+    )
+
+
+def forget(note_ids):
+    """Drop signatures and neighbour rows of notes that left the active set."""
+    for table, column in (
+        (NoteSignature.__table__, NoteSignature.note_id),
+        (note_signature_bands, note_signature_bands.c.note_id),
+        (NoteSimilarity.__table__, NoteSimilarity.note_id),
+        (NoteSimilarity.__table__, NoteSimilarity.related_id),
+    ):
+        db.session.execute(sa.delete(table).where(column.in_(note_ids)))
+
+
+def _store_signature(note_id, sig):
+    db.session.execute(sa.delete(NoteSignature).where(NoteSignature.note_id == note_id))
+    db.session.execute(
+        sa.delete(note_signature_bands).where(note_signature_bands.c.note_id == note_id)
+    )
+    if sig is None:
+        return []
+    buckets = minhash.band_buckets(sig, LSH_BANDS)
+    db.session.execute(
+        sa.insert(NoteSignature),
+        [{"note_id": note_id, "minhash": sig, "computed_at": datetime.now(timezone.utc)}],
+    )
+    db.session.execute(
+        sa.insert(note_signature_bands),
+        [{"note_id": note_id, "band": band, "bucket": bucket} for band, bucket in buckets],
+    )
+    return buckets
+
+
+def _candidate_ids(note_id, buckets, tag_ids):
+    candidates = set()
+    if buckets:
+        rows = db.session.execute(
+            sa.select(note_signature_bands.c.note_id)
+            .where(
+                sa.tuple_(note_signature_bands.c.band, note_signature_bands.c.bucket).in_(
+                    buckets
+                ),
+                note_signature_bands.c.note_id != note_id,
+            )
+            .distinct()
+            .limit(MAX_BAND_CANDIDATES)
+        )
+        candidates.update(rows.scalars())
+    if tag_ids:
+        shared = sa.func.count()
+        rows = db.session.execute(
+            sa.select(note_tags.c.note_id)
+            .where(note_tags.c.tag_id.in_(tag_ids), note_tags.c.note_id != note_id)
+            .group_by(note_tags.c.note_id)
+            .order_by(shared.desc())
+            .limit(MAX_TAG_CANDIDATES)
+        )
+        candidates.update(rows.scalars())
+    return candidates
+
+
+def refresh_note(note_id):
+    """Recompute one note's signature and neighbours. The caller commits.
+
+    The note is also added to, or removed from, its candidates' lists, which
+    are trimmed back to RELATED_NOTES_K.
+    """
+    k, min_score, tag_weight = _settings()
+    note = db.session.execute(
+        sa.select(Note.id, Note.title, Note.body, Note.tag_ids, Note.is_archived).where(
+            Note.id == note_id
+        )
+    ).first()
+    if note is None or note.is_archived:
+        forget([note_id])
+        return
+
+    sig = note_signature(note.title, note.body)
+    buckets = _store_signature(note_id, sig)
+    candidate_ids = _candidate_ids(note_id, buckets, note.tag_ids)
+
+    scored = []
+    if candidate_ids:
+        rows = db.session.execute(
+            sa.select(Note.id, Note.tag_ids, NoteSignature.minhash)
+            .outerjoin(NoteSignature, NoteSignature.note_id == Note.id)
+            .where(Note.id.in_(candidate_ids), Note.is_archived.is_(False))
+        )
+        for other_id, other_tags, other_sig in rows:
+            value = score(sig, note.tag_ids, other_sig, other_tags, tag_weight)
+            if value >= min_score:
+                scored.append((value, other_id))
+    scored.sort(reverse=True)
+
+    table = NoteSimilarity.__table__
+    db.session.execute(
+        sa.delete(table).where(
+            sa.or_(table.c.note_id == note_id, table.c.related_id == note_id)
+        )
+    )
+    if not scored:
+        return
+    db.session.execute(
+        sa.insert(table),
+        [
+            {"note_id": note_id, "related_id": other_id, "score": value}
+            for value, other_id in scored[:k]
+        ]
+        + [
+            {"note_id": other_id, "related_id": note_id, "score": value}
+            for value, other_id in scored
+        ],
+    )
+    # Keep each touched list at its top k.
+    others = sa.bindparam("other_id")
+    keep = (
+        sa.select(table.c.related_id)
+        .where(table.c.note_id == others)
+        .order_by(table.c.score.desc(), table.c.related_id)
+        .limit(k)
+    )
+    db.session.execute(
+        sa.delete(table).where(table.c.note_id == others, table.c.related_id.not_in(keep)),
+        [{"other_id": other_id} for _, other_id in scored],
+    )
+
+
+def related_notes(note_id, limit):
+    """``(id, title, score)`` rows of the note's best active neighbours."""
+    return db.session.execute(
+        sa.select(Note.id, Note.title, NoteSimilarity.score)
+        .join(NoteSimilarity, NoteSimilarity.related_id == Note.id)
+        .where(NoteSimilarity.note_id == note_id, Note.is_archived.is_(False))
+        .order_by(NoteSimilarity.score.desc(), Note.id)
+        .limit(limit)
+    ).all()
+
+
+def rebuild(batch_size=1000, progress=None):
+    """Recompute every signature and neighbour list in memory. Commits.
+
+    Returns ``(notes, pairs)``. ``progress`` is called with a message now and
+    then.
+    """
+    k, min_score, tag_weight = _settings()
+    for table in (NoteSimilarity.__table__, note_signature_bands, NoteSignature.__table__):
+        db.session.execute(sa.delete(table))
+
+    signatures = {}
+    tags = {}
+    bucket_index = defaultdict(list)
+    tag_index = defaultdict(list)
+    pending_signatures, pending_bands = [], []
+    now = datetime.now(timezone.utc)
+
+    def flush_signatures():
+        if pending_signatures:
+            db.session.execute(sa.insert(NoteSignature), pending_signatures)
+            db.session.execute(sa.insert(note_signature_bands), pending_bands)
+        pending_signatures.clear()
+        pending_bands.clear()
+
+    rows = db.session.execute(
+        sa.select(Note.id, Note.title, Note.body, Note.tag_ids)
+        .where(Note.is_archived.is_(False))
+        .execution_options(yield_per=batch_size)
+    )
+    for note_id, title, body, tag_ids in rows:
+        sig = note_signature(title, body)
+        tags[note_id] = tag_ids or []
+        for tag_id in tags[note_id]:
+            tag_index[tag_id].append(note_id)
+        if sig is None:
+            continue
+        signatures[note_id] = array("I", sig)
+        pending_signatures.append({"note_id": note_id, "minhash": sig, "computed_at": now})
+        for band, bucket in minhash.band_buckets(sig, LSH_BANDS):
+            bucket_index[(band, bucket)].append(note_id)
+            pending_bands.append({"note_id": note_id, "band": band, "bucket": bucket})
+        if len(pending_signatures) >= batch_size:
+            flush_signatures()
+    flush_signatures()
+    if progress:
+        progress(f"Signed {len(signatures)} of {len(tags)} notes")
+
+    note_buckets = defaultdict(list)
+    for key, members in bucket_index.items():
+        if 1 < len(members) <= MAX_BUCKET_SIZE:
+            for note_id in members:
+                note_buckets[note_id].append(key)
+
+    pairs = 0
+    pending = []
+    for done, (note_id, note_tags_) in enumerate(tags.items(), start=1):
+        candidates = Counter()
+        for key in note_buckets.get(note_id, ()):
+            candidates.update(bucket_index[key])
+        tag_candidates = Counter()
+        # Rarest tags first, so popular tags do not crowd out specific ones.
+        for tag_id in sorted(note_tags_, key=lambda t: len(tag_index[t])):
+            if len(tag_candidates) >= MAX_TAG_CANDIDATES:
+                break
+            tag_candidates.update(tag_index[tag_id])
+        candidates.update(tag_candidates)
+        candidates.pop(note_id, None)
+
+        sig = signatures.get(note_id)
+        scored = []
+        for other_id in candidates:
+            value = score(sig, note_tags_, signatures.get(other_id), tags[other_id], tag_weight)
+            if value >= min_score:
+                scored.append((value, other_id))
+        scored.sort(reverse=True)
+        for value, other_id in scored[:k]:
+            pending.append({"note_id": note_id, "related_id": other_id, "score": value})
+        pairs += min(len(scored), k)
+
+        if len(pending) >= batch_size:
+            db.session.execute(sa.insert(NoteSimilarity), pending)
+            pending.clear()
+        if progress and done % 10000 == 0:
+            progress(f"Scored {done} notes")
+    if pending:
+        db.session.execute(sa.insert(NoteSimilarity), pending)
+    db.session.commit()
+    return len(tags), pairs
@@ -0,0 +1,52 @@
+/* file: app/static/sections.js */
+/* Fills in the sections of a long note, in order, as the reader nears them. */
+(function () {
+    var pending = Array.prototype.slice.call(document.querySelectorAll("[data-section-src]"));
+    var loading = false;
+    var watch = "IntersectionObserver" in window;
+
+    function near(element) {
+        return !watch || element.getBoundingClientRect().top < window.innerHeight * 3;
+    }
+
+    function loadNext() {
+        if (loading || !pending.length || !near(pending[0])) {
+            return;
+        }
+        var placeholder = pending.shift();
+        loading = true;
+        fetch(placeholder.getAttribute("data-section-src"), { credentials: "same-origin" })
+            .then(function (response) {
+                if (response.status === 409) {
+                    placeholder.textContent = "This note has changed. Reload the page to see the rest.";
+                    pending = [];
+                    return;
+                }
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text().then(function (html) {
+                    placeholder.outerHTML = html;
+                });
+            })
+            .catch(function () {
+                placeholder.textContent = "This section could not be loaded.";
+            })
+            .then(function () {
+                loading = false;
+                loadNext();
+            });
+    }
+
+    if (watch) {
+        var observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    loadNext();
+                }
+            });
+        }, { rootMargin: "200% 0px" });
+        pending.forEach(function (placeholder) { observer.observe(placeholder); });
+    }
+    loadNext();
+})();
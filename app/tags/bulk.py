@@ -0,0 +1,133 @@
+# file: app/tags/bulk.py
+"""Set-based tag operations.
+
+Each operation runs a fixed handful of statements on ``note_tags`` and
+``notes`` (and, for a merge, ``notes_archive``) and never loads ``Note``
+objects. The caller owns the transaction:
+commit on success, roll back on error.
+"""
+from datetime import datetime, timezone
+
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.extensions import db
+from app.models import Note, Tag, note_tags
+
+# The ids an operation applies to, fixed up front so that later statements
+# are not affected by the tag changes made by earlier ones.
+_selected = sa.Table(
+    "bulk_selected_notes",
+    sa.MetaData(),
+    sa.Column("id", Note.__table__.c.id.type, primary_key=True),
+    prefixes=["TEMPORARY"],
+)
+
+
+def _select_notes(condition):
+    connection = db.session.connection()
+    _selected.drop(connection, checkfirst=True)
+    _selected.create(connection)
+    db.session.execute(
+        sa.insert(_selected).from_select(["id"], sa.select(Note.id).where(condition))
+    )
+    return db.session.execute(sa.select(sa.func.count()).select_from(_selected)).scalar()
+
+
+def _release():
+    _selected.drop(db.session.connection(), checkfirst=True)
+
+
+def _touch(user_id):
+    db.session.execute(
+        sa.update(Note)
+        .where(Note.id.in_(sa.select(_selected.c.id)))
+        .values(
+            updated_at=datetime.now(timezone.utc),
+            updated_by_id=user_id,
+            # Open edit forms of these notes are now out of date.
+            version=Note.version + 1,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def _link_selected(tag_id):
+    insert = postgresql.insert if db.engine.dialect.name == "postgresql" else sqlite.insert
+    rows = sa.select(_selected.c.id, sa.literal(tag_id, sa.Integer)).where(sa.true())
+    db.session.execute(
+        insert(note_tags)
+        .from_select(["note_id", "tag_id"], rows)
+        .on_conflict_do_nothing()
+    )
+
+
+def _has_tag(tag_id):
+    return sa.exists().where(note_tags.c.note_id == Note.id, note_tags.c.tag_id == tag_id)
+
+
+def _finish():
+    Note.refresh_tag_ids(sa.select(_selected.c.id))
+    _release()
+    db.session.expire_all()
+
+
+def _retag_archive(source_id, target_id):
+    # Swept notes keep their tags only in tag_ids, which restore() turns
+    # back into note_tags rows for the tags that still exist.
+    if db.engine.dialect.name == "postgresql":
+        stmt = sa.text(
+            "UPDATE notes_archive SET tag_ids = ARRAY("
+            "SELECT DISTINCT unnest(array_replace(tag_ids, :source, :target)) ORDER BY 1) "
+            "WHERE tag_ids @> ARRAY[:source]"
+        )
+    else:
+        stmt = sa.text(
+            "UPDATE notes_archive SET tag_ids = (SELECT json_group_array(value) FROM ("
+            "SELECT DISTINCT CASE value WHEN :source THEN :target ELSE value END AS value "
+            "FROM json_each(notes_archive.tag_ids) ORDER BY 1)) "
+            "WHERE EXISTS (SELECT 1 FROM json_each(notes_archive.tag_ids) "
+            "WHERE value = :source)"
+        )
+    db.session.execute(stmt, {"source": source_id, "target": target_id})
+
+
+def merge_tags(source, target, user_id):
+    """Move every note tagged ``source`` to ``target``, then delete ``source``.
+
+    Returns the number of notes that carried ``source``.
+    """
+    if source.id == target.id:
+        raise ValueError("Cannot merge a tag into itself")
+
+    count = _select_notes(_has_tag(source.id))
+    _touch(user_id)
+    _link_selected(target.id)
+    db.session.execute(note_tags.delete().where(note_tags.c.tag_id == source.id))
+    _retag_archive(source.id, target.id)
+    db.session.execute(sa.delete(Tag).where(Tag.id == source.id))
+    _finish()
+    return count
+
+
+def add_tag(condition, tag, user_id):
+    """Add ``tag`` to every note matching ``condition`` that lacks it."""
+    count = _select_notes(sa.and_(condition, ~_has_tag(tag.id)))
+    _touch(user_id)
+    _link_selected(tag.id)
+    _finish()
+    return count
+
+
+def remove_tag(condition, tag, user_id):
+    """Remove ``tag`` from every note matching ``condition``."""
+    count = _select_notes(sa.and_(condition, _has_tag(tag.id)))
+    _touch(user_id)
+    db.session.execute(
+        note_tags.delete().where(
+            note_tags.c.tag_id == tag.id,
+            note_tags.c.note_id.in_(sa.select(_selected.c.id)),
+        )
+    )
+    _finish()
+    return count
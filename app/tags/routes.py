@@ -1,9 +1,14 @@
 # file: app/tags/routes.py
+import logging
 from flask import render_template, redirect, url_for, flash, request
-from flask_login import login_required
+from flask_login import login_required, current_user
 from app.tags import tags
+from app.tags.bulk import merge_tags
 from app.extensions import db
-from app.models import Tag
+from app.models import ArchivedNote, Tag
+from app.notes.query import NoteFilters
+
+logger = logging.getLogger(__name__)
 
 
 @tags.route("/")
@@ -39,8 +44,27 @@ def edit(tag_id):
 
         existing = Tag.query.filter_by(name=new_name).first()
         if existing and existing.id != tag.id:
-            flash("A tag with this name already exists.", "danger")
-            return redirect(url_for("tags.edit", tag_id=tag_id))
+            if request.form.get("merge") != "1":
+                flash(
+                    f'A tag named "{new_name}" already exists. '
+                    "Tick Merge to move this tag's notes onto it.",
+                    "danger",
+                )
+                return redirect(url_for("tags.edit", tag_id=tag_id))
+
+            old_name = tag.name
+            try:
+                count = merge_tags(tag, existing, current_user.id)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Merging tag %s into %s failed", old_name, new_name)
+                flash("Merging the tags failed; nothing was changed.", "danger")
+                return redirect(url_for("tags.edit", tag_id=tag_id))
+
+            logger.info("Merged tag %s into %s (%d notes)", old_name, new_name, count)
+            flash(f'Merged "{old_name}" into "{new_name}" ({count} note(s)).', "success")
+            return redirect(url_for("tags.index"))
 
         tag.name = new_name
         db.session.commit()
@@ -54,7 +78,11 @@ def edit(tag_id):
 @login_required
 def delete(tag_id):
     tag = Tag.query.get_or_404(tag_id)
-    note_count = len(tag.notes)
+    # Swept notes have no note_tags rows; their tags live in tag_ids.
+    swept = NoteFilters(tag_names=[tag.name], include_archived=True).criteria(
+        {tag.name: tag.id}, model=ArchivedNote
+    )
+    note_count = len(tag.notes) + ArchivedNote.query.filter(*swept).count()
 
     if note_count > 0:
         flash(
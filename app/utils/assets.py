@@ -0,0 +1,77 @@
+# file: app/utils/assets.py
+"""Content-hash fingerprints for static files.
+
+``url_for("static", filename=...)`` gets a ``v=<hash>`` argument computed
+from the file's contents, so the URL changes whenever the file does.
+Requests carrying the current hash are answered with a year-long
+``Cache-Control: immutable``; browsers then reuse the file without asking
+again until a deploy changes it.
+"""
+import hashlib
+import os
+import threading
+
+from flask import request
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_lock = threading.Lock()
+_hashes = {}
+
+
+def file_hash(path):
+    """The first 12 hex digits of the SHA-256 of ``path``, or None.
+
+    Results are cached per path and recomputed when the file's mtime or
+    size changes.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    value = digest.hexdigest()[:12]
+    with _lock:
+        _hashes[path] = (key, value)
+    return value
+
+
+def static_hash(app, filename):
+    if not filename or app.static_folder is None:
+        return None
+    root = os.path.realpath(app.static_folder)
+    path = os.path.realpath(os.path.join(root, filename))
+    if not path.startswith(root + os.sep):
+        return None
+    return file_hash(path)
+
+
+def init_assets(app):
+    if not app.config.get("STATIC_FINGERPRINT", True):
+        return
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == "static" and "v" not in values:
+            value = static_hash(app, values.get("filename"))
+            if value:
+                values["v"] = value
+
+    @app.after_request
+    def cache_static(response):
+        if request.endpoint != "static" or response.status_code not in (200, 304):
+            return response
+        version = request.args.get("v")
+        if version and version == static_hash(app, (request.view_args or {}).get("filename")):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+        return response
@@ -0,0 +1,146 @@
+# file: app/utils/compression.py
+"""gzip / brotli compression of response bodies.
+
+Brotli is used when the client accepts it and the ``brotli`` package is
+installed; otherwise gzip. ``init_compression`` applies it to every
+response of the app.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+
+def _accepted(accept_encoding):
+    """The codings in an Accept-Encoding header with a non-zero q value."""
+    codings = set()
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            codings.add(coding.strip().lower())
+    return codings
+
+
+def choose_encoding(accept_encoding):
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+# Brotli quality 5 is about as fast as gzip level 6 and compresses better.
+BROTLI_QUALITY = 5
+
+
+def compress(data, encoding, level=6):
+    """Compress ``data``; ``level`` is the gzip level."""
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding, level=6):
+    """Compress an iterable of byte chunks as it is consumed.
+
+    Each chunk is flushed, so the client can start on the first part of a
+    streamed page before the rest is rendered.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+        def step(chunk):
+            return compressor.process(chunk) + compressor.flush()
+
+        finish = compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+        def step(chunk):
+            return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        finish = compressor.flush
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if chunk:
+                yield step(chunk)
+        yield finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+# Types worth compressing; images, archives and fonts mostly are already.
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def _compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+
+
+def compress_response(response, accept_encoding, min_size=500, level=6):
+    """Compress ``response`` in place when it is worth it.
+
+    Buffered bodies under ``min_size`` bytes are left alone. Streamed
+    bodies are compressed chunk by chunk, whatever their size. Files sent
+    with ``send_file`` (direct passthrough) are not touched.
+    """
+    if (
+        response.direct_passthrough
+        or response.status_code < 200
+        or response.status_code in (204, 206, 304)
+        or "Content-Encoding" in response.headers
+        or not _compressible(response.mimetype)
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding, level)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(compress(data, encoding, level))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_compression(app):
+    if not app.config.get("COMPRESS_ENABLED", True):
+        return
+
+    @app.after_request
+    def compress_body(response):
+        if request.method == "HEAD":
+            return response
+        return compress_response(
+            response,
+            request.headers.get("Accept-Encoding"),
+            min_size=app.config.get("COMPRESS_MIN_SIZE", 500),
+            level=app.config.get("COMPRESS_LEVEL", 6),
+        )
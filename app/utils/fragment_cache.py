@@ -0,0 +1,228 @@
+# file: app/utils/fragment_cache.py
+"""Cached template fragments.
+
+Templates wrap markup that rarely changes in ``{% cache %}``::
+
+    {% cache "note-row", note.id, note.updated_at, fragment_generation("tags") %}
+        ...
+    {% endcache %}
+
+The arguments make up the key. Keys name the version of the
+data they were rendered from, so a changed note simply stops matching
+its old entry. Data without a version of its own is covered by the
+namespace counters of app/generations.py: a tag write moves every key
+that includes ``fragment_generation("tags")`` on, and old entries age
+out of the cache.
+
+Entries live in an in-process LRU bounded by ``FRAGMENT_CACHE_MAX_BYTES``.
+With ``FRAGMENT_CACHE_URL=sqlite:///path`` they are also written to a
+SQLite file that every worker on the host shares.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from app import generations
+
+
+def _size(value):
+    return len(value.encode("utf-8"))
+
+
+class LRUStore:
+    """Strings by key, dropping the least recently used past ``max_bytes``."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= _size(old)
+            self._entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= _size(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """Fragments in a SQLite file shared by the workers on a host.
+
+    Every ``TRIM_EVERY`` writes, the oldest entries are deleted until the
+    file holds at most ``max_bytes`` of fragments.
+    """
+
+    TRIM_EVERY = 100
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fragments ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_fragments_created ON fragments (created)"
+            )
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # One connection per thread, and never one inherited across a fork.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM fragments WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        size = _size(value)
+        if size > self.max_bytes:
+            return
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO fragments (key, value, size, created) VALUES (?, ?, ?, ?)",
+            (key, value, size, time.time()),
+        )
+        self._writes += 1
+        if self._writes % self.TRIM_EVERY == 0:
+            self.trim()
+
+    def trim(self):
+        # Keep the newest entries whose sizes add up to at most max_bytes.
+        self._connect().execute(
+            "DELETE FROM fragments WHERE key IN ("
+            " SELECT key FROM ("
+            "  SELECT key, SUM(size) OVER (ORDER BY created DESC, key) AS running"
+            "  FROM fragments"
+            " ) WHERE running > ?"
+            ")",
+            (self.max_bytes,),
+        )
+
+    def clear(self):
+        self._connect().execute("DELETE FROM fragments")
+
+
+class FragmentCache:
+    """The in-process LRU, in front of an optional shared store."""
+
+    def __init__(self, max_bytes, shared=None):
+        self.local = LRUStore(max_bytes)
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+
+def _cache():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("fragment_cache")
+
+
+def fragment_generation(namespace):
+    """The current generation of ``namespace``; see app/generations.py."""
+    return generations.current(namespace)
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache key, ... %}...{% endcache %}``."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(["name:endcache"], drop_needle=True)
+        call = self.call_method("_render", [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        cache = _cache()
+        if cache is None:
+            return caller()
+        key = json.dumps([str(part) for part in parts])
+        value = cache.get(key)
+        if value is None:
+            value = str(caller())
+            cache.set(key, value)
+        return Markup(value)
+
+
+def init_fragment_cache(app):
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals["fragment_generation"] = fragment_generation
+
+    url = app.config.get("FRAGMENT_CACHE_URL", "memory")
+    if not url or url == "none":
+        return
+    max_bytes = app.config.get("FRAGMENT_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+    shared = None
+    if url.startswith("sqlite:///"):
+        shared = SQLiteStore(url[len("sqlite:///"):], max_bytes)
+    elif url != "memory":
+        raise ValueError(f"Unknown FRAGMENT_CACHE_URL: {url}")
+    app.extensions["fragment_cache"] = FragmentCache(max_bytes, shared)
@@ -0,0 +1,65 @@
+# file: app/utils/ids.py
+import os
+import threading
+import time
+import uuid
+
+from werkzeug.routing import BaseConverter, ValidationError
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    """Time-ordered UUID (RFC 9562 version 7) as a string.
+
+    The first 48 bits are the Unix time in milliseconds, so new rows land at
+    the right-hand edge of the primary key index. A 12-bit counter keeps ids
+    generated in the same millisecond ordered.
+    """
+    global _last_ms, _counter
+
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x3FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # Counter exhausted: borrow the next millisecond.
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b
+    return str(uuid.UUID(int=value))
+
+
+def parse_uuid(value):
+    """Canonical lower-case form of ``value``, or None if it is not a UUID."""
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+class UUIDStringConverter(BaseConverter):
+    """Like werkzeug's ``uuid`` converter, but passes views a canonical string.
+
+    Malformed ids 404 in routing instead of reaching the database, where a
+    native UUID column would reject them with an error.
+    """
+
+    regex = r"[A-Fa-f0-9]{8}-?[A-Fa-f0-9]{4}-?[A-Fa-f0-9]{4}-?[A-Fa-f0-9]{4}-?[A-Fa-f0-9]{12}"
+
+    def to_python(self, value):
+        parsed = parse_uuid(value)
+        if parsed is None:
+            raise ValidationError()
+        return parsed
+
+    def to_url(self, value):
+        return str(value)
@@ -0,0 +1,152 @@
+# file: app/utils/log_queue.py
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed via ``extra=``.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Only merge the arguments here; formatting happens on the listener thread.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room on shutdown so pending records are flushed, not lost.
+        self.queue.put(self._sentinel)
+
+
+_state = {"handler": None, "listener": None, "options": None}
+
+
+def _build_handlers(options):
+    if options["format"] == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(TEXT_FORMAT)
+
+    log_file = options["file"].format(pid=os.getpid())
+    file_handler = RotatingFileHandler(
+        log_file,
+        maxBytes=options["max_bytes"],
+        backupCount=options["backup_count"],
+        delay=True,
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    return [file_handler, stream_handler]
+
+
+def _start(options):
+    log_queue = queue.Queue(maxsize=options["queue_size"])
+    handler = DroppingQueueHandler(log_queue)
+    listener = _Listener(log_queue, *_build_handlers(options))
+    listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(options["level"])
+
+    _state.update(handler=handler, listener=listener, options=options)
+
+
+def stop_logging():
+    handler, listener = _state["handler"], _state["listener"]
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    if listener is not None:
+        listener.stop()
+        for h in listener.handlers:
+            h.close()
+    _state.update(handler=None, listener=None)
+
+
+def start_logging(level, log_file, log_format, max_bytes, backup_count, queue_size):
+    """Route the root logger through a bounded queue drained by a background thread.
+
+    ``log_file`` may contain ``{pid}`` so each worker process rotates its own file.
+    """
+    stop_logging()
+    _start(
+        {
+            "level": level,
+            "file": log_file,
+            "format": log_format,
+            "max_bytes": max_bytes,
+            "backup_count": backup_count,
+            "queue_size": queue_size,
+        }
+    )
+
+
+def restart_after_fork():
+    """Start a fresh queue and listener thread in a forked worker.
+
+    Threads do not survive ``fork()``, so a preloaded parent's listener is gone
+    in the child and its queue may hold a lock taken at fork time.
+    """
+    options = _state["options"]
+    if options is None:
+        return
+    old_handler, old_listener = _state["handler"], _state["listener"]
+    if old_handler is not None:
+        logging.getLogger().removeHandler(old_handler)
+    if old_listener is not None:
+        for h in old_listener.handlers:
+            h.close()
+    _start(options)
+
+
+def dropped_records():
+    handler = _state["handler"]
+    return handler.dropped if handler is not None else 0
+
+
+atexit.register(stop_logging)
@@ -1,13 +1,43 @@
 # file: app/utils/markdown.py
-import bleach
-from markdown import markdown
+import threading
 from flask import current_app
+from app.utils.metrics import timed
+
+# Markdown, bleach and their extensions are imported on first render rather than at
+# startup. Markdown and bleach's Linker/Cleaner are not thread-safe, so each thread
+# keeps its own instances and reuses them across renders.
+_local = threading.local()
+
+
+def _get_renderers(extensions, allowed_tags, allowed_attrs):
+    key = (tuple(extensions), tuple(allowed_tags), repr(allowed_attrs))
+    cached = getattr(_local, "renderers", None)
+    if cached is None or cached[0] != key:
+        import bleach
+        from markdown import Markdown
+
+        cached = (
+            key,
+            Markdown(extensions=extensions),
+            bleach.linkifier.Linker(),
+            bleach.sanitizer.Cleaner(
+                tags=allowed_tags, attributes=allowed_attrs, strip=True
+            ),
+        )
+        _local.renderers = cached
+    return cached[1:]
 
 
 def render_markdown(text):
     if not text:
         return ""
 
+    with timed("md"):
+        return _render_markdown(text)
+
+
+def _render_markdown(text):
+
     allowed_tags = current_app.config.get(
         "BLEACH_ALLOWED_TAGS",
         [
@@ -54,16 +84,16 @@ def render_markdown(text):
         },
     )
 
-    html = markdown(
-        text,
-        extensions=current_app.config.get(
-            "MARKDOWN_EXTENSIONS",
-            ["extra", "codehilite", "toc", "tables", "fenced_code"],
-        ),
+    extensions = current_app.config.get(
+        "MARKDOWN_EXTENSIONS",
+        ["extra", "codehilite", "toc", "tables", "fenced_code"],
     )
+    md, linker, cleaner = _get_renderers(extensions, allowed_tags, allowed_attrs)
+
+    html = md.reset().convert(text)
 
-    html = bleach.linkify(html)
+    html = linker.linkify(html)
 
-    html = bleach.clean(html, tags=allowed_tags, attributes=allowed_attrs, strip=True)
+    html = cleaner.clean(html)
 
     return html
@@ -0,0 +1,273 @@
+# file: app/utils/metrics.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.log_queue import dropped_records
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Slow-request log lines keep at most this many statements.
+MAX_CAPTURED_STATEMENTS = 50
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, label="endpoint"):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = sorted(self._series.items())
+            for label_value, (counts, total, count) in items:
+                label = f'{self.label}="{_escape(label_value)}"'
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(
+                        f'{self.name}_bucket{{{label},le="{bound}"}} {bucket_count}'
+                    )
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{label}}} {total}")
+                lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for label_value, value in sorted(self._values.items()):
+                label = f'{self.label}="{_escape(label_value)}"'
+                lines.append(f"{self.name}{{{label}}} {value}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_SECONDS = Histogram(
+    "kb_request_duration_seconds", "Wall time per request.", TIME_BUCKETS
+)
+SQL_SECONDS = Histogram(
+    "kb_request_sql_seconds", "Time spent executing SQL per request.", TIME_BUCKETS
+)
+SQL_STATEMENTS = Histogram(
+    "kb_request_sql_statements", "SQL statements executed per request.", COUNT_BUCKETS
+)
+TEMPLATE_SECONDS = Histogram(
+    "kb_request_template_seconds", "Template render time per request.", TIME_BUCKETS
+)
+MARKDOWN_SECONDS = Histogram(
+    "kb_request_markdown_seconds", "render_markdown time per request.", TIME_BUCKETS
+)
+
+JOB_SECONDS = Histogram(
+    "kb_job_duration_seconds", "Background job run time.", TIME_BUCKETS, label="kind"
+)
+JOB_FAILURES = Counter(
+    "kb_job_failures_total", "Background job attempts that raised.", "kind"
+)
+
+HISTOGRAMS = [
+    REQUEST_SECONDS,
+    SQL_SECONDS,
+    SQL_STATEMENTS,
+    TEMPLATE_SECONDS,
+    MARKDOWN_SECONDS,
+    JOB_SECONDS,
+]
+COUNTERS = [JOB_FAILURES]
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.statements = []
+        self.spans = {"tpl": 0.0, "md": 0.0}
+        self._template_started = None
+
+
+def current_timing():
+    if not has_app_context():
+        return None
+    return g.get("request_timing")
+
+
+@contextmanager
+def timed(span):
+    """Add the time spent in the block to the current request's ``span``."""
+    timing = current_timing()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.spans[span] = timing.spans.get(span, 0.0) + time.perf_counter() - started
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    timing = current_timing()
+    if timing is None:
+        return
+    timing.sql_count += 1
+    timing.sql_seconds += time.perf_counter() - started
+    if len(timing.statements) < MAX_CAPTURED_STATEMENTS:
+        timing.statements.append(statement)
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+
+_sql_events_installed = False
+
+
+def _install_sql_events():
+    global _sql_events_installed
+    if _sql_events_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _handle_error)
+    _sql_events_installed = True
+
+
+def _before_render(app, template, context, **extra):
+    timing = current_timing()
+    if timing is not None and timing._template_started is None:
+        timing._template_started = time.perf_counter()
+
+
+def _after_render(app, template, context, **extra):
+    timing = current_timing()
+    if timing is not None and timing._template_started is not None:
+        timing.spans["tpl"] += time.perf_counter() - timing._template_started
+        timing._template_started = None
+
+
+def server_timing_header(timing, total):
+    return ", ".join(
+        [
+            f"app;dur={total * 1000:.1f}",
+            f'db;dur={timing.sql_seconds * 1000:.1f};desc="{timing.sql_count} queries"',
+            f"tpl;dur={timing.spans['tpl'] * 1000:.1f}",
+            f"md;dur={timing.spans['md'] * 1000:.1f}",
+        ]
+    )
+
+
+def init_metrics(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    _install_sql_events()
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_request_timing():
+        g.request_timing = RequestTiming()
+
+    @app.after_request
+    def record_request_timing(response):
+        timing = g.pop("request_timing", None)
+        if timing is None:
+            return response
+
+        total = time.perf_counter() - timing.started
+        endpoint = request.endpoint or "unknown"
+
+        REQUEST_SECONDS.observe(endpoint, total)
+        SQL_SECONDS.observe(endpoint, timing.sql_seconds)
+        SQL_STATEMENTS.observe(endpoint, timing.sql_count)
+        TEMPLATE_SECONDS.observe(endpoint, timing.spans["tpl"])
+        MARKDOWN_SECONDS.observe(endpoint, timing.spans["md"])
+
+        response.headers["Server-Timing"] = server_timing_header(timing, total)
+
+        threshold = app.config.get("SLOW_REQUEST_MS", 500)
+        if threshold is not None and total * 1000 >= threshold:
+            logger.warning(
+                "Slow request %s %s: %.1f ms, %d SQL statements in %.1f ms\n%s",
+                request.method,
+                request.path,
+                total * 1000,
+                timing.sql_count,
+                timing.sql_seconds * 1000,
+                "\n".join(timing.statements),
+                extra={"endpoint": endpoint},
+            )
+        return response
+
+
+def render_prometheus():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    for counter in COUNTERS:
+        lines.extend(counter.render())
+    lines.append("# HELP kb_log_records_dropped_total Log records dropped by a full queue.")
+    lines.append("# TYPE kb_log_records_dropped_total counter")
+    lines.append(f"kb_log_records_dropped_total {dropped_records()}")
+    return "\n".join(lines) + "\n"
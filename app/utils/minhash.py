@@ -0,0 +1,86 @@
+# file: app/utils/minhash.py
+"""MinHash signatures and LSH banding for set similarity.
+
+A signature summarises a set of tokens as ``NUM_PERM`` integers. The
+fraction of positions where two signatures agree estimates the Jaccard
+similarity of the sets. Splitting a signature into bands and hashing each
+band to a bucket finds likely-similar pairs without comparing every pair:
+two sets share a bucket in at least one band with probability
+``1 - (1 - J ** rows) ** bands``.
+
+Each position uses its own 32-bit hash of the token, taken from one SHAKE-128
+digest, so a signature costs one hash call per token. Signatures are stored,
+so the hashing must stay fixed: changing NUM_PERM or _SALT means rebuilding
+every stored signature.
+"""
+import hashlib
+import re
+import struct
+import zlib
+
+NUM_PERM = 64
+_SALT = b"kb-minhash-1:"
+_DIGEST = struct.Struct(f"<{NUM_PERM}I")
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9_.-]*[a-z0-9]|[a-z0-9]")
+STOPWORDS = frozenset(
+    """
+    a an and are as at be but by can do for from has have if in into is it its
+    no not of on or so than that the then there these this to was were when
+    which will with you your
+    """.split()
+)
+
+
+def words(text):
+    return _WORD.findall((text or "").lower())
+
+
+def terms(text):
+    """The distinct content words of ``text``: no stopwords, at least 3 chars."""
+    return {word for word in words(text) if len(word) > 2 and word not in STOPWORDS}
+
+
+def shingles(text, size=3):
+    """The distinct runs of ``size`` consecutive words in ``text``."""
+    tokens = words(text)
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def signature(tokens):
+    """The MinHash signature of a set of strings; None for an empty set."""
+    if not tokens:
+        return None
+    return list(map(min, zip(*map(_hashes, tokens))))
+
+
+def _hashes(token):
+    digest = hashlib.shake_128(_SALT + token.encode("utf-8")).digest(_DIGEST.size)
+    return _DIGEST.unpack(digest)
+
+
+def similarity(left, right):
+    """Estimated Jaccard similarity of the sets behind two signatures."""
+    if not left or not right:
+        return 0.0
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+def band_buckets(sig, bands):
+    """``(band, bucket)`` pairs for ``sig`` split into ``bands`` equal bands."""
+    rows = len(sig) // bands
+    buckets = []
+    for band in range(bands):
+        chunk = sig[band * rows : (band + 1) * rows]
+        buckets.append((band, zlib.crc32(struct.pack(f"<{rows}I", *chunk))))
+    return buckets
+
+
+def jaccard(left, right):
+    """Exact Jaccard similarity of two small collections, e.g. tag ids."""
+    left, right = set(left or ()), set(right or ())
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
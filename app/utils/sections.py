@@ -0,0 +1,77 @@
+# file: app/utils/sections.py
+"""Cutting long Markdown bodies into sections that render on their own.
+
+Cuts fall at the start of a heading line, or failing that a blank line,
+outside fenced code blocks. A section that reaches twice the target
+without either is cut at the next line break, wherever it is.
+
+Bodies longer than NOTE_PROGRESSIVE_CHARS get their offsets computed when
+they are saved and stored in ``note_metadata``::
+
+    {"sections": [[0, 51234], [51234, 103877], ...]}
+
+so the note page can read just the first sections with ``substr()``.
+"""
+import re
+
+from flask import current_app
+
+_HEADING = re.compile(r"#{1,6}\s")
+_FENCE = re.compile(r"(```|~~~)")
+
+SECTIONS_KEY = "sections"
+
+
+def split_sections(text, target):
+    """``(start, end)`` character offsets of ``text``'s sections.
+
+    Each section is at least ``target`` characters long, except the last.
+    """
+    sections = []
+    start = 0
+    fence = None
+    position = 0
+    for line in text.splitlines(keepends=True):
+        length = position - start
+        stripped = line.lstrip()
+        if length >= target:
+            outside = fence is None
+            if (
+                (outside and _HEADING.match(stripped))
+                or (outside and length >= target * 3 // 2 and not stripped)
+                or length >= target * 2
+            ):
+                sections.append((start, position))
+                start = position
+        marker = _FENCE.match(stripped)
+        if marker:
+            if fence is None:
+                fence = marker.group(1)
+            elif marker.group(1) == fence:
+                fence = None
+        position += len(line)
+    if position > start or not sections:
+        sections.append((start, position))
+    return sections
+
+
+def with_sections(metadata, body):
+    """A copy of ``metadata`` holding the section offsets of ``body``.
+
+    Bodies short enough to render whole get none.
+    """
+    config = current_app.config
+    metadata = {key: value for key, value in (metadata or {}).items() if key != SECTIONS_KEY}
+    if len(body) > config["NOTE_PROGRESSIVE_CHARS"]:
+        metadata[SECTIONS_KEY] = [
+            [start, end] for start, end in split_sections(body, config["NOTE_SECTION_CHARS"])
+        ]
+    return metadata
+
+
+def stored_sections(metadata, length):
+    """The stored offsets, or None when missing or not for a body of ``length``."""
+    sections = (metadata or {}).get(SECTIONS_KEY)
+    if not sections or sections[-1][1] != length:
+        return None
+    return [tuple(section) for section in sections]
@@ -0,0 +1,37 @@
+# file: app/utils/streaming.py
+"""Streamed rendering for long list pages.
+
+``render_list`` sends a template with ``stream_template`` so the page head
+and filter form leave before the rows are rendered. Pass rows as an
+iterator over a ``yield_per`` query and memory stays flat however many
+rows there are.
+"""
+from flask import Response, current_app, render_template, stream_template
+
+# Jinja yields a piece per template event; gathering them into chunks of
+# about this many characters keeps them compressible and the writes few.
+STREAM_CHUNK_SIZE = 8192
+
+
+def _chunked(pieces, size):
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def render_list(template_name, **context):
+    """Render ``template_name``, streamed when ``STREAM_LIST_PAGES`` is on.
+
+    The template must not test the row iterator for truth or take its
+    length; loop over it once.
+    """
+    if not current_app.config.get("STREAM_LIST_PAGES", True):
+        return render_template(template_name, **context)
+    pieces = stream_template(template_name, **context)
+    return Response(_chunked(pieces, STREAM_CHUNK_SIZE), mimetype="text/html")
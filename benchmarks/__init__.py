@@ -0,0 +1 @@
+# file: benchmarks/__init__.py
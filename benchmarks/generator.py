@@ -0,0 +1,235 @@
+# file: benchmarks/generator.py
+"""Deterministic synthetic knowledge bases for benchmarking.
+
+The same ``size`` and ``seed`` always produce the same users, tags, notes and
+import trees, so timings from different commits are comparable.
+"""
+import math
+import random
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models import Note, Tag, User, note_tags
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+BASE_TIME = datetime(2024, 1, 1)
+BATCH_SIZE = 1000
+
+TECH_WORDS = [
+    "postgres", "replication", "timeout", "deadlock", "index", "vacuum", "kafka",
+    "consumer", "offset", "restart", "deployment", "rollback", "certificate",
+    "expiry", "dns", "proxy", "nginx", "gateway", "latency", "queue", "backlog",
+    "retry", "credential", "rotation", "ldap", "sso", "token", "oauth", "cron",
+    "batch", "export", "invoice", "ledger", "reconcile", "settlement", "api",
+    "endpoint", "payload", "schema", "migration", "snapshot", "backup", "restore",
+    "disk", "memory", "heap", "thread", "pool", "connection", "firewall", "vpn",
+    "patch", "upgrade", "incident", "escalation", "runbook", "oncall", "alert",
+    "monitor", "dashboard", "metric", "threshold", "customer", "tenant", "region",
+    "failover", "cluster", "node", "pod", "container", "image", "registry",
+]
+FILLER_WORDS = [
+    "the", "a", "to", "and", "of", "in", "check", "if", "then", "run", "verify",
+    "that", "is", "on", "for", "with", "after", "before", "when", "confirm", "open",
+    "ticket", "logs", "service", "server", "job", "user", "error", "status",
+]
+SECTION_TITLES = [
+    "Symptoms", "Cause", "Resolution", "Verification", "Rollback", "Contacts",
+    "Background", "Known issues", "Escalation", "Commands", "Notes",
+]
+
+
+def zipf_weights(n, s=1.1):
+    return [1.0 / (k**s) for k in range(1, n + 1)]
+
+
+class KBGenerator:
+    def __init__(self, size, seed=42):
+        self.size = SIZES.get(size, size) if isinstance(size, str) else size
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.user_count = max(5, self.size // 200)
+        self.tag_count = max(20, int(60 * math.log10(self.size)))
+        self._tag_cum_weights = None
+
+    # Content ---------------------------------------------------------------
+
+    def _uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _sentence(self, words):
+        rng = self.rng
+        parts = []
+        for _ in range(words):
+            pool = TECH_WORDS if rng.random() < 0.35 else FILLER_WORDS
+            parts.append(rng.choice(pool))
+        return " ".join(parts).capitalize() + "."
+
+    def _paragraph(self):
+        return " ".join(
+            self._sentence(self.rng.randint(6, 18))
+            for _ in range(self.rng.randint(2, 6))
+        )
+
+    def body(self, target_bytes):
+        """Markdown body of roughly ``target_bytes`` with headings, lists, code and tables."""
+        rng = self.rng
+        chunks = []
+        length = 0
+        while length < target_bytes:
+            kind = rng.random()
+            if kind < 0.15:
+                chunk = f"## {rng.choice(SECTION_TITLES)}"
+            elif kind < 0.30:
+                chunk = "\n".join(
+                    f"- {self._sentence(rng.randint(3, 9))}"
+                    for _ in range(rng.randint(2, 6))
+                )
+            elif kind < 0.40:
+                lines = [
+                    f"{rng.choice(['sudo', 'kubectl', 'psql', 'curl'])} "
+                    f"{rng.choice(TECH_WORDS)} --{rng.choice(TECH_WORDS)}"
+                    for _ in range(rng.randint(1, 5))
+                ]
+                chunk = "```bash\n" + "\n".join(lines) + "\n```"
+            elif kind < 0.45:
+                rows = [
+                    f"| {rng.choice(TECH_WORDS)} | {rng.randint(1, 999)} | "
+                    f"{rng.choice(FILLER_WORDS)} |"
+                    for _ in range(rng.randint(2, 6))
+                ]
+                chunk = "| Item | Value | Owner |\n| --- | --- | --- |\n" + "\n".join(rows)
+            else:
+                chunk = self._paragraph()
+            chunks.append(chunk)
+            length += len(chunk) + 2
+        return "\n\n".join(chunks)
+
+    def body_size(self):
+        # Log-normal around ~2 KB with a long tail of large runbooks, capped at 256 KB.
+        return int(min(256 * 1024, max(80, self.rng.lognormvariate(7.6, 1.0))))
+
+    def title(self):
+        words = [self.rng.choice(TECH_WORDS) for _ in range(self.rng.randint(2, 6))]
+        return " ".join(words).capitalize()
+
+    def tag_names(self):
+        return [f"tag-{i:04d}-{TECH_WORDS[i % len(TECH_WORDS)]}" for i in range(self.tag_count)]
+
+    def pick_tags(self):
+        if self._tag_cum_weights is None:
+            weights = zipf_weights(self.tag_count)
+            total = 0.0
+            self._tag_cum_weights = []
+            for w in weights:
+                total += w
+                self._tag_cum_weights.append(total)
+        count = min(self.tag_count, int(self.rng.expovariate(0.6)) + 1)
+        picked = self.rng.choices(
+            range(self.tag_count), cum_weights=self._tag_cum_weights, k=count
+        )
+        return sorted(set(picked))
+
+    # Database --------------------------------------------------------------
+
+    def populate(self):
+        """Insert the KB into the current app's database. Returns the user ids."""
+        password_hash = generate_password_hash("bench-password")
+
+        users = []
+        for i in range(self.user_count):
+            users.append(
+                {
+                    "id": self._uuid(),
+                    "email": f"user{i:05d}@bench.example.com",
+                    "display_name": f"Bench User {i}",
+                    "password_hash": password_hash,
+                    "is_admin": i == 0,
+                    "is_active": True,
+                    "created_at": BASE_TIME,
+                    "updated_at": BASE_TIME,
+                }
+            )
+        db.session.execute(insert(User), users)
+
+        tags = [{"id": i + 1, "name": name} for i, name in enumerate(self.tag_names())]
+        db.session.execute(insert(Tag), tags)
+
+        user_ids = [u["id"] for u in users]
+        notes_batch = []
+        links_batch = []
+        for i in range(self.size):
+            note_id = self._uuid()
+            created = BASE_TIME + timedelta(minutes=self.rng.randint(0, 525_600))
+            updated = created + timedelta(minutes=self.rng.randint(0, 100_000))
+            author = self.rng.choice(user_ids)
+            notes_batch.append(
+                {
+                    "id": note_id,
+                    "title": self.title(),
+                    "body": self.body(self.body_size()),
+                    "summary": self._sentence(10) if self.rng.random() < 0.6 else None,
+                    "source": f"/imports/kb/{i:06d}.md" if self.rng.random() < 0.5 else None,
+                    "is_archived": self.rng.random() < 0.15,
+                    "note_metadata": {},
+                    "created_at": created,
+                    "updated_at": updated,
+                    "created_by_id": author,
+                    "updated_by_id": self.rng.choice(user_ids),
+                }
+            )
+            tag_ids = [tag_index + 1 for tag_index in self.pick_tags()]
+            notes_batch[-1]["tag_ids"] = tag_ids
+            for tag_id in tag_ids:
+                links_batch.append({"note_id": note_id, "tag_id": tag_id})
+
+            if len(notes_batch) >= BATCH_SIZE:
+                self._flush(notes_batch, links_batch)
+
+        self._flush(notes_batch, links_batch)
+
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute(
+                text("SELECT setval(pg_get_serial_sequence('tags', 'id'), max(id)) FROM tags")
+            )
+            Note.refresh_search_vectors()
+        db.session.commit()
+        return user_ids
+
+    @staticmethod
+    def _flush(notes_batch, links_batch):
+        if notes_batch:
+            db.session.execute(insert(Note), notes_batch)
+        if links_batch:
+            db.session.execute(insert(note_tags), links_batch)
+        notes_batch.clear()
+        links_batch.clear()
+
+    # Import trees ----------------------------------------------------------
+
+    def write_import_tree(self, root, count, kind="md"):
+        """Write ``count`` importable files under ``root`` in a few nested folders."""
+        root = Path(root)
+        folders = [root / f"team-{i}" / f"area-{j}" for i in range(3) for j in range(3)]
+        for folder in folders:
+            folder.mkdir(parents=True, exist_ok=True)
+
+        for i in range(count):
+            folder = folders[i % len(folders)]
+            title = self.title()
+            body = self.body(self.body_size())
+            if kind == "html":
+                paragraphs = "".join(f"<p>{p}</p>" for p in body.split("\n\n"))
+                content = (
+                    f"<html><head><title>{title}</title></head>"
+                    f"<body><h1>{title}</h1>{paragraphs}</body></html>"
+                )
+                (folder / f"page-{i:05d}.html").write_text(content, encoding="utf-8")
+            else:
+                (folder / f"note-{i:05d}.md").write_text(body, encoding="utf-8")
+        return root
@@ -0,0 +1,484 @@
+# file: importers/import_bundle.py
+import gzip
+import io
+import json
+import secrets
+import time
+from datetime import datetime, timezone
+
+import click
+from sqlalchemy import column, insert, select, table, text, update
+
+from app import generations
+from app.extensions import db
+from app.jobs import enqueue
+from app.models import Note, Tag, User, note_tags
+from app.utils.sections import with_sections
+
+NOTE_COLUMNS = (
+    "id",
+    "title",
+    "body",
+    "summary",
+    "source",
+    "is_archived",
+    "note_metadata",
+    "created_at",
+    "updated_at",
+    "created_by_id",
+    "updated_by_id",
+)
+
+
+def _open(path):
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _parse_time(value):
+    if not value:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class BundleImport:
+    """Load a JSONL bundle written by ``flask export``.
+
+    Notes keep their ids and timestamps. A note that already exists is only
+    overwritten when the bundle's copy is at least as new. Users are matched
+    by email and tags by name.
+    """
+
+    def __init__(self, batch_size=1000, echo=click.echo):
+        self.batch_size = batch_size
+        self.echo = echo
+        self.user_ids = {}
+        self.tag_ids = {}
+        self.fallback_user_id = None
+        self.notes_read = 0
+        self.notes_written = 0
+
+    # Users and tags ---------------------------------------------------------
+
+    def load_users(self, records):
+        existing = {
+            email: user_id
+            for email, user_id in db.session.execute(select(User.email, User.id))
+        }
+        for record in records:
+            email = record["email"]
+            if email in existing:
+                continue
+            user = User(
+                email=email,
+                display_name=record.get("display_name") or email,
+                is_admin=record.get("is_admin", False),
+                # Imported accounts need a password reset before they can log in.
+                is_active=record.get("is_active", True),
+                created_at=_parse_time(record.get("created_at")),
+            )
+            user.set_password(secrets.token_urlsafe(32))
+            db.session.add(user)
+            db.session.flush()
+            existing[email] = user.id
+        self.user_ids = existing
+
+        admin = User.query.filter_by(is_admin=True).first()
+        self.fallback_user_id = admin.id if admin else None
+
+    def load_tags(self, records):
+        existing_names = {
+            name: tag_id for tag_id, name in db.session.execute(select(Tag.id, Tag.name))
+        }
+        used_ids = set(existing_names.values())
+        keep_id = []
+        new_id = []
+        for record in records:
+            name = record["name"]
+            if name in existing_names:
+                continue
+            # Keep the original id when it is free in this database.
+            if record.get("id") is not None and record["id"] not in used_ids:
+                keep_id.append({"id": record["id"], "name": name})
+                used_ids.add(record["id"])
+            else:
+                new_id.append({"name": name})
+
+        if keep_id:
+            db.session.execute(insert(Tag), keep_id)
+            self._reset_tag_sequence()
+        if new_id:
+            db.session.execute(insert(Tag), new_id)
+
+        self.tag_ids = {
+            name: tag_id for tag_id, name in db.session.execute(select(Tag.id, Tag.name))
+        }
+
+    def _reset_tag_sequence(self):
+        if db.engine.dialect.name == "postgresql":
+            db.session.execute(
+                text(
+                    "SELECT setval(pg_get_serial_sequence('tags', 'id'), "
+                    "coalesce(max(id), 1)) FROM tags"
+                )
+            )
+
+    def _tag_id(self, name):
+        tag_id = self.tag_ids.get(name)
+        if tag_id is None:
+            tag = Tag.get_or_create(name)
+            if tag is None:
+                return None
+            db.session.flush()
+            tag_id = self.tag_ids[name] = tag.id
+        return tag_id
+
+    # Notes -----------------------------------------------------------------
+
+    def note_row(self, record):
+        created_by = self.user_ids.get(record.get("created_by"), self.fallback_user_id)
+        updated_by = self.user_ids.get(record.get("updated_by"), created_by)
+        if created_by is None:
+            raise click.ClickException(
+                f"Note {record['id']} has no known author and there is no admin user."
+            )
+        return {
+            "id": record["id"],
+            "title": record["title"],
+            "body": record["body"],
+            "summary": record.get("summary"),
+            "source": record.get("source"),
+            "is_archived": bool(record.get("is_archived", False)),
+            "note_metadata": with_sections(record.get("metadata"), record["body"]),
+            "created_at": _parse_time(record.get("created_at")),
+            "updated_at": _parse_time(record.get("updated_at")),
+            "created_by_id": created_by,
+            "updated_by_id": updated_by,
+        }
+
+    def load_notes(self, records):
+        if db.engine.dialect.name == "postgresql":
+            loader = _CopyLoader(self)
+        else:
+            loader = _BatchLoader(self)
+
+        batch = []
+        started = time.perf_counter()
+        for record in records:
+            batch.append(record)
+            self.notes_read += 1
+            if len(batch) >= self.batch_size:
+                loader.add(batch)
+                batch = []
+                elapsed = time.perf_counter() - started
+                self.echo(
+                    f"  {self.notes_read} notes read ({self.notes_read / elapsed:,.0f} rows/s)"
+                )
+        if batch:
+            loader.add(batch)
+        self.notes_written = loader.finish()
+
+
+class _BatchLoader:
+    """Portable fallback: batched multi-row INSERTs and UPDATEs by primary key."""
+
+    def __init__(self, importer):
+        self.importer = importer
+        self.written = 0
+
+    def add(self, records):
+        importer = self.importer
+        rows = {}
+        records_by_id = {}
+        for record in records:
+            row = importer.note_row(record)
+            kept = rows.get(row["id"])
+            # A note listed twice keeps its newest copy, as across batches.
+            if kept is None or kept["updated_at"] <= row["updated_at"]:
+                rows[row["id"]] = row
+                records_by_id[row["id"]] = record
+        existing = {
+            note_id: (updated_at, version)
+            for note_id, updated_at, version in db.session.execute(
+                select(Note.id, Note.updated_at, Note.version).where(
+                    Note.id.in_(list(rows))
+                )
+            )
+        }
+
+        new_rows = [row for note_id, row in rows.items() if note_id not in existing]
+        # UPDATEs by primary key carry the version read above, like any
+        # other write, so a note edited meanwhile fails the batch.
+        changed = [
+            dict(row, version=existing[note_id][1])
+            for note_id, row in rows.items()
+            if note_id in existing and existing[note_id][0] <= row["updated_at"]
+        ]
+
+        written = new_rows + changed
+        links = []
+        for row in written:
+            names = records_by_id[row["id"]].get("tags") or []
+            tag_ids = {importer._tag_id(name) for name in names}
+            tag_ids.discard(None)
+            row["tag_ids"] = sorted(tag_ids)
+            links.extend({"note_id": row["id"], "tag_id": t} for t in tag_ids)
+
+        if new_rows:
+            db.session.execute(insert(Note), new_rows)
+        if changed:
+            db.session.execute(update(Note), changed)
+            db.session.execute(
+                note_tags.delete().where(
+                    note_tags.c.note_id.in_([row["id"] for row in changed])
+                )
+            )
+        if links:
+            db.session.execute(insert(note_tags), links)
+
+        _queue_refresh(
+            ("notes.refresh_search", "notes.refresh_related"),
+            [row["id"] for row in written],
+            importer.batch_size,
+        )
+        self.written += len(written)
+
+    def finish(self):
+        return self.written
+
+
+def _queue_refresh(kinds, note_ids, batch_size):
+    # Payloads of one batch each, so a large bundle does not make one
+    # job too big to claim.
+    for start in range(0, len(note_ids), batch_size):
+        batch = [str(note_id) for note_id in note_ids[start : start + batch_size]]
+        for kind in kinds:
+            enqueue(kind, {"note_ids": batch})
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, dict):
+        value = json.dumps(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _CopyLoader:
+    """PostgreSQL: COPY into temp staging tables, then merge set-based."""
+
+    def __init__(self, importer):
+        self.importer = importer
+        # Numbers each staged record, so the copy of a note listed twice
+        # that wins is known along with its tags.
+        self.seq = 0
+        self.connection = db.session.connection()
+        self.connection.execute(
+            text(
+                "CREATE TEMP TABLE stage_notes "
+                "(LIKE notes INCLUDING DEFAULTS, seq bigint NOT NULL) ON COMMIT DROP"
+            )
+        )
+        self.connection.execute(
+            text(
+                "CREATE TEMP TABLE stage_note_tags "
+                "(seq bigint NOT NULL, tag_name text NOT NULL) ON COMMIT DROP"
+            )
+        )
+
+    def _copy(self, table, columns, rows):
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        cursor = self.connection.connection.dbapi_connection.cursor()
+        try:
+            if hasattr(cursor, "copy_expert"):
+                cursor.copy_expert(sql, buffer)
+            else:
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        finally:
+            cursor.close()
+
+    def add(self, records):
+        importer = self.importer
+        note_rows = []
+        tag_rows = []
+        for record in records:
+            self.seq += 1
+            row = importer.note_row(record)
+            note_rows.append([row[column] for column in NOTE_COLUMNS] + [self.seq])
+            for name in set(record.get("tags") or []):
+                tag_rows.append((self.seq, name))
+
+        self._copy("stage_notes", NOTE_COLUMNS + ("seq",), note_rows)
+        if tag_rows:
+            self._copy("stage_note_tags", ("seq", "tag_name"), tag_rows)
+
+    def finish(self):
+        conn = self.connection
+        columns = ", ".join(NOTE_COLUMNS)
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}" for column in NOTE_COLUMNS if column != "id"
+        )
+
+        # ON CONFLICT cannot update a row twice in one statement, so a note
+        # the bundle lists more than once is reduced to its newest copy.
+        conn.execute(
+            text(
+                "CREATE TEMP TABLE stage_latest ON COMMIT DROP AS "
+                "SELECT DISTINCT ON (id) * FROM stage_notes "
+                "ORDER BY id, updated_at DESC, seq DESC"
+            )
+        )
+        conn.execute(
+            text(
+                "CREATE TEMP TABLE stage_written (id uuid PRIMARY KEY) ON COMMIT DROP"
+            )
+        )
+        conn.execute(
+            text(
+                f"""
+                WITH written AS (
+                    INSERT INTO notes ({columns})
+                    SELECT {columns} FROM stage_latest
+                    ON CONFLICT (id) DO UPDATE SET {updates},
+                        version = notes.version + 1
+                    WHERE notes.updated_at <= EXCLUDED.updated_at
+                    RETURNING id
+                )
+                INSERT INTO stage_written SELECT id FROM written
+                """
+            )
+        )
+
+        conn.execute(
+            text(
+                "INSERT INTO tags (name) SELECT DISTINCT s.tag_name "
+                "FROM stage_note_tags s JOIN stage_latest l ON l.seq = s.seq "
+                "ON CONFLICT (name) DO NOTHING"
+            )
+        )
+        conn.execute(
+            text(
+                "DELETE FROM note_tags USING stage_written "
+                "WHERE note_tags.note_id = stage_written.id"
+            )
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO note_tags (note_id, tag_id)
+                SELECT DISTINCT l.id, t.id
+                FROM stage_note_tags s
+                JOIN stage_latest l ON l.seq = s.seq
+                JOIN stage_written w ON w.id = l.id
+                JOIN tags t ON t.name = s.tag_name
+                ON CONFLICT DO NOTHING
+                """
+            )
+        )
+        conn.execute(
+            text(
+                """
+                UPDATE notes SET tag_ids = coalesce(
+                    (SELECT array_agg(tag_id ORDER BY tag_id)
+                     FROM note_tags WHERE note_tags.note_id = notes.id),
+                    '{}')
+                FROM stage_written
+                WHERE notes.id = stage_written.id
+                """
+            )
+        )
+        stage_written = table("stage_written", column("id"))
+        Note.refresh_search_vectors(select(stage_written.c.id))
+        written = conn.execute(select(stage_written.c.id)).scalars().all()
+        _queue_refresh(("notes.refresh_related",), written, self.importer.batch_size)
+        return len(written)
+
+
+def _read_records(path):
+    with _open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise click.ClickException(f"Line {line_number}: invalid JSON ({e})")
+
+
+def import_bundle(path, batch_size=1000, dry_run=False):
+    """Import a JSONL bundle produced by ``flask export``.
+
+    Runs inside the caller's app context; ``flask import-bundle`` provides it.
+    """
+    started = time.perf_counter()
+    records = _read_records(path)
+
+    header = next(records, None)
+    if not header or header.get("type") != "header":
+        raise click.ClickException("Not an export bundle: missing header line")
+
+    users = []
+    tags = []
+    pending = None
+    for record in records:
+        if record["type"] == "user":
+            users.append(record)
+        elif record["type"] == "tag":
+            tags.append(record)
+        else:
+            pending = record
+            break
+
+    def notes():
+        if pending is not None and pending["type"] == "note":
+            yield pending
+        for record in records:
+            if record["type"] == "note":
+                yield record
+
+    importer = BundleImport(batch_size=batch_size)
+    importer.load_users(users)
+    importer.load_tags(tags)
+    importer.load_notes(notes())
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        # The PostgreSQL loader writes with raw SQL, which the session hooks
+        # do not see; bump with the commit so cached rows and tag bars go.
+        generations.bump_after_commit("notes", "tags")
+        db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    rate = importer.notes_read / elapsed if elapsed else 0.0
+    click.echo(f"\nSummary:")
+    click.echo(f"  Users in bundle: {len(users)}")
+    click.echo(f"  Tags in bundle: {len(tags)}")
+    click.echo(f"  Notes read: {importer.notes_read}")
+    click.echo(f"  Notes written: {importer.notes_written}")
+    click.echo(f"  Elapsed: {elapsed:.1f}s ({rate:,.0f} rows/s)")
+    if dry_run:
+        click.echo("  [DRY RUN] Rolled back")
+    return importer
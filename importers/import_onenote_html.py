@@ -1,145 +1,207 @@
 # file: importers/import_onenote_html.py
 import os
-import sys
+import re
 import click
 from datetime import datetime, timezone
 from pathlib import Path
+from urllib.parse import unquote
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-
-try:
-    from markdownify import markdownify as md
-except ImportError:
-    md = None
-
-from app import create_app
+from app import duplicates
+from app.attachments.store import extract_images, save as save_attachment
 from app.extensions import db
-from app.models import Note, Tag
+from app.jobs import enqueue
+from app.models import Note, User
+from app.revisions import ensure_history, record_revision
+from app.utils.sections import with_sections
 
 
-@click.command()
-@click.option("--path", required=True, help="Directory containing .html files")
-@click.option(
-    "--dry-run", is_flag=True, help="Show what would be imported without saving"
-)
-@click.option(
-    "--user-id",
-    default=None,
-    help="User ID to set as creator (defaults to first admin)",
+# Images inside these are otherwise reduced to their alt text by markdownify.
+INLINE_IMAGE_PARENTS = ["td", "th", "li", "span", "a", "h1", "h2", "h3", "h4", "h5", "h6"]
+
+_IMG_SRC = re.compile(
+    r"(<img\b[^>]*?\bsrc\s*=\s*)([\"'])(.*?)\2", re.IGNORECASE | re.DOTALL
 )
-def import_onenote(path, dry_run, user_id):
-    """Import .html files (e.g., OneNote exported HTML) as notes."""
 
-    if md is None:
-        click.echo(
-            "Error: markdownify not installed. Run: pip install markdownify", err=True
-        )
-        sys.exit(1)
 
-    app = create_app()
+def _store_images(html_content, page_dir, root, write=True):
+    """Point ``<img>`` tags at stored attachments.
 
-    with app.app_context():
-        user = None
-        if user_id:
-            from app.models import User
+    Covers base64 ``data:`` URIs and the image files OneNote exports next to
+    each page (only those inside the export folder ``root``).
+    """
 
-            user = User.query.get(user_id)
+    def replace(match):
+        src = match.group(3).strip()
+        if src.startswith("data:"):
+            url = extract_images(src, write)
+        elif "://" in src or src.startswith("/"):
+            return match.group(0)
         else:
-            from app.models import User
-
-            user = User.query.filter_by(is_admin=True).first()
-
-        if not user:
-            click.echo(
-                "Error: No user found. Please provide --user-id or create an admin user first.",
-                err=True,
-            )
-            sys.exit(1)
-
-        path_obj = Path(path)
-        if not path_obj.exists():
-            click.echo(f"Error: Path does not exist: {path}", err=True)
-            sys.exit(1)
-
-        files_processed = 0
-        files_created = 0
-        files_updated = 0
-
-        for root, dirs, files in os.walk(path):
-            root_path = Path(root)
+            file_path = (page_dir / unquote(src)).resolve()
+            if root not in file_path.parents or not file_path.is_file():
+                return match.group(0)
+            url = save_attachment(file_path.read_bytes(), write)
+        if not url or url == src:
+            return match.group(0)
+        return f"{match.group(1)}{match.group(2)}{url}{match.group(2)}"
+
+    return _IMG_SRC.sub(replace, html_content)
+
+
+def import_onenote(path, dry_run=False, user_id=None, on_duplicate="keep"):
+    """Import .html files (e.g., OneNote exported HTML) as notes.
+
+    A new page whose body nearly matches an existing note is imported anyway
+    (``on_duplicate="keep"``), skipped (``"skip"``) or merged into that note
+    (``"merge"``: the note records the page's path in
+    ``note_metadata["merged_sources"]``); near-duplicates are reported either
+    way.
+
+    Runs inside the caller's app context; ``flask import-onenote`` provides it.
+    """
+    try:
+        from markdownify import markdownify as md
+    except ImportError:
+        raise click.ClickException(
+            "markdownify not installed. Run: pip install markdownify"
+        )
 
-            for filename in files:
-                if not filename.endswith(".html"):
-                    continue
+    if user_id:
+        user = User.query.get(user_id)
+    else:
+        user = User.query.filter_by(is_admin=True).first()
 
-                file_path = root_path / filename
-                full_path = str(file_path.resolve())
+    if not user:
+        raise click.ClickException(
+            "No user found. Please provide --user-id or create an admin user first."
+        )
 
-                try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        html_content = f.read()
-                except Exception as e:
-                    click.echo(f"Warning: Could not read {file_path}: {e}", err=True)
-                    continue
+    path_obj = Path(path)
+    if not path_obj.exists():
+        raise click.ClickException(f"Path does not exist: {path}")
+
+    files_processed = 0
+    files_created = 0
+    files_updated = 0
+    files_merged = 0
+    files_skipped = 0
+    touched_notes = []
+    near_duplicates = []
+
+    for root, dirs, files in os.walk(path):
+        root_path = Path(root)
+
+        for filename in files:
+            if not filename.endswith(".html"):
+                continue
+
+            file_path = root_path / filename
+            full_path = str(file_path.resolve())
+
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    html_content = f.read()
+            except Exception as e:
+                click.echo(f"Warning: Could not read {file_path}: {e}", err=True)
+                continue
+
+            title_match = re.search(
+                r"<title>(.*?)</title>", html_content, re.IGNORECASE | re.DOTALL
+            )
+            if title_match:
+                title = title_match.group(1).strip()
+            else:
+                title = file_path.stem
 
-                import re
+            html_content = _store_images(
+                html_content, root_path, path_obj.resolve(), write=not dry_run
+            )
 
-                title_match = re.search(
-                    r"<title>(.*?)</title>", html_content, re.IGNORECASE | re.DOTALL
+            try:
+                markdown_content = md(
+                    html_content, keep_inline_images_in=INLINE_IMAGE_PARENTS
                 )
-                if title_match:
-                    title = title_match.group(1).strip()
+                markdown_content = markdown_content.strip()
+            except Exception as e:
+                click.echo(f"Warning: Could not convert {file_path}: {e}", err=True)
+                continue
+
+            existing_note = Note.query.filter_by(source=full_path).first()
+
+            signature = match = None
+            if not existing_note:
+                signature = duplicates.body_signature(markdown_content)
+                match = duplicates.best_match(signature)
+                if match:
+                    near_duplicates.append((full_path, match))
+
+            if existing_note:
+                if dry_run:
+                    click.echo(f"[DRY RUN] Would update: {title} ({full_path})")
+                    files_updated += 1
+                else:
+                    ensure_history(existing_note)
+                    existing_note.title = title
+                    existing_note.body = markdown_content
+                    existing_note.updated_by_id = user.id
+                    existing_note.updated_at = datetime.now(timezone.utc)
+
+                    duplicates.stamp(existing_note)
+                    existing_note.note_metadata = with_sections(
+                        existing_note.note_metadata, existing_note.body
+                    )
+                    record_revision(existing_note, user.id)
+                    touched_notes.append(existing_note)
+                    files_updated += 1
+                    click.echo(f"Updated: {title}")
+            elif match and on_duplicate == "skip":
+                click.echo(f"Skipped near-duplicate: {title}")
+                files_skipped += 1
+            elif match and on_duplicate == "merge":
+                target = match[1]
+                if dry_run:
+                    click.echo(f"[DRY RUN] Would merge {title} into {target.title}")
                 else:
-                    title = file_path.stem
-
-                try:
-                    markdown_content = md(html_content)
-                    markdown_content = markdown_content.strip()
-                except Exception as e:
-                    click.echo(f"Warning: Could not convert {file_path}: {e}", err=True)
-                    continue
-
-                existing_note = Note.query.filter_by(source=full_path).first()
-
-                if existing_note:
-                    if dry_run:
-                        click.echo(f"[DRY RUN] Would update: {title} ({full_path})")
-                        files_updated += 1
-                    else:
-                        existing_note.title = title
-                        existing_note.body = markdown_content
-                        existing_note.updated_by_id = user.id
-                        existing_note.updated_at = datetime.now(timezone.utc)
-
-                        files_updated += 1
-                        click.echo(f"Updated: {title}")
+                    duplicates.merge_source(target, full_path)
+                    target.updated_at = datetime.now(timezone.utc)
+                    if target not in touched_notes:
+                        touched_notes.append(target)
+                    click.echo(f"Merged {title} into {target.title}")
+                files_merged += 1
+            else:
+                if dry_run:
+                    click.echo(f"[DRY RUN] Would create: {title} ({full_path})")
+                    files_created += 1
                 else:
-                    if dry_run:
-                        click.echo(f"[DRY RUN] Would create: {title} ({full_path})")
-                        files_created += 1
-                    else:
-                        note = Note(
-                            title=title,
-                            body=markdown_content,
-                            source=full_path,
-                            created_by_id=user.id,
-                            updated_by_id=user.id,
-                        )
-
-                        db.session.add(note)
-                        files_created += 1
-                        click.echo(f"Created: {title}")
-
-                files_processed += 1
-
-        if not dry_run:
-            db.session.commit()
-
-        click.echo(f"\nSummary:")
-        click.echo(f"  Files processed: {files_processed}")
-        click.echo(f"  Created: {files_created}")
-        click.echo(f"  Updated: {files_updated}")
-
-
-if __name__ == "__main__":
-    import_onenote()
+                    note = Note(
+                        title=title,
+                        body=markdown_content,
+                        source=full_path,
+                        created_by_id=user.id,
+                        updated_by_id=user.id,
+                    )
+
+                    duplicates.stamp(note, signature)
+                    note.note_metadata = with_sections(note.note_metadata, note.body)
+                    db.session.add(note)
+                    touched_notes.append(note)
+                    files_created += 1
+                    click.echo(f"Created: {title}")
+
+            files_processed += 1
+
+    if not dry_run:
+        db.session.flush()
+        if touched_notes:
+            note_ids = [note.id for note in touched_notes]
+            enqueue("notes.refresh_search", {"note_ids": note_ids})
+            enqueue("notes.refresh_related", {"note_ids": note_ids})
+        db.session.commit()
+
+    click.echo(f"\nSummary:")
+    click.echo(f"  Files processed: {files_processed}")
+    click.echo(f"  Created: {files_created}")
+    click.echo(f"  Updated: {files_updated}")
+    click.echo(f"  Merged: {files_merged}")
+    click.echo(f"  Skipped: {files_skipped}")
+    duplicates.report(near_duplicates)
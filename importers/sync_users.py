@@ -0,0 +1,212 @@
+# file: importers/sync_users.py
+"""Sync user accounts with a directory export (CSV or JSON).
+
+The number of statements is fixed, however many users the file lists:
+- The records go into a temporary table.
+- One UPDATE refreshes the accounts that already exist.
+- One bulk INSERT adds the new ones.
+- With ``deactivate_missing``, one more UPDATE deactivates the accounts
+  the file no longer lists.
+
+Hashing the new accounts' passwords is the slow part, so it runs on a
+process pool.
+"""
+import csv
+import json
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import sqlalchemy as sa
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models import User
+
+# Fewer new accounts than this are hashed in-process; starting a pool
+# would cost more than it saves.
+MIN_POOL_PASSWORDS = 16
+
+_staged = sa.Table(
+    "sync_users_staged",
+    sa.MetaData(),
+    sa.Column("email", sa.String(255), primary_key=True),
+    sa.Column("display_name", sa.String(100)),
+    sa.Column("is_admin", sa.Boolean),
+    prefixes=["TEMPORARY"],
+)
+
+_TRUE = {"1", "true", "yes", "y"}
+_FALSE = {"0", "false", "no", "n"}
+
+
+def _flag(value):
+    """A boolean from a CSV cell or JSON value; None when left blank."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"not a yes/no value: {value!r}")
+
+
+def read_records(path):
+    """The user records of a .csv file (with a header row) or a .json list."""
+    if path.endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return list(csv.DictReader(f))
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("users")
+        if not isinstance(data, list):
+            raise click.ClickException("A JSON file must hold a list of users")
+        return data
+    raise click.ClickException("Expected a .csv or .json file")
+
+
+def clean_records(records):
+    """Records by lower-cased email; raises ClickException listing problems."""
+    cleaned, errors = {}, []
+    for number, record in enumerate(records, 1):
+        if not isinstance(record, dict):
+            errors.append(f"record {number}: not an object")
+            continue
+        email = (record.get("email") or "").strip().lower()
+        display_name = (record.get("display_name") or "").strip() or None
+        if "@" not in email or len(email) > 255:
+            errors.append(f"record {number}: invalid email {email!r}")
+            continue
+        if display_name and len(display_name) > 100:
+            errors.append(f"record {number}: display_name is longer than 100 characters")
+            continue
+        try:
+            is_admin = _flag(record.get("is_admin"))
+        except ValueError as e:
+            errors.append(f"record {number}: is_admin is {e}")
+            continue
+        cleaned[email] = {
+            "email": email,
+            "display_name": display_name,
+            "is_admin": is_admin,
+            "password": record.get("password") or None,
+        }
+    if errors:
+        shown = "\n".join(errors[:20])
+        more = f"\n... and {len(errors) - 20} more" if len(errors) > 20 else ""
+        raise click.ClickException(f"Invalid user records:\n{shown}{more}")
+    return cleaned
+
+
+def hash_passwords(passwords, workers=None):
+    """``generate_password_hash`` of each password, in order."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(passwords) < MIN_POOL_PASSWORDS:
+        return [generate_password_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate_password_hash, passwords, chunksize=chunksize))
+
+
+def _matches_staged():
+    return sa.func.lower(User.email) == _staged.c.email
+
+
+def sync_users(path, deactivate_missing=False, workers=None, dry_run=False):
+    """Create, update and (optionally) deactivate users to match ``path``.
+
+    Listed accounts are reactivated, and take the file's display name and
+    admin flag where it gives them. New accounts get the file's password or,
+    without one, a random password that has to be reset. Admins are never
+    deactivated.
+
+    Runs inside the caller's app context; ``flask sync-users`` provides it.
+    """
+    records = clean_records(read_records(path))
+    if deactivate_missing and not records:
+        raise click.ClickException(
+            "The file lists no users; refusing to deactivate every account."
+        )
+
+    connection = db.session.connection()
+    _staged.drop(connection, checkfirst=True)
+    _staged.create(connection)
+    if records:
+        db.session.execute(
+            sa.insert(_staged),
+            [
+                {key: record[key] for key in ("email", "display_name", "is_admin")}
+                for record in records.values()
+            ],
+        )
+
+    new_emails = db.session.execute(
+        sa.select(_staged.c.email).where(~sa.exists().where(_matches_staged()))
+    ).scalars().all()
+
+    display_name = sa.func.coalesce(_staged.c.display_name, User.display_name)
+    is_admin = sa.func.coalesce(_staged.c.is_admin, User.is_admin)
+    updated = db.session.execute(
+        sa.update(User)
+        .where(
+            _matches_staged(),
+            sa.or_(
+                User.display_name.is_distinct_from(display_name),
+                User.is_admin.is_distinct_from(is_admin),
+                User.is_active.isnot(True),
+            ),
+        )
+        .values(display_name=display_name, is_admin=is_admin, is_active=True),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+
+    if new_emails:
+        new = [records[email] for email in new_emails]
+        hashes = hash_passwords(
+            [record["password"] or secrets.token_urlsafe(32) for record in new], workers
+        )
+        db.session.execute(
+            sa.insert(User),
+            [
+                {
+                    "email": record["email"],
+                    "display_name": record["display_name"] or record["email"],
+                    "is_admin": bool(record["is_admin"]),
+                    "is_active": True,
+                    "password_hash": password_hash,
+                }
+                for record, password_hash in zip(new, hashes)
+            ],
+        )
+
+    deactivated = 0
+    if deactivate_missing:
+        deactivated = db.session.execute(
+            sa.update(User)
+            .where(
+                User.is_active.is_(True),
+                User.is_admin.isnot(True),
+                ~sa.exists().where(_matches_staged()),
+            )
+            .values(is_active=False),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+    _staged.drop(db.session.connection())
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+
+    prefix = "[DRY RUN] " if dry_run else ""
+    click.echo(f"{prefix}Users in file: {len(records)}")
+    click.echo(f"{prefix}  Created: {len(new_emails)}")
+    click.echo(f"{prefix}  Updated: {updated}")
+    click.echo(f"{prefix}  Deactivated: {deactivated}")
+    return len(new_emails), updated, deactivated
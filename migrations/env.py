@@ -1,24 +1,22 @@
 # file: migrations/env.py
 from logging.config import fileConfig
+from flask import current_app
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 from alembic import context
-import os
-import sys
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-
-from app import create_app
+# ``flask db`` runs this inside the app it already loaded, so reuse it.
 from app.extensions import db
-from app.models import User, Note, Tag
 
 config = context.config
 
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
 
-app = create_app()
-config.set_main_option("sqlalchemy.url", app.config["SQLALCHEMY_DATABASE_URI"])
+config.set_main_option(
+    "sqlalchemy.url",
+    current_app.config["SQLALCHEMY_DATABASE_URI"].replace("%", "%%"),
+)
 
 target_metadata = db.metadata
 
@@ -0,0 +1,115 @@
+# file: migrations/versions/001_uuid_primary_keys.py
+"""Native UUID primary and foreign keys
+
+Revision ID: 001_uuid_primary_keys
+Revises:
+Create Date: 2026-10-19
+
+Converts users.id, notes.id and every column referencing them from
+VARCHAR(36) to UUID on PostgreSQL. Existing ids keep their value, so note URLs
+keep working. New ids are time-ordered (see app/utils/ids.py).
+
+On SQLite, SQLAlchemy's Uuid type stores 32 hex digits without dashes, so the
+stored values are rewritten instead.
+
+Only columns that are still text are touched, so running this against a
+database created with ``db.create_all()`` after the change is a no-op.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "001_uuid_primary_keys"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, referenced table, ON DELETE)
+FOREIGN_KEYS = [
+    ("notes", "created_by_id", "users", None),
+    ("notes", "updated_by_id", "users", None),
+    ("note_tags", "note_id", "notes", "CASCADE"),
+    ("note_revisions", "note_id", "notes", "CASCADE"),
+    ("note_revisions", "created_by_id", "users", None),
+]
+PRIMARY_KEYS = [("users", "id"), ("notes", "id")]
+
+
+def _text_columns(inspector):
+    columns = set()
+    tables = set(inspector.get_table_names())
+    for table, column in PRIMARY_KEYS + [(t, c) for t, c, _, _ in FOREIGN_KEYS]:
+        if table not in tables:
+            continue
+        for info in inspector.get_columns(table):
+            if info["name"] == column and isinstance(info["type"], sa.String):
+                columns.add((table, column))
+    return columns
+
+
+def _fk_name(table, column):
+    return f"{table}_{column}_fkey"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    pending = _text_columns(inspector)
+    if not pending:
+        return
+
+    if bind.dialect.name == "sqlite":
+        for table, column in sorted(pending):
+            op.execute(
+                f"UPDATE {table} SET {column} = lower(replace({column}, '-', '')) "
+                f"WHERE {column} IS NOT NULL"
+            )
+        return
+
+    foreign_keys = [fk for fk in FOREIGN_KEYS if (fk[0], fk[1]) in pending]
+    for table, column, _, _ in foreign_keys:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {_fk_name(table, column)}")
+
+    for table, column in PRIMARY_KEYS + [(t, c) for t, c, _, _ in foreign_keys]:
+        if (table, column) in pending:
+            op.execute(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE uuid USING {column}::uuid"
+            )
+
+    for table, column, referenced, ondelete in foreign_keys:
+        op.create_foreign_key(
+            _fk_name(table, column),
+            table,
+            referenced,
+            [column],
+            ["id"],
+            ondelete=ondelete,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    foreign_keys = [fk for fk in FOREIGN_KEYS if fk[0] in tables]
+    for table, column, _, _ in foreign_keys:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {_fk_name(table, column)}")
+
+    for table, column in PRIMARY_KEYS + [(t, c) for t, c, _, _ in foreign_keys]:
+        op.execute(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE varchar(36) "
+            f"USING {column}::text"
+        )
+
+    for table, column, referenced, ondelete in foreign_keys:
+        op.create_foreign_key(
+            _fk_name(table, column),
+            table,
+            referenced,
+            [column],
+            ["id"],
+            ondelete=ondelete,
+        )
@@ -0,0 +1,56 @@
+# file: migrations/versions/002_note_tag_ids.py
+"""Denormalized notes.tag_ids with a GIN index
+
+Revision ID: 002_note_tag_ids
+Revises: 001_uuid_primary_keys
+Create Date: 2026-10-19
+
+Adds notes.tag_ids (integer[] on PostgreSQL, JSON elsewhere), backfills it
+from note_tags and indexes it with GIN for ``tag_ids @> ARRAY[...]`` filters.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "002_note_tag_ids"
+down_revision: Union[str, None] = "001_uuid_primary_keys"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    columns = {c["name"] for c in sa.inspect(bind).get_columns("notes")}
+    if "tag_ids" in columns:
+        return
+
+    if bind.dialect.name == "postgresql":
+        op.add_column("notes", sa.Column("tag_ids", postgresql.ARRAY(sa.Integer())))
+        op.execute(
+            """
+            UPDATE notes SET tag_ids = coalesce(
+                (SELECT array_agg(tag_id ORDER BY tag_id)
+                 FROM note_tags WHERE note_tags.note_id = notes.id),
+                '{}')
+            """
+        )
+        op.create_index(
+            "ix_notes_tag_ids", "notes", ["tag_ids"], postgresql_using="gin"
+        )
+    else:
+        op.add_column("notes", sa.Column("tag_ids", sa.JSON()))
+        op.execute(
+            """
+            UPDATE notes SET tag_ids = (
+                SELECT json_group_array(tag_id)
+                FROM note_tags WHERE note_tags.note_id = notes.id)
+            """
+        )
+        op.create_index("ix_notes_tag_ids", "notes", ["tag_ids"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notes_tag_ids", table_name="notes")
+    op.drop_column("notes", "tag_ids")
@@ -0,0 +1,81 @@
+# file: migrations/versions/004_active_set_indexes.py
+"""Active-set partial indexes and the notes archive tables
+
+Revision ID: 004_active_set_indexes
+Revises: 003_jobs
+Create Date: 2026-10-19
+
+Adds partial indexes on notes (updated_at, created_at, title, and a GIN index
+on search_vector) restricted to ``is_archived IS false``. Also creates
+notes_archive and note_revisions_archive, which are used when
+NOTES_ARCHIVE_TABLE is set.
+
+On a large PostgreSQL table, build the indexes by hand with
+CREATE INDEX CONCURRENTLY before running this revision; it skips indexes
+that already exist.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "004_active_set_indexes"
+down_revision: Union[str, None] = "003_jobs"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = sa.column("is_archived").is_(False)
+INDEXES = [
+    ("ix_notes_active_updated_at", "updated_at", {}),
+    ("ix_notes_active_created_at", "created_at", {}),
+    ("ix_notes_active_title", "title", {}),
+    ("ix_notes_active_search_vector", "search_vector", {"postgresql_using": "gin"}),
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = {index["name"] for index in inspector.get_indexes("notes")}
+
+    for name, column, options in INDEXES:
+        if name in existing:
+            continue
+        op.create_index(
+            name,
+            "notes",
+            [column],
+            postgresql_where=ACTIVE,
+            sqlite_where=ACTIVE,
+            **options,
+        )
+
+    # Bare copies of the live tables: same columns, no defaults, foreign keys
+    # or secondary indexes.
+    for source, name in (
+        ("notes", "notes_archive"),
+        ("note_revisions", "note_revisions_archive"),
+    ):
+        if inspector.has_table(name) or not inspector.has_table(source):
+            continue
+        live = sa.Table(source, sa.MetaData(), autoload_with=bind)
+        op.create_table(
+            name,
+            *[
+                sa.Column(
+                    column.name,
+                    column.type,
+                    primary_key=column.primary_key,
+                    nullable=column.nullable,
+                    autoincrement=False,
+                )
+                for column in live.columns
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("note_revisions_archive")
+    op.drop_table("notes_archive")
+    for name, _, _ in INDEXES:
+        op.drop_index(name, table_name="notes")
@@ -0,0 +1,55 @@
+# file: migrations/versions/005_sort_key_indexes.py
+"""Composite (sort key, id) indexes for every notes list sort mode
+
+Revision ID: 005_sort_key_indexes
+Revises: 004_active_set_indexes
+Create Date: 2026-10-19
+
+Replaces the single-column active-set indexes from 004 with (key, id) indexes
+on updated_at, created_at and lower(title), so every mode in
+app/notes/query.SORT_MODES reads its first page straight from an index, with
+id breaking ties. On a large PostgreSQL table, build them by hand with
+CREATE INDEX CONCURRENTLY first; this revision skips indexes that exist.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "005_sort_key_indexes"
+down_revision: Union[str, None] = "004_active_set_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE = sa.column("is_archived").is_(False)
+NEW_INDEXES = [
+    ("ix_notes_active_updated_at_id", ["updated_at", "id"]),
+    ("ix_notes_active_created_at_id", ["created_at", "id"]),
+    ("ix_notes_active_lower_title_id", [sa.text("lower(title)"), "id"]),
+]
+OLD_INDEXES = [
+    ("ix_notes_active_updated_at", ["updated_at"]),
+    ("ix_notes_active_created_at", ["created_at"]),
+    ("ix_notes_active_title", ["title"]),
+]
+
+
+def _replace(create, drop):
+    inspector = sa.inspect(op.get_bind())
+    existing = {index["name"] for index in inspector.get_indexes("notes")}
+    for name, columns in create:
+        if name not in existing:
+            op.create_index(
+                name, "notes", columns, postgresql_where=ACTIVE, sqlite_where=ACTIVE
+            )
+    for name, _ in drop:
+        if name in existing:
+            op.drop_index(name, table_name="notes")
+
+
+def upgrade() -> None:
+    _replace(NEW_INDEXES, OLD_INDEXES)
+
+
+def downgrade() -> None:
+    _replace(OLD_INDEXES, NEW_INDEXES)
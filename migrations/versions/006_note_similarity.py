@@ -0,0 +1,75 @@
+# file: migrations/versions/006_note_similarity.py
+"""Related-notes tables
+
+Revision ID: 006_note_similarity
+Revises: 005_sort_key_indexes
+Create Date: 2026-10-19
+
+Adds ``note_signatures``, ``note_signature_bands`` and ``note_similarities``.
+They start empty; run ``flask rebuild-related`` once after upgrading.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "006_note_similarity"
+down_revision: Union[str, None] = "005_sort_key_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _note_fk(name, primary_key=True):
+    return sa.Column(
+        name,
+        sa.Uuid(as_uuid=False),
+        sa.ForeignKey("notes.id", ondelete="CASCADE"),
+        primary_key=primary_key,
+    )
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("note_signatures"):
+        op.create_table(
+            "note_signatures",
+            _note_fk("note_id"),
+            sa.Column(
+                "minhash",
+                sa.JSON().with_variant(postgresql.JSONB(), "postgresql"),
+                nullable=False,
+            ),
+            sa.Column("computed_at", sa.DateTime(), nullable=True),
+        )
+
+    if not inspector.has_table("note_signature_bands"):
+        op.create_table(
+            "note_signature_bands",
+            _note_fk("note_id"),
+            sa.Column("band", sa.SmallInteger(), primary_key=True),
+            sa.Column("bucket", sa.BigInteger(), nullable=False),
+        )
+        op.create_index(
+            "ix_note_signature_bands_bucket", "note_signature_bands", ["band", "bucket"]
+        )
+
+    if not inspector.has_table("note_similarities"):
+        op.create_table(
+            "note_similarities",
+            _note_fk("note_id"),
+            _note_fk("related_id"),
+            sa.Column("score", sa.Float(), nullable=False),
+        )
+        op.create_index(
+            "ix_note_similarities_related_id", "note_similarities", ["related_id"]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_note_similarities_related_id", table_name="note_similarities")
+    op.drop_table("note_similarities")
+    op.drop_index("ix_note_signature_bands_bucket", table_name="note_signature_bands")
+    op.drop_table("note_signature_bands")
+    op.drop_table("note_signatures")
@@ -0,0 +1,33 @@
+# file: migrations/versions/007_minhash_bands_index.py
+"""Near-duplicate band index
+
+Revision ID: 007_minhash_bands_index
+Revises: 006_note_similarity
+Create Date: 2026-10-19
+
+Adds a GIN index on ``note_metadata -> 'minhash_bands'`` (PostgreSQL only).
+Existing notes get their signatures from ``flask find-duplicates``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "007_minhash_bands_index"
+down_revision: Union[str, None] = "006_note_similarity"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_notes_minhash_bands "
+        "ON notes USING gin ((note_metadata -> 'minhash_bands'))"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_notes_minhash_bands")
@@ -0,0 +1,37 @@
+# file: migrations/versions/009_cache_generations.py
+"""Cache generations
+
+Revision ID: 009_cache_generations
+Revises: 008_api_tokens
+Create Date: 2026-10-19
+
+Adds ``cache_generations``, the per-namespace invalidation counters read by
+app/generations.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "009_cache_generations"
+down_revision: Union[str, None] = "008_api_tokens"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAMESPACES = ("notes", "tags", "users")
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("cache_generations"):
+        return
+
+    table = op.create_table(
+        "cache_generations",
+        sa.Column("namespace", sa.String(length=50), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+    )
+    op.bulk_insert(table, [{"namespace": name, "value": 0} for name in NAMESPACES])
+
+
+def downgrade() -> None:
+    op.drop_table("cache_generations")
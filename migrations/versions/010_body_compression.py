@@ -0,0 +1,59 @@
+# file: migrations/versions/010_body_compression.py
+"""LZ4 compression of note bodies
+
+Revision ID: 010_body_compression
+Revises: 009_cache_generations
+Create Date: 2026-10-19
+
+PostgreSQL compresses and chunks large text values out of line (TOAST);
+this switches the body columns from pglz to lz4, which decompresses
+several times faster. Needs PostgreSQL 14 built with lz4, and applies to
+values written afterwards; on other servers it does nothing.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "010_body_compression"
+down_revision: Union[str, None] = "009_cache_generations"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Revision data is zlib-compressed by the app already.
+COLUMNS = [("notes", "body"), ("notes_archive", "body")]
+
+
+def _lz4_available(bind):
+    if bind.dialect.name != "postgresql":
+        return False
+    if int(bind.execute(sa.text("SHOW server_version_num")).scalar()) < 140000:
+        return False
+    # Only servers built with lz4 accept it as the default.
+    try:
+        with bind.begin_nested():
+            bind.execute(sa.text("SET LOCAL default_toast_compression = 'lz4'"))
+    except sa.exc.DBAPIError:
+        return False
+    return True
+
+
+def _set_compression(method):
+    bind = op.get_bind()
+    if not _lz4_available(bind):
+        return
+    inspector = sa.inspect(bind)
+    for table, column in COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        if column not in {c["name"] for c in inspector.get_columns(table)}:
+            continue
+        op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET COMPRESSION {method}")
+
+
+def upgrade() -> None:
+    _set_compression("lz4")
+
+
+def downgrade() -> None:
+    _set_compression("pglz")
@@ -0,0 +1,40 @@
+# file: migrations/versions/011_note_versions.py
+"""Note versions for optimistic locking
+
+Revision ID: 011_note_versions
+Revises: 010_body_compression
+Create Date: 2026-10-19
+
+Adds ``version`` to notes and notes_archive. Existing rows start at 1; the
+ORM checks and bumps it on every UPDATE of a note.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "011_note_versions"
+down_revision: Union[str, None] = "010_body_compression"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("notes", "notes_archive")
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        columns = {c["name"] for c in inspector.get_columns(table)}
+        if "version" in columns:
+            continue
+        # A constant default: PostgreSQL 11+ adds the column without
+        # rewriting the table.
+        op.add_column(
+            table,
+            sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+        )
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_column(table, "version")
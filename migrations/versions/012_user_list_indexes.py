@@ -0,0 +1,43 @@
+# file: migrations/versions/012_user_list_indexes.py
+"""Indexes for the paged, searchable admin user list
+
+Revision ID: 012_user_list_indexes
+Revises: 011_note_versions
+Create Date: 2026-10-19
+
+Adds (created_at, id) for the newest-first pages, and lower(email) and
+lower(display_name) for case-insensitive prefix search and for matching
+synced users by email. On PostgreSQL the expression indexes use
+varchar_pattern_ops, so ``LIKE 'abc%'`` can use them under any collation.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "012_user_list_indexes"
+down_revision: Union[str, None] = "011_note_versions"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _indexes(dialect):
+    ops = " varchar_pattern_ops" if dialect == "postgresql" else ""
+    return [
+        ("ix_users_created_at_id", ["created_at", "id"]),
+        ("ix_users_email_lower", [sa.text(f"lower(email){ops}")]),
+        ("ix_users_display_name_lower", [sa.text(f"lower(display_name){ops}")]),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = {index["name"] for index in sa.inspect(bind).get_indexes("users")}
+    for name, columns in _indexes(bind.dialect.name):
+        if name not in existing:
+            op.create_index(name, "users", columns)
+
+
+def downgrade() -> None:
+    for name, _ in _indexes(op.get_bind().dialect.name):
+        op.drop_index(name, table_name="users")
@@ -0,0 +1,69 @@
+# file: migrations/versions/013_note_revisions.py
+"""Note revision history tables
+
+Revision ID: 013_note_revisions
+Revises: 012_user_list_indexes
+Create Date: 2026-10-19
+
+Adds ``note_revisions``, the snapshot and delta history written on every
+save (app/revisions.py), and its bare archive copy
+``note_revisions_archive``. ``004_active_set_indexes`` only copies tables
+that already exist, so on databases upgraded from before the history
+existed it left the archive table out as well.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "013_note_revisions"
+down_revision: Union[str, None] = "012_user_list_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns():
+    return [
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("note_id", sa.Uuid(as_uuid=False), nullable=False),
+        sa.Column("number", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(length=10), nullable=False),
+        sa.Column("title", sa.String(length=255), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("body_size", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("created_by_id", sa.Uuid(as_uuid=False), nullable=True),
+    ]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table("note_revisions"):
+        op.create_table(
+            "note_revisions",
+            *_columns(),
+            # Named as 001_uuid_primary_keys names them.
+            sa.ForeignKeyConstraint(
+                ["note_id"],
+                ["notes.id"],
+                name="note_revisions_note_id_fkey",
+                ondelete="CASCADE",
+            ),
+            sa.ForeignKeyConstraint(
+                ["created_by_id"], ["users.id"], name="note_revisions_created_by_id_fkey"
+            ),
+            sa.UniqueConstraint("note_id", "number", name="uq_note_revisions_note_number"),
+        )
+
+    # Same columns, no foreign keys or secondary indexes, as in 004.
+    if not inspector.has_table("note_revisions_archive"):
+        columns = _columns()
+        for column in columns:
+            column.autoincrement = False
+        op.create_table("note_revisions_archive", *columns)
+
+
+def downgrade() -> None:
+    op.drop_table("note_revisions_archive")
+    op.drop_table("note_revisions")
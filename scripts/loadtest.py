@@ -0,0 +1,191 @@
+# file: scripts/loadtest.py
+"""Measure requests/second for notes.index and notes.view.
+
+Either point it at a running server with --url, or pass one or more
+--setting WORKERSxTHREADS values to start gunicorn with each setting in turn:
+
+    python scripts/loadtest.py --email admin@example.com --password admin123 \
+        --setting 1x1 --setting 2x4 --setting 4x8
+"""
+import http.cookiejar
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+import click
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+NOTE_LINK_RE = re.compile(r'href="/notes/([0-9a-fA-F-]{32,36})"')
+
+
+class Client:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def get(self, path):
+        with self.opener.open(self.base_url + path, timeout=30) as response:
+            return response.status, response.read().decode("utf-8", "replace")
+
+    def login(self, email, password):
+        _, html = self.get("/auth/login")
+        form = {"email": email, "password": password}
+        match = CSRF_RE.search(html)
+        if match:
+            form["csrf_token"] = match.group(1)
+        data = urllib.parse.urlencode(form).encode()
+        with self.opener.open(self.base_url + "/auth/login", data, timeout=30) as r:
+            r.read()
+        status, html = self.get("/")
+        if "/auth/login" in html and "Logout" not in html:
+            raise click.ClickException(f"Login failed for {email}")
+        return html
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/auth/login", timeout=2).read()
+            return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.25)
+    raise click.ClickException(f"Server at {base_url} did not come up")
+
+
+def run_load(base_url, path, email, password, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    clients = []
+    for _ in range(concurrency):
+        client = Client(base_url)
+        client.login(email, password)
+        clients.append(client)
+
+    stop_at = time.monotonic() + duration
+
+    def worker(client):
+        local = []
+        local_errors = 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                status, _ = client.get(path)
+                if status != 200:
+                    local_errors += 1
+            except (urllib.error.URLError, ConnectionError):
+                local_errors += 1
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(c,)) for c in clients]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors[0],
+        "rps": count / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if count else 0.0,
+        "p95_ms": latencies[int(count * 0.95) - 1] * 1000 if count else 0.0,
+    }
+
+
+def run_endpoints(base_url, email, password, concurrency, duration, note_id):
+    index_html = Client(base_url).login(email, password)
+    if not note_id:
+        match = NOTE_LINK_RE.search(index_html)
+        if not match:
+            raise click.ClickException("No notes found to drive notes.view")
+        note_id = match.group(1)
+
+    results = {}
+    for endpoint, path in (("notes.index", "/"), ("notes.view", f"/notes/{note_id}")):
+        results[endpoint] = run_load(
+            base_url, path, email, password, concurrency, duration
+        )
+    return results
+
+
+def print_results(label, results):
+    for endpoint, r in results.items():
+        click.echo(
+            f"{label:>10}  {endpoint:<12} {r['rps']:8.1f} req/s  "
+            f"p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  "
+            f"({r['requests']} requests, {r['errors']} errors)"
+        )
+
+
+@click.command()
+@click.option("--url", default=None, help="Base URL of an already running server")
+@click.option(
+    "--setting",
+    "settings",
+    multiple=True,
+    help="WORKERSxTHREADS to start gunicorn with (repeatable), e.g. 4x8",
+)
+@click.option("--email", required=True, help="Login email")
+@click.option("--password", required=True, help="Login password")
+@click.option("--concurrency", default=16, show_default=True, help="Client threads")
+@click.option("--duration", default=10.0, show_default=True, help="Seconds per run")
+@click.option("--note-id", default=None, help="Note to request for notes.view")
+@click.option("--port", default=5055, show_default=True, help="Port for gunicorn")
+def main(url, settings, email, password, concurrency, duration, note_id, port):
+    """Load test notes.index and notes.view."""
+    if url:
+        results = run_endpoints(url, email, password, concurrency, duration, note_id)
+        print_results("external", results)
+        return
+
+    if not settings:
+        raise click.UsageError("Pass --url or at least one --setting")
+
+    base_url = f"http://127.0.0.1:{port}"
+    for setting in settings:
+        workers, _, threads = setting.partition("x")
+        env = dict(
+            os.environ,
+            WEB_CONCURRENCY=workers,
+            GUNICORN_THREADS=threads or "1",
+            GUNICORN_BIND=f"127.0.0.1:{port}",
+            GUNICORN_ACCESS_LOG="/dev/null",
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+            cwd=ROOT,
+            env=env,
+        )
+        try:
+            wait_until_up(base_url)
+            results = run_endpoints(
+                base_url, email, password, concurrency, duration, note_id
+            )
+            print_results(setting, results)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# file: tests/test_admin.py
+import json
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.security import check_password_hash
+
+from app.extensions import db
+from app.models import User
+from importers import sync_users
+
+
+def _contractors(app, count):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    with app.app_context():
+        for i in range(count):
+            user = User(
+                email=f"c{i:03d}@contractor.example",
+                display_name=f"Contractor {i:03d}",
+                password_hash="x",
+                created_at=start + timedelta(minutes=i),
+            )
+            db.session.add(user)
+        db.session.commit()
+
+
+def test_user_list_pages_and_searches(app, admin_client):
+    app.config["ADMIN_USERS_PER_PAGE"] = 10
+    _contractors(app, 25)
+
+    page = admin_client.get("/admin/users").get_data(as_text=True)
+    assert "c024@contractor.example" in page
+    assert "c010@contractor.example" not in page
+    assert "page=2" in page
+
+    page = admin_client.get("/admin/users?q=C00&status=active").get_data(as_text=True)
+    assert page.count("@contractor.example") == 10
+    page = admin_client.get("/admin/users?q=contractor 01").get_data(as_text=True)
+    assert page.count("@contractor.example") == 10
+    # LIKE wildcards in the search are taken literally.
+    page = admin_client.get("/admin/users?q=c_0").get_data(as_text=True)
+    assert "No users match" in page
+
+
+def test_bulk_deactivate_and_activate(app, admin_client):
+    _contractors(app, 3)
+    with app.app_context():
+        ids = [user.id for user in User.query.filter(User.email.like("c%")).all()]
+        admin_id = User.query.filter_by(email="admin@test.com").first().id
+
+    response = admin_client.post(
+        "/admin/users/bulk?status=active",
+        data={"action": "deactivate", "user_ids": ids + [admin_id]},
+    )
+    assert response.status_code == 302
+    assert "status=active" in response.headers["Location"]
+    with app.app_context():
+        assert User.query.filter_by(is_active=False).count() == 3
+        assert db.session.get(User, admin_id).is_active
+
+    admin_client.post("/admin/users/bulk", data={"action": "activate", "user_ids": ids[:1]})
+    with app.app_context():
+        assert User.query.filter_by(is_active=False).count() == 2
+
+
+def test_user_list_is_admin_only(logged_in_client):
+    assert logged_in_client.get("/admin/users").status_code == 403
+    assert logged_in_client.post("/admin/users/bulk").status_code == 403
+
+
+def _sync(app, path, *args):
+    return app.test_cli_runner().invoke(args=["sync-users", "--path", str(path), *args])
+
+
+def test_sync_users_upserts_and_deactivates(app, tmp_path):
+    _contractors(app, 3)
+    csv_path = tmp_path / "directory.csv"
+    csv_path.write_text(
+        "email,display_name,is_admin,password\n"
+        "C000@Contractor.example,Renamed Contractor,,\n"
+        "new@contractor.example,New Hire,no,s3cret-pass\n"
+        "user@test.com,Test User,,\n"
+    )
+
+    result = _sync(app, csv_path, "--deactivate-missing", "--workers", "1")
+    assert result.exit_code == 0, result.output
+    assert "Created: 1" in result.output
+    assert "Updated: 1" in result.output
+    assert "Deactivated: 2" in result.output
+
+    with app.app_context():
+        users = {user.email: user for user in User.query.all()}
+        assert users["c000@contractor.example"].display_name == "Renamed Contractor"
+        assert check_password_hash(users["new@contractor.example"].password_hash, "s3cret-pass")
+        assert not users["c001@contractor.example"].is_active
+        # Admins are never deactivated by a sync.
+        assert users["admin@test.com"].is_active
+
+    # Running it again changes nothing.
+    result = _sync(app, csv_path, "--deactivate-missing")
+    assert "Created: 0" in result.output and "Updated: 0" in result.output
+
+
+def test_sync_users_hashes_new_passwords_in_a_pool(app, tmp_path):
+    json_path = tmp_path / "directory.json"
+    records = [{"email": f"n{i}@contractor.example"} for i in range(sync_users.MIN_POOL_PASSWORDS)]
+    json_path.write_text(json.dumps({"users": records}))
+
+    result = _sync(app, json_path, "--workers", "2")
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        new = User.query.filter(User.email.like("n%")).all()
+        assert len(new) == sync_users.MIN_POOL_PASSWORDS
+        assert len({user.password_hash for user in new}) == len(new)
+        assert all(user.display_name == user.email for user in new)
+
+
+def test_sync_users_rejects_bad_records(app, tmp_path):
+    json_path = tmp_path / "directory.json"
+    json_path.write_text(json.dumps([{"email": "nobody"}, {"email": "a@b.c", "is_admin": "maybe"}]))
+    result = _sync(app, json_path)
+    assert result.exit_code != 0
+    assert "record 1: invalid email" in result.output
+    assert "record 2: is_admin is not a yes/no value" in result.output
+
+    json_path.write_text("[]")
+    assert _sync(app, json_path, "--deactivate-missing").exit_code != 0
+    with app.app_context():
+        assert User.query.filter_by(is_active=False).count() == 0
@@ -0,0 +1,173 @@
+# file: tests/test_api.py
+import gzip
+import re
+
+import pytest
+
+from app.extensions import db
+from app.models import ApiToken, Note, NoteRevision, User, note_tags
+
+
+@pytest.fixture
+def api(app):
+    """A test client sending a valid bearer token."""
+    app.config["JOBS_EAGER"] = False
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        _, secret = ApiToken.issue(user, "tests")
+        db.session.commit()
+
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {secret}"
+    return client
+
+
+def _statements(response):
+    timing = response.headers["Server-Timing"]
+    return int(re.search(r'desc="(\d+) queries"', timing).group(1))
+
+
+def _create(api, count, **extra):
+    items = [
+        dict({"title": f"Note {i:02d}", "body": f"Body {i}", "tags": ["vpn"]}, **extra)
+        for i in range(count)
+    ]
+    response = api.post("/api/v1/notes/batch", json={"create": items})
+    assert response.status_code == 200, response.get_json()
+    return response
+
+
+def test_requires_token(app, client):
+    response = client.get("/api/v1/notes")
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+    client.environ_base["HTTP_AUTHORIZATION"] = "Bearer nope"
+    assert client.get("/api/v1/notes").status_code == 401
+
+
+def test_create_get_and_update(app, api):
+    response = api.post(
+        "/api/v1/notes", json={"title": "VPN", "body": "Reconnect", "tags": ["VPN", "net"]}
+    )
+    assert response.status_code == 201
+    note = response.get_json()["data"]
+    assert note["tags"] == ["net", "vpn"]
+
+    response = api.patch(f"/api/v1/notes/{note['id']}", json={"body": "Reinstall"})
+    assert response.status_code == 200
+    assert response.get_json()["data"]["title"] == "VPN"
+
+    data = api.get(f"/api/v1/notes/{note['id']}?fields=body,tags").get_json()["data"]
+    assert data == {"id": note["id"], "body": "Reinstall", "tags": ["net", "vpn"]}
+
+    with app.app_context():
+        assert NoteRevision.query.filter_by(note_id=note["id"]).count() == 2
+        rows = db.session.execute(
+            note_tags.select().where(note_tags.c.note_id == note["id"])
+        ).all()
+        assert len(rows) == 2
+
+
+def test_invalid_batch_writes_nothing(app, api):
+    response = api.post(
+        "/api/v1/notes/batch",
+        json={"create": [{"title": "ok", "body": "ok"}, {"title": "", "tags": "x"}]},
+    )
+    assert response.status_code == 400
+    errors = {detail["error"] for detail in response.get_json()["details"]}
+    assert errors == {
+        "title must not be empty",
+        "body is required",
+        "tags must be a list of strings",
+    }
+    with app.app_context():
+        assert Note.query.count() == 0
+
+
+def test_list_pages_with_cursor_and_sparse_fields(api):
+    _create(api, 7)
+
+    seen = []
+    first = url = "/api/v1/notes?sort=title_asc&limit=3&fields=title"
+    while url:
+        page = api.get(url).get_json()
+        assert all(set(item) == {"id", "title"} for item in page["data"])
+        seen += [item["title"] for item in page["data"]]
+        cursor = page["next_cursor"]
+        url = f"{first}&cursor={cursor}" if cursor else None
+    assert seen == [f"Note {i:02d}" for i in range(7)]
+
+    page = api.get("/api/v1/notes?limit=2").get_json()
+    assert "body" not in page["data"][0]
+    second = api.get(f"/api/v1/notes?limit=2&cursor={page['next_cursor']}").get_json()
+    assert not {n["id"] for n in page["data"]} & {n["id"] for n in second["data"]}
+
+
+def test_batch_get_reports_missing(api):
+    ids = [note["id"] for note in _create(api, 3).get_json()["data"]]
+    unknown = "00000000-0000-7000-8000-000000000000"
+    response = api.get(f"/api/v1/notes/batch?ids={ids[2]},{unknown},{ids[0]}")
+    body = response.get_json()
+    assert [note["id"] for note in body["data"]] == [ids[2], ids[0]]
+    assert body["missing"] == [unknown]
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/v1/notes?limit=50",
+        "/api/v1/notes?tag=vpn&fields=title,tags",
+        "/api/v1/notes/batch?ids={ids}",
+        "/api/v1/tags",
+    ],
+)
+def test_reads_use_a_fixed_number_of_statements(api, url):
+    counts = []
+    for size in (2, 12):
+        ids = ",".join(note["id"] for note in _create(api, size).get_json()["data"])
+        counts.append(_statements(api.get(url.format(ids=ids))))
+    assert counts[0] == counts[1]
+
+
+def test_batch_writes_use_a_fixed_number_of_statements(api):
+    counts = []
+    # The first round also creates the tags.
+    for size in (1, 2, 12):
+        created = _create(api, size)
+        ids = [note["id"] for note in created.get_json()["data"]]
+        updated = api.post(
+            "/api/v1/notes/batch",
+            json={"update": [{"id": i, "body": "changed", "tags": ["db"]} for i in ids]},
+        )
+        assert updated.status_code == 200
+        counts.append((_statements(created), _statements(updated)))
+    assert counts[1] == counts[2]
+
+
+def test_responses_are_compressed(api):
+    _create(api, 20)
+    response = api.get("/api/v1/notes", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert b'"data"' in gzip.decompress(response.data)
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    small = api.get("/api/v1/tags", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_stale_versions_are_rejected(app, api):
+    note = api.post("/api/v1/notes", json={"title": "VPN", "body": "Reconnect"}).get_json()["data"]
+    assert note["version"] == 1
+
+    response = api.patch(f"/api/v1/notes/{note['id']}", json={"body": "Reinstall", "version": 1})
+    assert response.status_code == 200
+    assert response.get_json()["data"]["version"] == 2
+
+    response = api.patch(f"/api/v1/notes/{note['id']}", json={"body": "Restart", "version": 1})
+    assert response.status_code == 409
+    assert response.get_json()["details"] == [
+        {"update": 0, "error": "note has changed", "version": 2}
+    ]
+    data = api.get(f"/api/v1/notes/{note['id']}?fields=body,version").get_json()["data"]
+    assert data == {"id": note["id"], "body": "Reinstall", "version": 2}
@@ -0,0 +1,152 @@
+# file: tests/test_archive.py
+from datetime import datetime, timedelta, timezone
+
+from app.archive import sweep
+from app.extensions import db
+from app.models import ArchivedNote, Note, NoteRevision, Tag, User, note_tags
+from app.revisions import record_revision
+
+
+def _note(user_id, title, archived=False, tags=(), age_days=60):
+    note = Note(
+        title=title,
+        body=f"{title} body",
+        is_archived=archived,
+        created_by_id=user_id,
+        updated_by_id=user_id,
+    )
+    for name in tags:
+        note.tags.append(Tag.get_or_create(name))
+    db.session.add(note)
+    db.session.flush()
+    note.sync_tag_ids()
+    record_revision(note, user_id)
+    note.updated_at = datetime.now(timezone.utc) - timedelta(days=age_days)
+    db.session.commit()
+    return note.id
+
+
+def _setup(app):
+    app.config["NOTES_ARCHIVE_TABLE"] = True
+    user = User.query.filter_by(email="user@test.com").first()
+    active_id = _note(user.id, "Active note", tags=["vpn"])
+    old_id = _note(user.id, "Old archived", archived=True, tags=["vpn", "legacy"])
+    recent_id = _note(user.id, "Recent archived", archived=True, age_days=1)
+    return active_id, old_id, recent_id
+
+
+def test_sweep_moves_old_archived_notes(app):
+    with app.app_context():
+        active_id, old_id, recent_id = _setup(app)
+
+        assert sweep(30) == 1
+
+        assert db.session.get(Note, old_id) is None
+        swept = db.session.get(ArchivedNote, old_id)
+        assert swept.title == "Old archived"
+        assert sorted(tag.name for tag in swept.tags) == ["legacy", "vpn"]
+        assert NoteRevision.query.filter_by(note_id=old_id).count() == 0
+        assert db.session.execute(
+            note_tags.select().where(note_tags.c.note_id == old_id)
+        ).first() is None
+
+        assert db.session.get(Note, recent_id) is not None
+        assert db.session.get(Note, active_id) is not None
+
+
+def test_list_reads_archive_only_when_asked(app, logged_in_client):
+    with app.app_context():
+        _setup(app)
+        sweep(30)
+
+    page = logged_in_client.get("/").get_data(as_text=True)
+    assert "Active note" in page
+    assert "Old archived" not in page
+
+    page = logged_in_client.get("/?archived=1").get_data(as_text=True)
+    assert "Active note" in page
+    assert "Recent archived" in page
+    assert "Old archived" in page
+
+    page = logged_in_client.get("/?archived=1&tag=legacy").get_data(as_text=True)
+    assert "Old archived" in page
+    assert "Active note" not in page
+
+
+def test_view_and_unarchive_swept_note(app, logged_in_client):
+    with app.app_context():
+        _, old_id, _ = _setup(app)
+        sweep(30)
+
+    response = logged_in_client.get(f"/notes/{old_id}")
+    assert response.status_code == 200
+    assert "Old archived body" in response.get_data(as_text=True)
+    assert logged_in_client.get(f"/notes/{old_id}/edit").status_code == 404
+
+    response = logged_in_client.post(f"/notes/{old_id}/archive")
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert db.session.get(ArchivedNote, old_id) is None
+        note = db.session.get(Note, old_id)
+        assert note.is_archived is False
+        assert sorted(tag.name for tag in note.tags) == ["legacy", "vpn"]
+        assert sorted(note.tag_ids) == sorted(tag.id for tag in note.tags)
+        assert NoteRevision.query.filter_by(note_id=old_id).count() == 1
+
+
+def test_swept_notes_are_hidden_when_mode_is_off(app, logged_in_client):
+    with app.app_context():
+        _, old_id, _ = _setup(app)
+        sweep(30)
+        app.config["NOTES_ARCHIVE_TABLE"] = False
+
+    assert logged_in_client.get(f"/notes/{old_id}").status_code == 404
+    page = logged_in_client.get("/?archived=1").get_data(as_text=True)
+    assert "Old archived" not in page
+
+
+def test_export_includes_swept_notes(app):
+    from app.export import export_query
+
+    with app.app_context():
+        _setup(app)
+        sweep(30)
+
+        titles = {note.title for note in export_query(archived="include")}
+        assert titles == {"Active note", "Old archived", "Recent archived"}
+        titles = {note.title for note in export_query(archived="exclude")}
+        assert titles == {"Active note"}
+
+
+def test_tag_merge_and_delete_see_swept_notes(app, logged_in_client):
+    from app.tags.bulk import merge_tags
+
+    with app.app_context():
+        _, old_id, _ = _setup(app)
+        sweep(30)
+        user = User.query.filter_by(email="user@test.com").first()
+        legacy = Tag.query.filter_by(name="legacy").one()
+        vpn = Tag.query.filter_by(name="vpn").one()
+        merge_tags(legacy, vpn, user.id)
+        db.session.commit()
+
+        assert db.session.get(ArchivedNote, old_id).tag_ids == [vpn.id]
+        only_swept = Tag(name="dns")
+        db.session.add(only_swept)
+        db.session.flush()
+        db.session.execute(
+            ArchivedNote.__table__.update()
+            .where(ArchivedNote.id == old_id)
+            .values(tag_ids=[vpn.id, only_swept.id])
+        )
+        db.session.commit()
+        dns_id = only_swept.id
+
+    logged_in_client.post(f"/tags/{dns_id}/delete")
+    logged_in_client.post(f"/notes/{old_id}/archive")
+
+    with app.app_context():
+        assert db.session.get(Tag, dns_id) is not None
+        note = db.session.get(Note, old_id)
+        assert sorted(tag.name for tag in note.tags) == ["dns", "vpn"]
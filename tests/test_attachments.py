@@ -0,0 +1,89 @@
+# file: tests/test_attachments.py
+import base64
+import hashlib
+import re
+
+import pytest
+
+from app.extensions import db
+from app.models import Note
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+DIGEST = hashlib.sha256(PNG).hexdigest()
+DATA_URI = "data:image/png;base64," + base64.b64encode(PNG).decode("ascii")
+
+
+@pytest.fixture
+def store_dir(app, tmp_path):
+    app.config["ATTACHMENT_STORE_URL"] = f"file://{tmp_path}"
+    return tmp_path
+
+
+def _stored(store_dir):
+    return sorted(p.name for p in store_dir.rglob("*") if p.is_file())
+
+
+def test_inline_images_are_extracted_once(app, logged_in_client, store_dir):
+    for title in ("VPN", "VPN again"):
+        logged_in_client.post(
+            "/notes/new", data={"title": title, "body": f"Screenshot:\n\n![error]({DATA_URI})"}
+        )
+
+    with app.app_context():
+        bodies = [note.body for note in Note.query.all()]
+    assert bodies == [f"Screenshot:\n\n![error](/attachments/{DIGEST}.png)"] * 2
+    assert _stored(store_dir) == [DIGEST]
+
+
+def test_attachments_are_served_with_ranges_and_immutable_caching(logged_in_client, store_dir):
+    logged_in_client.post("/notes/new", data={"title": "VPN", "body": f"![]({DATA_URI})"})
+    url = f"/attachments/{DIGEST}.png"
+
+    response = logged_in_client.get(url)
+    assert response.status_code == 200
+    assert response.data == PNG
+    assert response.mimetype == "image/png"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["Accept-Ranges"] == "bytes"
+
+    response = logged_in_client.get(url, headers={"Range": "bytes=8-15"})
+    assert response.status_code == 206
+    assert response.data == PNG[8:16]
+    assert response.headers["Content-Range"] == f"bytes 8-15/{len(PNG)}"
+
+    response = logged_in_client.get(url, headers={"If-None-Match": f'"{DIGEST}"'})
+    assert response.status_code == 304
+
+    assert logged_in_client.get(f"/attachments/{'0' * 64}.png").status_code == 404
+    assert logged_in_client.get(f"/attachments/{DIGEST}.svg").status_code == 404
+
+
+def test_attachments_need_a_login(client, store_dir):
+    assert client.get(f"/attachments/{DIGEST}.png").status_code == 302
+
+
+def test_non_images_stay_inline(app, logged_in_client, store_dir):
+    fake = "data:image/png;base64," + base64.b64encode(b"<script>").decode("ascii")
+    logged_in_client.post("/notes/new", data={"title": "VPN", "body": f"![]({fake})"})
+    with app.app_context():
+        assert Note.query.one().body == f"![]({fake})"
+    assert _stored(store_dir) == []
+
+
+def test_onenote_import_stores_page_images(app, store_dir, tmp_path_factory):
+    export = tmp_path_factory.mktemp("export")
+    (export / "Page_files").mkdir()
+    (export / "Page_files" / "image001.png").write_bytes(PNG)
+    (export / "Page.html").write_text(
+        "<html><head><title>Printer</title></head><body>"
+        "<table><tr><td><img src='Page_files/image001.png' alt='tray'></td></tr></table>"
+        f'<p><img src="{DATA_URI}"></p></body></html>'
+    )
+
+    result = app.test_cli_runner().invoke(args=["import-onenote", "--path", str(export)])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        body = db.session.execute(db.select(Note.body)).scalar_one()
+    assert re.findall(r"!\[[^\]]*\]\(([^)]+)\)", body) == [f"/attachments/{DIGEST}.png"] * 2
+    assert _stored(store_dir) == [DIGEST]
@@ -0,0 +1,21 @@
+# file: tests/test_bench_generator.py
+from collections import Counter
+
+from benchmarks.generator import KBGenerator
+
+
+def test_generator_is_deterministic():
+    first = KBGenerator("1k", seed=7)
+    second = KBGenerator("1k", seed=7)
+
+    assert [first.title() for _ in range(20)] == [second.title() for _ in range(20)]
+    assert first.body(4096) == second.body(4096)
+
+
+def test_tag_distribution_is_skewed():
+    generator = KBGenerator("10k", seed=7)
+    counts = Counter(t for _ in range(5000) for t in generator.pick_tags())
+
+    most_common = counts.most_common()
+    assert most_common[0][0] == 0
+    assert most_common[0][1] > 10 * most_common[-1][1]
@@ -0,0 +1,86 @@
+# file: tests/test_compression.py
+import gzip
+import re
+import zlib
+
+from flask import Response, stream_with_context
+
+from app.extensions import db
+from app.models import Note, User
+from app.utils.compression import choose_encoding, compress_response
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("*") == "gzip"
+    assert choose_encoding(None) is None
+
+
+def test_large_pages_are_compressed(app, logged_in_client):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = Note(
+            title="Long",
+            body="Restart the service.\n\n" * 200,
+            created_by_id=user.id,
+            updated_by_id=user.id,
+        )
+        db.session.add(note)
+        db.session.commit()
+        note_id = note.id
+
+    response = logged_in_client.get(f"/notes/{note_id}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert b"Restart the service." in gzip.decompress(response.data)
+
+    plain = logged_in_client.get(f"/notes/{note_id}")
+    assert "Content-Encoding" not in plain.headers
+    assert b"Restart the service." in plain.data
+
+
+def test_small_bodies_are_not_compressed(app, client):
+    app.config["COMPRESS_MIN_SIZE"] = 1_000_000
+    response = client.get("/auth/login", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert b"<form" in response.data
+
+
+def test_streamed_responses_are_compressed_per_chunk(app):
+    chunks = [b"<p>first</p>" * 10, b"<p>second</p>" * 10]
+
+    with app.test_request_context():
+        response = Response(stream_with_context(iter(chunks)), mimetype="text/html")
+        response = compress_response(response, "gzip")
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Content-Length" not in response.headers
+        parts = list(response.response)
+
+    # Every chunk is flushed on its own, so the first part can be decoded
+    # before the rest has been produced.
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decoder.decompress(parts[0]) == chunks[0]
+    assert gzip.decompress(b"".join(parts)) == b"".join(chunks)
+
+
+def test_binary_types_are_not_compressed(app):
+    with app.test_request_context():
+        response = Response(b"\x89PNG" + b"\0" * 2000, mimetype="image/png")
+        assert "Content-Encoding" not in compress_response(response, "gzip").headers
+
+
+def test_static_urls_are_fingerprinted_and_immutable(app, client):
+    page = client.get("/auth/login").get_data(as_text=True)
+    url = re.search(r'href="(/static/style\.css\?v=[0-9a-f]{12})"', page).group(1)
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == 365 * 24 * 3600
+
+    stale = client.get("/static/style.css?v=000000000000")
+    assert not stale.cache_control.immutable
+    stale.close()
+    response.close()
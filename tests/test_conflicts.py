@@ -0,0 +1,122 @@
+# file: tests/test_conflicts.py
+import re
+
+from app.extensions import db
+from app.models import Note, User
+from app.revisions import merge_bodies
+
+BODY = "Check the VPN client.\nRestart it.\nCall the network team.\nClose the ticket."
+
+
+def test_merge_bodies_keeps_separate_edits_and_marks_overlaps():
+    yours = BODY.replace("Restart it.", "Restart it twice.")
+    theirs = BODY.replace("Close the ticket.", "Resolve the ticket.")
+    text, conflicts = merge_bodies(BODY, yours, theirs)
+    assert conflicts == 0
+    assert "Restart it twice." in text and "Resolve the ticket." in text
+
+    text, conflicts = merge_bodies(BODY, yours, BODY.replace("Restart it.", "Reinstall it."))
+    assert conflicts == 1
+    assert "<<<<<<< your edit\nRestart it twice.\n=======\nReinstall it.\n>>>>>>>" in text
+
+    assert merge_bodies(BODY, yours, yours) == (yours, 0)
+
+
+def _note(app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = Note(title="VPN", body=BODY, created_by_id=user.id, updated_by_id=user.id)
+        db.session.add(note)
+        db.session.commit()
+        return note.id
+
+
+def _form(client, note_id):
+    page = client.get(f"/notes/{note_id}/edit").get_data(as_text=True)
+    fields = dict(re.findall(r'name="(version|base_revision)"[^>]*value="([^"]*)"', page))
+    return dict(fields, title="VPN", tags="")
+
+
+def test_stale_edit_gets_a_merge_view(app, logged_in_client, admin_client):
+    note_id = _note(app)
+    mine = _form(logged_in_client, note_id)
+    theirs = _form(admin_client, note_id)
+    assert mine["version"] == "1"
+
+    response = admin_client.post(
+        f"/notes/{note_id}/edit",
+        data=dict(theirs, body=BODY.replace("Close the ticket.", "Resolve the ticket.")),
+    )
+    assert response.status_code == 302
+
+    response = logged_in_client.post(
+        f"/notes/{note_id}/edit",
+        data=dict(mine, body=BODY.replace("Restart it.", "Restart it twice.")),
+    )
+    assert response.status_code == 409
+    page = response.get_data(as_text=True)
+    assert "Edit Conflict" in page
+    with app.app_context():
+        note = db.session.get(Note, note_id)
+        assert "Restart it twice." not in note.body
+        assert f'name="version" type="hidden" value="{note.version}"' in page
+    # Both edits are merged into the form, ready to save again.
+    assert "Restart it twice.\nCall the network team.\nResolve the ticket." in page
+
+    resubmit = _form(logged_in_client, note_id)
+    response = logged_in_client.post(
+        f"/notes/{note_id}/edit",
+        data=dict(resubmit, body="Restart it twice.\nResolve the ticket."),
+    )
+    assert response.status_code == 302
+
+
+def test_overlapping_edits_are_marked(app, logged_in_client, admin_client):
+    note_id = _note(app)
+    mine = _form(logged_in_client, note_id)
+    admin_client.post(
+        f"/notes/{note_id}/edit",
+        data=dict(_form(admin_client, note_id), body=BODY.replace("Restart it.", "Reinstall it.")),
+    )
+
+    response = logged_in_client.post(
+        f"/notes/{note_id}/edit",
+        data=dict(mine, body=BODY.replace("Restart it.", "Restart it twice.")),
+    )
+    assert response.status_code == 409
+    page = response.get_data(as_text=True)
+    assert "1 place:" in page
+    assert "&lt;&lt;&lt;&lt;&lt;&lt;&lt; your edit" in page
+
+
+def test_bulk_tagging_bumps_the_version(app, admin_client):
+    note_id = _note(app)
+    admin_client.post("/notes/bulk-tag", data={"action": "add", "tag": "vpn"})
+    with app.app_context():
+        assert db.session.get(Note, note_id).version == 2
+
+
+def test_edit_requires_the_version(app, logged_in_client):
+    note_id = _note(app)
+    response = logged_in_client.post(
+        f"/notes/{note_id}/edit", data={"title": "VPN", "body": "Overwritten", "tags": ""}
+    )
+    assert response.status_code == 400
+    with app.app_context():
+        assert db.session.get(Note, note_id).body == BODY
+
+
+def test_bad_base_revision_falls_back_to_the_current_one(app, logged_in_client, admin_client):
+    note_id = _note(app)
+    mine = _form(logged_in_client, note_id)
+    admin_client.post(
+        f"/notes/{note_id}/edit",
+        data=dict(_form(admin_client, note_id), body=BODY.replace("Restart it.", "Reinstall it.")),
+    )
+
+    response = logged_in_client.post(
+        f"/notes/{note_id}/edit",
+        data=dict(mine, base_revision="not-a-number", body="Only mine."),
+    )
+    assert response.status_code == 409
+    assert "Only mine." in response.get_data(as_text=True)
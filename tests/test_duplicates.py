@@ -0,0 +1,169 @@
+# file: tests/test_duplicates.py
+import pytest
+
+from app import duplicates
+from app.extensions import db
+from app.models import Job, Note, User
+from app.utils import minhash
+
+RUNBOOK = """Restart the billing queue worker when invoices stop flowing.
+First drain the queue from the admin console, then stop the worker service,
+clear the lock file under /var/run/billing, start the worker again and watch
+the dashboard until the backlog is empty. Escalate to payments on call if the
+backlog keeps growing after fifteen minutes."""
+RUNBOOK_COPY = RUNBOOK.replace("fifteen minutes", "fifteen minutes or so")
+UNRELATED = """Printers on the third floor stop after a driver update. Remove the
+queue, reinstall the vendor driver from the software portal and print a test
+page before closing the ticket."""
+
+
+def _tree(tmp_path):
+    for folder, name, body in [
+        ("billing", "restart-worker.md", RUNBOOK),
+        ("onenote-copy", "Restart worker.md", RUNBOOK_COPY),
+        ("printing", "printers.md", UNRELATED),
+    ]:
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / name).write_text(body)
+    return tmp_path
+
+
+def _import(app, path, mode):
+    return app.test_cli_runner().invoke(
+        args=[
+            "import-files",
+            "--path",
+            str(path),
+            "--tag-from-folders",
+            "--on-duplicate",
+            mode,
+        ]
+    )
+
+
+def test_signature_estimate():
+    sig = duplicates.body_signature(RUNBOOK)
+    assert len(sig) == 64
+    assert minhash.similarity(sig, duplicates.body_signature(RUNBOOK_COPY)) >= 0.8
+    assert minhash.similarity(sig, duplicates.body_signature(UNRELATED)) < 0.2
+
+
+@pytest.mark.parametrize("mode, notes", [("keep", 3), ("skip", 2), ("merge", 2)])
+def test_import_handles_near_duplicates(app, tmp_path, mode, notes):
+    with app.app_context():
+        result = _import(app, _tree(tmp_path), mode)
+        assert result.exit_code == 0, result.output
+        assert "Near-duplicates: 1" in result.output
+        assert Note.query.count() == notes
+
+        stored = Note.query.filter(Note.title != "printers").all()
+        assert all(note.note_metadata["minhash"] for note in stored)
+        if mode == "merge":
+            (merged,) = stored
+            assert sorted(tag.name for tag in merged.tags) == ["billing", "onenote-copy"]
+            (source,) = merged.note_metadata["merged_sources"]
+            assert source != merged.source
+
+
+def test_onenote_merge_touches_the_target(app, tmp_path):
+    app.config["JOBS_EAGER"] = False
+    (tmp_path / "billing").mkdir()
+    (tmp_path / "billing" / "restart-worker.md").write_text(RUNBOOK)
+    pages = tmp_path / "onenote"
+    pages.mkdir()
+    (pages / "restart.html").write_text(
+        f"<html><head><title>Restart worker</title></head><body><p>{RUNBOOK_COPY}</p></body></html>"
+    )
+    with app.app_context():
+        assert _import(app, tmp_path / "billing", "keep").exit_code == 0
+        target = Note.query.one()
+        imported_at = target.updated_at
+        db.session.query(Job).delete()
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(
+            args=["import-onenote", "--path", str(pages), "--on-duplicate", "merge"]
+        )
+        assert result.exit_code == 0, result.output
+        assert "Merged: 1" in result.output
+
+        db.session.expire_all()
+        merged = Note.query.one()
+        assert merged.note_metadata["merged_sources"]
+        assert merged.updated_at > imported_at
+        # Search and related notes are refreshed for the merge target too.
+        assert {job.kind for job in Job.query.all()} == {
+            "notes.refresh_search",
+            "notes.refresh_related",
+        }
+        assert all(job.payload["note_ids"] == [str(merged.id)] for job in Job.query.all())
+
+
+def test_find_duplicates_backfills_and_clusters(app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        for title, body in [("a", RUNBOOK), ("b", RUNBOOK_COPY), ("c", UNRELATED)]:
+            db.session.add(
+                Note(title=title, body=body, created_by_id=user.id, updated_by_id=user.id)
+            )
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["find-duplicates"])
+        assert result.exit_code == 0, result.output
+        assert "Stored signatures for 3 notes" in result.output
+        assert "1 clusters, 2 notes" in result.output
+
+        clusters, backfilled = duplicates.find_clusters()
+        assert backfilled == 0
+        assert [[row[1] for row in members] for members in clusters] == [["a", "b"]]
+
+
+def test_saving_a_near_duplicate_warns(app, logged_in_client):
+    logged_in_client.post("/notes/new", data={"title": "Original", "body": RUNBOOK})
+    response = logged_in_client.post(
+        "/notes/new",
+        data={"title": "Copy", "body": RUNBOOK_COPY},
+        follow_redirects=True,
+    )
+    assert "near-duplicate of &#34;Original&#34;" in response.get_data(as_text=True)
+
+
+def test_find_duplicates_reads_bodies_once_and_includes_swept_notes(app):
+    from datetime import datetime, timedelta, timezone
+
+    import sqlalchemy as sa
+
+    from app.archive import sweep
+
+    app.config["NOTES_ARCHIVE_TABLE"] = True
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        old = datetime.now(timezone.utc) - timedelta(days=60)
+        for title, body, archived in [("a", RUNBOOK, False), ("b", RUNBOOK_COPY, True)]:
+            db.session.add(
+                Note(
+                    title=title,
+                    body=body,
+                    is_archived=archived,
+                    updated_at=old,
+                    created_by_id=user.id,
+                    updated_by_id=user.id,
+                )
+            )
+        db.session.commit()
+        assert sweep(30) == 1
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=["find-duplicates", "--include-archived"])
+        assert "Stored signatures for 2 notes" in result.output
+        assert "1 clusters, 2 notes" in result.output
+
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        sa.event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            result = runner.invoke(args=["find-duplicates", "--include-archived"])
+        finally:
+            sa.event.remove(db.engine, "before_cursor_execute", record)
+        assert "1 clusters, 2 notes" in result.output
+        assert not [s for s in statements if ".body" in s]
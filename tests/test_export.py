@@ -0,0 +1,293 @@
+# file: tests/test_export.py
+import io
+import json
+import zipfile
+
+import pytest
+
+from app.extensions import db
+from app.models import Note, Tag, User, note_tags
+
+
+def _make_notes(app):
+    user = User.query.filter_by(email="user@test.com").first()
+    runbooks = Tag(name="runbook")
+    db.session.add(runbooks)
+
+    first = Note(
+        title="Restart the queue",
+        body="# Steps\n\n1. Drain\n2. Restart",
+        created_by_id=user.id,
+        updated_by_id=user.id,
+    )
+    first.tags.append(runbooks)
+    second = Note(
+        title="Old procedure",
+        body="Retired",
+        is_archived=True,
+        created_by_id=user.id,
+        updated_by_id=user.id,
+    )
+    db.session.add_all([first, second])
+    db.session.commit()
+    return first, second
+
+
+def test_export_jsonl_cli(app, tmp_path):
+    with app.app_context():
+        first, _ = _make_notes(app)
+        output = tmp_path / "notes.jsonl"
+
+        result = app.test_cli_runner().invoke(
+            args=["export", "--output", str(output), "--tag", "runbook"]
+        )
+        assert result.exit_code == 0, result.output
+
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        notes = [r for r in records if r["type"] == "note"]
+
+        assert records[0]["type"] == "header"
+        assert records[-1] == {
+            "type": "footer",
+            "notes": 1,
+            "watermark": first.updated_at.isoformat(),
+        }
+        assert {r["email"] for r in records if r["type"] == "user"} == {
+            "admin@test.com",
+            "user@test.com",
+        }
+        assert notes[0]["id"] == first.id
+        assert notes[0]["tags"] == ["runbook"]
+        assert notes[0]["created_by"] == "user@test.com"
+
+
+def test_export_incremental_watermark(app, tmp_path):
+    with app.app_context():
+        _make_notes(app)
+        output = tmp_path / "notes.jsonl"
+        state = tmp_path / "state.json"
+        runner = app.test_cli_runner()
+
+        args = ["export", "--output", str(output), "--state-file", str(state)]
+        runner.invoke(args=args)
+        assert json.loads(state.read_text())["watermark"] is not None
+
+        result = runner.invoke(args=args)
+        assert result.exit_code == 0, result.output
+        notes = [
+            line for line in output.read_text().splitlines() if '"type": "note"' in line
+        ]
+        assert notes == []
+
+
+def test_admin_export_markdown_zip(admin_client, app):
+    with app.app_context():
+        first, _ = _make_notes(app)
+        first_id = first.id
+
+    response = admin_client.get("/admin/export?format=markdown&archived=include")
+    assert response.status_code == 200
+    assert response.mimetype == "application/zip"
+
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        names = archive.namelist()
+        assert len(names) == 2
+        content = archive.read(next(n for n in names if first_id in n)).decode()
+
+    assert content.startswith("---\nid: ")
+    assert 'tags: ["runbook"]' in content
+    assert content.endswith("# Steps\n\n1. Drain\n2. Restart")
+
+
+def test_export_requires_admin(logged_in_client):
+    response = logged_in_client.get("/admin/export")
+    assert response.status_code == 403
+
+
+def test_export_rejects_a_bad_watermark(app, tmp_path):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["export", "--output", "-", "--updated-since", "yesterday"])
+    assert result.exit_code == 2
+    assert "--updated-since" in result.output
+
+    state = tmp_path / "state.json"
+    state.write_text(json.dumps({"watermark": "not a date"}))
+    result = runner.invoke(args=["export", "--output", "-", "--state-file", str(state)])
+    assert result.exit_code == 1
+    assert "does not hold a valid watermark" in result.output
+    assert not isinstance(result.exception, ValueError)
+
+
+def test_import_bundle_round_trip(app, tmp_path):
+    with app.app_context():
+        first, second = _make_notes(app)
+        bundle = tmp_path / "backup.jsonl"
+        runner = app.test_cli_runner()
+
+        result = runner.invoke(
+            args=["export", "--output", str(bundle), "--archived", "include"]
+        )
+        assert result.exit_code == 0, result.output
+
+        expected = {
+            note.id: (note.title, note.body, note.created_at, note.updated_at)
+            for note in (first, second)
+        }
+        db.session.execute(note_tags.delete())
+        Note.query.delete()
+        Tag.query.delete()
+        db.session.commit()
+
+        result = runner.invoke(args=["import-bundle", "--path", str(bundle)])
+        assert result.exit_code == 0, result.output
+        assert "Notes written: 2" in result.output
+        assert "rows/s" in result.output
+
+        db.session.expire_all()
+        restored = {
+            note.id: (note.title, note.body, note.created_at, note.updated_at)
+            for note in Note.query.all()
+        }
+        assert restored == expected
+        assert [t.name for t in Note.query.get(first.id).tags] == ["runbook"]
+        assert Note.query.get(second.id).is_archived
+
+        # Re-importing the same bundle does not duplicate anything.
+        result = runner.invoke(args=["import-bundle", "--path", str(bundle)])
+        assert result.exit_code == 0, result.output
+        assert Note.query.count() == 2
+        assert Tag.query.count() == 1
+
+
+def _bundle_with_duplicate(app, tmp_path):
+    """Export one note, then list it twice more: a newer and an older copy."""
+    from datetime import datetime, timedelta
+
+    first, _ = _make_notes(app)
+    bundle = tmp_path / "backup.jsonl"
+    app.test_cli_runner().invoke(args=["export", "--output", str(bundle)])
+
+    lines = bundle.read_text().splitlines()
+    (index,) = [i for i, line in enumerate(lines) if json.loads(line).get("id") == first.id]
+    record = json.loads(lines[index])
+    saved_at = datetime.fromisoformat(record["updated_at"])
+    newer = dict(
+        record,
+        title="Drain and restart the queue",
+        tags=["queue", "runbook"],
+        updated_at=(saved_at + timedelta(hours=1)).isoformat(),
+    )
+    older = dict(
+        record,
+        title="Stale",
+        tags=["stale"],
+        updated_at=(saved_at - timedelta(hours=1)).isoformat(),
+    )
+    lines[index + 1 : index + 1] = [json.dumps(newer), json.dumps(older)]
+    bundle.write_text("\n".join(lines) + "\n")
+
+    db.session.execute(note_tags.delete())
+    Note.query.delete()
+    Tag.query.delete()
+    db.session.commit()
+    return first.id, bundle
+
+
+def test_import_bundle_keeps_the_newest_copy_of_a_note(app, tmp_path):
+    with app.app_context():
+        note_id, bundle = _bundle_with_duplicate(app, tmp_path)
+
+        result = app.test_cli_runner().invoke(args=["import-bundle", "--path", str(bundle)])
+        assert result.exit_code == 0, result.output
+
+        db.session.expire_all()
+        note = Note.query.get(note_id)
+        assert note.title == "Drain and restart the queue"
+        assert sorted(t.name for t in note.tags) == ["queue", "runbook"]
+        assert Tag.query.filter_by(name="stale").count() == 0
+        assert Note.query.count() == 1
+
+
+def test_import_bundle_bumps_generations(app, tmp_path, monkeypatch):
+    from app import generations
+    from app.models import CacheGeneration
+
+    bumped = []
+    bump = generations.bump_after_commit
+    monkeypatch.setattr(
+        generations, "bump_after_commit", lambda *ns: (bumped.extend(ns), bump(*ns))
+    )
+
+    def counters():
+        rows = db.session.execute(db.select(CacheGeneration.namespace, CacheGeneration.value))
+        return dict(rows.all())
+
+    with app.app_context():
+        _make_notes(app)
+        bundle = tmp_path / "backup.jsonl"
+        runner = app.test_cli_runner()
+        runner.invoke(args=["export", "--output", str(bundle)])
+        before = counters()
+
+        result = runner.invoke(args=["import-bundle", "--path", str(bundle)])
+        assert result.exit_code == 0, result.output
+        after = counters()
+        assert after["notes"] > before["notes"]
+        assert after["tags"] > before["tags"]
+        # Not left to the session hooks, which miss the COPY loader's writes.
+        assert sorted(bumped) == ["notes", "tags"]
+
+
+def test_import_bundle_queues_refresh_jobs(app, tmp_path):
+    from app.models import Job
+
+    app.config["JOBS_EAGER"] = False
+    with app.app_context():
+        note_id, bundle = _bundle_with_duplicate(app, tmp_path)
+        db.session.query(Job).delete()
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["import-bundle", "--path", str(bundle)])
+        assert result.exit_code == 0, result.output
+
+        jobs = Job.query.all()
+        assert "notes.refresh_related" in {job.kind for job in jobs}
+        for job in jobs:
+            assert job.payload["note_ids"] == [str(note_id)]
+
+
+def test_copy_loader_keeps_the_newest_copy_and_indexes_it(app, tmp_path, monkeypatch):
+    from sqlalchemy import func
+
+    from importers import import_bundle
+
+    with app.app_context():
+        if db.engine.dialect.name != "postgresql":
+            pytest.skip("the COPY loader needs PostgreSQL")
+        finished = []
+        finish = import_bundle._CopyLoader.finish
+        monkeypatch.setattr(
+            import_bundle._CopyLoader,
+            "finish",
+            lambda self: finished.append(True) or finish(self),
+        )
+        note_id, bundle = _bundle_with_duplicate(app, tmp_path)
+
+        result = app.test_cli_runner().invoke(args=["import-bundle", "--path", str(bundle)])
+        assert result.exit_code == 0, result.output
+        assert finished
+        assert "Notes written: 1" in result.output
+
+        db.session.expire_all()
+        note = db.session.get(Note, note_id)
+        assert note.title == "Drain and restart the queue"
+        assert sorted(t.name for t in note.tags) == ["queue", "runbook"]
+        assert Tag.query.filter_by(name="stale").count() == 0
+        # The same vector Note.refresh_search_vectors writes.
+        stored = db.session.scalar(db.select(Note.search_vector).where(Note.id == note_id))
+        Note.refresh_search_vectors([note_id])
+        assert db.session.scalar(db.select(Note.search_vector).where(Note.id == note_id)) == stored
+        matches = Note.query.filter(
+            Note.search_vector.op("@@")(func.plainto_tsquery("english", "drain"))
+        )
+        assert [n.id for n in matches] == [note_id]
@@ -0,0 +1,111 @@
+# file: tests/test_fragment_cache.py
+from app.extensions import db
+from app.models import Note, Tag, User
+from app.utils.fragment_cache import FragmentCache, LRUStore, SQLiteStore
+
+
+def test_lru_store_evicts_by_size():
+    store = LRUStore(max_bytes=10)
+    store.set("a", "aaaa")
+    store.set("b", "bbbb")
+    store.get("a")
+    store.set("c", "cccc")
+    assert store.get("b") is None
+    assert store.get("a") == "aaaa"
+    assert store.size == 8
+
+    store.set("big", "x" * 11)
+    assert store.get("big") is None
+    # Sizes are counted in UTF-8 bytes.
+    store.set("d", "ééé")
+    assert store.size <= 10
+
+
+def test_sqlite_store_is_shared(tmp_path):
+    path = str(tmp_path / "fragments.db")
+    first = FragmentCache(1024, SQLiteStore(path, 1024))
+    second = FragmentCache(1024, SQLiteStore(path, 1024))
+
+    first.set("row", "<p>cached</p>")
+    assert second.get("row") == "<p>cached</p>"
+
+
+def test_sqlite_store_trims_oldest(tmp_path):
+    store = SQLiteStore(str(tmp_path / "fragments.db"), max_bytes=100)
+    for i in range(10):
+        store.set(f"key-{i}", "x" * 20)
+    store.trim()
+    assert store.get("key-9") is not None
+    assert store.get("key-0") is None
+
+
+def _note(title, tag):
+    user = User.query.filter_by(email="user@test.com").first()
+    note = Note(title=title, body="Body", created_by_id=user.id, updated_by_id=user.id)
+    note.tags.append(tag)
+    db.session.add(note)
+    db.session.flush()
+    note.sync_tag_ids()
+    db.session.commit()
+    return note
+
+
+def test_rows_are_cached_until_their_note_or_tags_change(app, logged_in_client):
+    with app.app_context():
+        tag = Tag(name="vpn")
+        note = _note("Reset VPN", tag)
+        note_id, tag_id = note.id, tag.id
+
+    page = logged_in_client.get("/").get_data(as_text=True)
+    assert "Reset VPN" in page
+    cache = app.extensions["fragment_cache"]
+    assert len(cache.local) == 2
+
+    # A write that keeps updated_at is not seen while the row is cached.
+    with app.app_context():
+        db.session.execute(
+            db.update(Note)
+            .values(summary="Sneaky", updated_at=Note.updated_at)
+            .where(Note.id == note_id)
+        )
+        db.session.commit()
+        version = db.session.scalar(db.select(Note.version).where(Note.id == note_id))
+    assert "Sneaky" not in logged_in_client.get("/").get_data(as_text=True)
+
+    logged_in_client.post(
+        f"/notes/{note_id}/edit",
+        data={"title": "Reset the VPN", "body": "Body", "tags": "vpn", "version": version},
+    )
+    assert "Reset the VPN" in logged_in_client.get("/").get_data(as_text=True)
+
+    logged_in_client.post(f"/tags/{tag_id}/edit", data={"name": "remote-access"})
+    page = logged_in_client.get("/").get_data(as_text=True)
+    assert '<span class="badge bg-secondary">remote-access</span>' in page
+    assert '<span class="badge bg-secondary">vpn</span>' not in page
+
+
+def test_new_tags_reach_the_tag_bar(app, logged_in_client):
+    logged_in_client.get("/")
+    logged_in_client.post("/notes/new", data={"title": "DNS", "body": "Flush", "tags": "dns"})
+    page = logged_in_client.get("/").get_data(as_text=True)
+    assert "tag=dns" in page
+
+
+def test_cache_can_be_turned_off(app, logged_in_client):
+    del app.extensions["fragment_cache"]
+    with app.app_context():
+        _note("Uncached", Tag(name="misc"))
+    assert "Uncached" in logged_in_client.get("/").get_data(as_text=True)
+
+
+def test_rows_follow_editor_renames(app, logged_in_client):
+    _note("Reset VPN", Tag(name="vpn"))
+    assert "by Test User" in logged_in_client.get("/").get_data(as_text=True)
+
+    # Renaming the editor leaves the note, and its updated_at, alone.
+    user = User.query.filter_by(email="user@test.com").first()
+    user.display_name = "Renamed User"
+    db.session.commit()
+    page = logged_in_client.get("/").get_data(as_text=True)
+    assert "by Renamed User" in page
+    assert "by Test User" not in page
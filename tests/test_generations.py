@@ -0,0 +1,60 @@
+# file: tests/test_generations.py
+import sqlalchemy as sa
+
+from app import generations
+from app.extensions import db
+from app.models import CacheGeneration, Note, Tag, User
+
+
+def _values(app):
+    with app.app_context():
+        rows = db.session.execute(sa.select(CacheGeneration.namespace, CacheGeneration.value))
+        return dict(rows.all())
+
+
+def test_route_writes_bump_their_namespaces(app, admin_client):
+    # The fixture's users.
+    assert _values(app) == {"users": 1}
+
+    admin_client.post("/notes/new", data={"title": "VPN", "body": "Reconnect", "tags": "vpn"})
+    assert _values(app) == {"notes": 1, "tags": 1, "users": 1}
+
+    with app.app_context():
+        tag_id = Tag.query.filter_by(name="vpn").first().id
+        user_id = User.query.filter_by(email="user@test.com").first().id
+    admin_client.post(f"/tags/{tag_id}/edit", data={"name": "remote"})
+    assert _values(app) == {"notes": 1, "tags": 2, "users": 1}
+
+    admin_client.post(f"/admin/users/{user_id}/deactivate")
+    assert _values(app) == {"notes": 1, "tags": 2, "users": 2}
+
+    # Pages that only read leave the counters alone.
+    admin_client.get("/")
+    admin_client.get("/tags/")
+    assert _values(app) == {"notes": 1, "tags": 2, "users": 2}
+
+
+def test_statements_run_through_the_session_bump(app):
+    with app.app_context():
+        db.session.execute(sa.update(Note).values(summary="x"))
+        db.session.commit()
+        assert generations.current("notes") == 1
+
+        db.session.execute(sa.insert(Tag).values(name="dns"))
+        db.session.rollback()
+        db.session.commit()
+        assert generations.current("tags") == 0
+
+
+def test_other_processes_are_seen_after_polling(app):
+    app.config["CACHE_BUS_POLL_SECONDS"] = 3600
+    with app.app_context():
+        assert generations.current("tags") == 0
+        # Another worker's commit, which this process was not told about.
+        with db.engine.begin() as conn:
+            conn.execute(sa.insert(CacheGeneration).values(namespace="tags", value=5))
+        db.session.rollback()
+        assert generations.current("tags") == 0
+
+        app.config["CACHE_BUS_POLL_SECONDS"] = 0
+        assert generations.current("tags") == 5
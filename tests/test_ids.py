@@ -0,0 +1,42 @@
+# file: tests/test_ids.py
+import uuid
+
+from app.extensions import db
+from app.models import Note, User
+from app.utils.ids import parse_uuid, uuid7
+
+
+def test_uuid7_is_time_ordered():
+    ids = [uuid7() for _ in range(2000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    parsed = uuid.UUID(ids[0])
+    assert parsed.version == 7
+    assert parsed.variant == uuid.RFC_4122
+
+
+def test_parse_uuid():
+    value = "0191F3A2-7B6C-7D4E-8F00-123456789ABC"
+    assert parse_uuid(value) == value.lower()
+    assert parse_uuid("not-a-uuid") is None
+
+
+def test_note_routes_accept_existing_ids(logged_in_client, app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        # Notes created before the switch keep their random uuid4 ids.
+        legacy_id = str(uuid.uuid4())
+        note = Note(
+            id=legacy_id,
+            title="Legacy",
+            body="Body",
+            created_by_id=user.id,
+            updated_by_id=user.id,
+        )
+        db.session.add(note)
+        db.session.commit()
+
+        assert logged_in_client.get(f"/notes/{legacy_id}").status_code == 200
+        assert logged_in_client.get(f"/notes/{legacy_id.upper()}").status_code == 200
+        assert logged_in_client.get("/notes/not-a-uuid").status_code == 404
+        assert logged_in_client.get(f"/notes/{uuid7()}").status_code == 404
@@ -0,0 +1,168 @@
+# file: tests/test_jobs.py
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.extensions import db
+from app.jobs import HANDLERS, claim, enqueue, job, process, run_pending
+from app.models import Job
+
+calls = []
+
+
+@job("test.record")
+def record(value=None):
+    calls.append(value)
+
+
+@job("test.explode")
+def explode():
+    raise RuntimeError("boom")
+
+
+@pytest.fixture
+def queued(app):
+    app.config["JOBS_EAGER"] = False
+    app.config["JOB_RETRY_BASE_SECONDS"] = 10
+    calls.clear()
+    return app
+
+
+def test_eager_mode_runs_inline(app):
+    calls.clear()
+    with app.app_context():
+        assert app.config["JOBS_EAGER"]
+        assert enqueue("test.record", {"value": 1}) is None
+        assert calls == [1]
+        assert Job.query.count() == 0
+
+
+def test_enqueue_rejects_unknown_kind(queued):
+    with queued.app_context():
+        with pytest.raises(ValueError):
+            enqueue("test.missing")
+
+
+def test_enqueue_and_run(queued):
+    with queued.app_context():
+        enqueue("test.record", {"value": "a"})
+        enqueue("test.record", {"value": "b"})
+        db.session.commit()
+
+        assert run_pending("test") == 2
+        assert calls == ["a", "b"]
+        assert {j.status for j in Job.query.all()} == {"done"}
+        assert all(j.locked_by is None for j in Job.query.all())
+
+
+def test_dedupe_key_skips_queued_duplicates(queued):
+    with queued.app_context():
+        assert enqueue("test.record", {"value": 1}, dedupe_key="k") is not None
+        assert enqueue("test.record", {"value": 2}, dedupe_key="k") is None
+        db.session.commit()
+        assert Job.query.count() == 1
+
+        run_pending("test")
+        assert enqueue("test.record", {"value": 3}, dedupe_key="k") is not None
+
+
+def test_delayed_job_is_not_claimed_early(queued):
+    with queued.app_context():
+        enqueue("test.record", delay=60)
+        db.session.commit()
+        assert claim("test", 10) == []
+
+
+def test_claim_does_not_return_a_job_twice(queued):
+    with queued.app_context():
+        enqueue("test.record")
+        db.session.commit()
+
+        assert len(claim("w1", 10)) == 1
+        assert claim("w2", 10) == []
+
+
+def test_failure_retries_with_backoff_then_fails(queued):
+    with queued.app_context():
+        enqueue("test.explode", max_attempts=2)
+        db.session.commit()
+
+        claimed = claim("test", 1)[0]
+        assert process(claimed, "test") is False
+        failed = Job.query.one()
+        assert failed.status == "queued"
+        assert failed.attempts == 1
+        assert "boom" in failed.last_error
+        run_at = failed.run_at.replace(tzinfo=timezone.utc)
+        assert run_at > datetime.now(timezone.utc) + timedelta(seconds=5)
+
+        failed.run_at = datetime.now(timezone.utc)
+        db.session.commit()
+        process(claim("test", 1)[0], "test")
+        db.session.expire_all()
+        failed = Job.query.one()
+        assert failed.status == "failed"
+        assert failed.attempts == 2
+        assert failed.finished_at is not None
+
+
+def test_expired_lock_is_claimed_again(queued):
+    with queued.app_context():
+        enqueue("test.record", {"value": "x"}, max_attempts=2)
+        db.session.commit()
+        claim("dead-worker", 1)
+
+        stuck = Job.query.one()
+        stuck.locked_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+
+        claimed = claim("live-worker", 1)
+        assert len(claimed) == 1
+        assert process(claimed[0], "live-worker") is True
+        # The original worker no longer holds the lock and cannot touch the row.
+        assert process(claimed[0], "dead-worker") is True
+        db.session.expire_all()
+        done = Job.query.one()
+        assert done.status == "done"
+        assert done.attempts == 2
+
+
+def test_expired_lock_on_last_attempt_fails(queued):
+    with queued.app_context():
+        enqueue("test.record", max_attempts=1)
+        db.session.commit()
+        claim("dead-worker", 1)
+
+        stuck = Job.query.one()
+        stuck.locked_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+
+        assert claim("live-worker", 1) == []
+        db.session.expire_all()
+        assert Job.query.one().status == "failed"
+
+
+def test_note_save_queues_search_refresh(queued, logged_in_client):
+    response = logged_in_client.post(
+        "/notes/new", data={"title": "Queued", "body": "Body", "tags": ""}
+    )
+    assert response.status_code == 302
+
+    with queued.app_context():
+        jobs = {j.kind: j for j in Job.query.all()}
+        assert set(jobs) == {"notes.refresh_search", "notes.refresh_related"}
+        for queued_job in jobs.values():
+            assert queued_job.status == "queued"
+            assert len(queued_job.payload["note_ids"]) == 1
+            assert queued_job.kind in HANDLERS
+        assert run_pending("test") == 2
+
+
+def test_queue_metrics(queued, admin_client):
+    with queued.app_context():
+        enqueue("test.record")
+        db.session.commit()
+
+    body = admin_client.get("/admin/metrics").get_data(as_text=True)
+    assert 'kb_jobs{status="queued",kind="test.record"} 1' in body
+    assert "kb_job_oldest_due_seconds" in body
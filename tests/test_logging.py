@@ -0,0 +1,32 @@
+# file: tests/test_logging.py
+import json
+import logging
+import queue
+
+from app.utils.log_queue import DroppingQueueHandler, JsonFormatter
+
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.makeLogRecord({"msg": "note %s saved", "args": ("abc",)})
+
+    handler.handle(record)
+    handler.handle(record)
+    handler.handle(record)
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+    assert handler.queue.get_nowait().msg == "note abc saved"
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.makeLogRecord(
+        {"name": "app.notes", "levelname": "INFO", "msg": "Note %s", "args": ("x",)}
+    )
+    record.note_id = "x"
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "Note x"
+    assert payload["logger"] == "app.notes"
+    assert payload["note_id"] == "x"
@@ -0,0 +1,39 @@
+# file: tests/test_metrics.py
+from app.extensions import db
+from app.models import Note, User
+
+
+def test_server_timing_header(logged_in_client, app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = Note(
+            title="Timed",
+            body="# Heading\n\nBody",
+            created_by_id=user.id,
+            updated_by_id=user.id,
+        )
+        db.session.add(note)
+        db.session.commit()
+
+        response = logged_in_client.get(f"/notes/{note.id}")
+
+        assert response.status_code == 200
+        timing = response.headers["Server-Timing"]
+        assert "app;dur=" in timing
+        assert "db;dur=" in timing
+        assert "md;dur=" in timing
+
+
+def test_metrics_requires_admin(logged_in_client):
+    response = logged_in_client.get("/admin/metrics")
+    assert response.status_code == 403
+
+
+def test_metrics_prometheus_output(admin_client):
+    admin_client.get("/")
+    response = admin_client.get("/admin/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert b'kb_request_duration_seconds_count{endpoint="notes.index"}' in response.data
+    assert b"kb_request_sql_statements_bucket" in response.data
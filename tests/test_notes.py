@@ -1,6 +1,10 @@
 # file: tests/test_notes.py
+import pytest
+from sqlalchemy.dialects import postgresql
+
 from app.extensions import db
-from app.models import Note, User
+from app.models import Note, Tag, User
+from app.notes.query import SORT_MODES, NoteFilters
 
 
 def test_create_note(logged_in_client, app):
@@ -61,7 +65,7 @@ def test_edit_note(logged_in_client, app):
 
         response = logged_in_client.post(
             f"/notes/{note_id}/edit",
-            data={"title": "Updated Title", "body": "Updated body", "tags": ""},
+            data={"title": "Updated Title", "body": "Updated body", "tags": "", "version": "1"},
             follow_redirects=True,
         )
 
@@ -120,3 +124,119 @@ def test_archive_note(logged_in_client, app):
 
         updated_note = Note.query.get(note_id)
         assert updated_note.is_archived == True
+
+
+def test_tag_ids_follow_note_tags(logged_in_client, app):
+    with app.app_context():
+        response = logged_in_client.post(
+            "/notes/new",
+            data={"title": "Tagged", "body": "Body", "tags": "vpn, dns"},
+        )
+        assert response.status_code == 302
+
+        note = Note.query.filter_by(title="Tagged").first()
+        assert note.tag_ids == sorted(tag.id for tag in note.tags)
+
+        response = logged_in_client.post(
+            f"/notes/{note.id}/edit",
+            data={"title": "Tagged", "body": "Body", "tags": "dns", "version": note.version},
+        )
+        assert response.status_code == 302
+        db.session.expire_all()
+        note = Note.query.filter_by(title="Tagged").first()
+        assert note.tag_ids == [note.tags[0].id]
+
+        # Badges are rendered from tag_ids and the page's tag list.
+        response = logged_in_client.get("/?tag=dns")
+        assert response.status_code == 200
+        assert response.data.count(b'<span class="badge bg-secondary">dns</span>') == 1
+
+
+def test_refresh_tag_ids_keeps_updated_at(app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = Note(
+            title="Stale",
+            body="Body",
+            created_by_id=user.id,
+            updated_by_id=user.id,
+        )
+        note.tags.append(Tag(name="legacy"))
+        db.session.add(note)
+        db.session.commit()
+        updated_at = note.updated_at
+
+        Note.refresh_tag_ids([note.id])
+        db.session.commit()
+        db.session.expire_all()
+
+        note = Note.query.get(note.id)
+        assert note.tag_ids == [note.tags[0].id]
+        assert note.updated_at == updated_at
+
+
+def _sql(expression):
+    # Index expressions name bare columns, model expressions qualify them.
+    compiled = expression.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    return str(compiled).replace("notes.", "")
+
+
+@pytest.mark.parametrize("sort", sorted(SORT_MODES))
+def test_every_sort_mode_is_served_by_an_index(sort):
+    """A new sort mode needs a matching (key, id) index in Note.__table_args__.
+
+    Checked against the model, so it holds on any database; the query plans
+    themselves are printed by benchmarks/explain_active.py (--check fails on
+    a plan that sorts).
+    """
+    wanted = [_sql(SORT_MODES[sort].key(Note)), "id"]
+    active = _sql(Note.is_archived.is_(False))
+    served = [
+        index.name
+        for index in Note.__table__.indexes
+        if [_sql(expression) for expression in index.expressions] == wanted
+        and all(
+            index.dialect_options[dialect]["where"] is not None
+            and _sql(index.dialect_options[dialect]["where"]) == active
+            for dialect in ("postgresql", "sqlite")
+        )
+    ]
+    assert served, f"no partial (key, id) index for {wanted}"
+
+
+def test_index_is_streamed(logged_in_client, app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        for i in range(300):
+            db.session.add(
+                Note(
+                    title=f"Note {i:03d}",
+                    body="Body",
+                    summary="A summary long enough to fill a few chunks of the page",
+                    created_by_id=user.id,
+                    updated_by_id=user.id,
+                )
+            )
+        db.session.commit()
+
+    response = logged_in_client.get("/?sort=title_asc")
+    assert response.is_streamed
+    chunks = list(response.response)
+    assert len(chunks) > 1
+    # The search form goes out ahead of the rows.
+    assert b'name="q"' in chunks[0]
+    page = b"".join(chunks)
+    assert page.count(b"list-group-item-action") == 300
+    assert page.index(b"Note 000") < page.index(b"Note 299")
+    assert b"/notes/bulk-tag" in page
+
+    app.config["STREAM_LIST_PAGES"] = False
+    assert logged_in_client.get("/?sort=title_asc").data == page
+
+
+def test_index_with_no_notes(logged_in_client):
+    page = logged_in_client.get("/").get_data(as_text=True)
+    assert "No notes found." in page
+    assert "/notes/bulk-tag" not in page
@@ -0,0 +1,132 @@
+# file: tests/test_revisions.py
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import Note, NoteRevision, User
+from app.revisions import (
+    DELTA,
+    SNAPSHOT,
+    apply_delta,
+    compact_note,
+    make_delta,
+    record_revision,
+    revision_body,
+)
+
+
+def _runbook(lines=200):
+    return "".join(f"Step {i}: check service {i}\n" for i in range(lines))
+
+
+def _note(user_id, body):
+    note = Note(title="Runbook", body=body, created_by_id=user_id, updated_by_id=user_id)
+    db.session.add(note)
+    db.session.flush()
+    return note
+
+
+def test_delta_round_trip():
+    old = "a\nb\nc\nd\n"
+    new = "a\nB\nc\nd\ne"
+    assert apply_delta(old, make_delta(old, new)) == new
+    assert apply_delta(new, make_delta(new, "")) == ""
+
+
+def test_snapshots_bound_reconstruction(app):
+    app.config["REVISION_SNAPSHOT_INTERVAL"] = 5
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        body = _runbook()
+        note = _note(user.id, body)
+
+        bodies = []
+        for i in range(12):
+            note.body = body = body.replace(f"service {i}\n", f"service {i} (edited)\n")
+            record_revision(note, user.id)
+            bodies.append(body)
+        db.session.commit()
+
+        revisions = note.revisions.all()
+        assert [r.kind for r in revisions[:6]] == [SNAPSHOT] + [DELTA] * 4 + [SNAPSHOT]
+        for revision, expected in zip(revisions, bodies):
+            assert revision_body(revision) == expected
+
+        # Deltas of small edits are far smaller than the body.
+        stored = sum(len(r.data) for r in revisions)
+        assert stored < len(body.encode()) * 3
+
+
+def test_unchanged_save_records_nothing(app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = _note(user.id, "Body")
+        assert record_revision(note, user.id) is not None
+        assert record_revision(note, user.id) is None
+
+
+def test_edit_records_history_and_diff(logged_in_client, app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = Note(
+            title="Original",
+            body="line one\nline two\n",
+            created_by_id=user.id,
+            updated_by_id=user.id,
+        )
+        db.session.add(note)
+        db.session.commit()
+        note_id = note.id
+
+        response = logged_in_client.post(
+            f"/notes/{note_id}/edit",
+            data={"title": "Original", "body": "line one\nline 2\n", "tags": "", "version": "1"},
+        )
+        assert response.status_code == 302
+
+        # The pre-edit state becomes revision 1, the edit revision 2.
+        assert NoteRevision.query.filter_by(note_id=note_id).count() == 2
+
+        response = logged_in_client.get(f"/notes/{note_id}/history")
+        assert response.status_code == 200
+        assert b"History: Original" in response.data
+
+        response = logged_in_client.get(f"/notes/{note_id}/diff")
+        assert response.status_code == 200
+        assert b"-line two" in response.data
+        assert b"+line 2" in response.data
+
+        response = logged_in_client.get(f"/notes/{note_id}/history/1")
+        assert response.status_code == 200
+        assert b"line two" in response.data
+
+        assert logged_in_client.get(f"/notes/{note_id}/history/9").status_code == 404
+
+
+def test_compact_drops_old_revisions(app):
+    app.config["REVISION_SNAPSHOT_INTERVAL"] = 4
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        body = _runbook(50)
+        note = _note(user.id, body)
+
+        old = datetime.utcnow() - timedelta(days=400)
+        for i in range(10):
+            note.body = body = body + f"Appendix {i}\n"
+            record_revision(note, user.id, created_at=old + timedelta(days=i))
+        db.session.commit()
+        expected = {r.number: revision_body(r) for r in note.revisions}
+
+        assert compact_note(note.id, keep_last=3, keep_days=30) == 7
+        db.session.commit()
+
+        kept = note.revisions.all()
+        assert [r.number for r in kept] == [8, 9, 10]
+        assert kept[0].kind == SNAPSHOT
+        for revision in kept:
+            assert revision_body(revision) == expected[revision.number]
+
+        result = app.test_cli_runner().invoke(
+            args=["compact-revisions", "--keep-last", "1", "--keep-days", "30"]
+        )
+        assert result.exit_code == 0, result.output
+        assert "Dropped 2 revisions" in result.output
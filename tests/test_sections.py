@@ -0,0 +1,113 @@
+# file: tests/test_sections.py
+import re
+
+import sqlalchemy as sa
+
+from app.extensions import db
+from app.models import Note, User
+from app.utils.sections import split_sections
+
+
+def _runbook(steps):
+    parts = []
+    for i in range(steps):
+        parts.append(f"## Step {i}\n\nRun the check for step {i}.\n\n")
+        parts.append("```\n# not a heading\n" + "echo ok\n" * 20 + "```\n\n")
+    return "".join(parts)
+
+
+def test_split_sections_cuts_at_headings_outside_code():
+    text = _runbook(20)
+    sections = split_sections(text, 500)
+    assert len(sections) > 1
+    assert sections[0][0] == 0 and sections[-1][1] == len(text)
+    assert all(a[1] == b[0] for a, b in zip(sections, sections[1:]))
+    for start, _ in sections[1:]:
+        assert text[start:].startswith("## Step")
+
+    assert split_sections("short", 500) == [(0, 5)]
+    assert split_sections("", 500) == [(0, 0)]
+
+
+def test_split_sections_cuts_long_runs_anywhere():
+    text = "line\n" * 1000
+    sections = split_sections(text, 100)
+    assert max(end - start for start, end in sections) <= 205
+
+
+def test_body_is_deferred(app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        db.session.add(Note(title="T", body="B", created_by_id=user.id, updated_by_id=user.id))
+        db.session.commit()
+        db.session.expunge_all()
+
+        note = Note.query.first()
+        assert "body" in sa.inspect(note).unloaded
+        assert note.body == "B"
+
+
+def test_long_notes_render_progressively(app, logged_in_client):
+    app.config.update(NOTE_PROGRESSIVE_CHARS=2000, NOTE_SECTION_CHARS=500, NOTE_FIRST_SECTIONS=1)
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = Note(
+            title="Runbook", body=_runbook(20), created_by_id=user.id, updated_by_id=user.id
+        )
+        db.session.add(note)
+        db.session.commit()
+        note_id = note.id
+
+    page = logged_in_client.get(f"/notes/{note_id}").get_data(as_text=True)
+    assert "Step 0" in page
+    assert "Step 19" not in page
+    assert "sections.js" in page
+    urls = [url.replace("&amp;", "&") for url in re.findall(r'data-section-src="([^"]+)"', page)]
+    assert urls
+
+    rest = "".join(logged_in_client.get(url).get_data(as_text=True) for url in urls)
+    assert "Step 19" in rest
+    # Code blocks are never cut, so none leaks out as a heading.
+    assert "<h1>not a heading</h1>" not in rest
+
+    logged_in_client.post(
+        f"/notes/{note_id}/edit",
+        data={"title": "Runbook", "body": "Rewritten", "tags": "", "version": "1"},
+    )
+    assert logged_in_client.get(urls[0]).status_code == 409
+
+
+def test_view_reads_only_the_first_sections(app, logged_in_client):
+    app.config.update(NOTE_PROGRESSIVE_CHARS=2000, NOTE_SECTION_CHARS=500, NOTE_FIRST_SECTIONS=1)
+    body = _runbook(20)
+    logged_in_client.post("/notes/new", data={"title": "Runbook", "body": body, "tags": ""})
+    with app.app_context():
+        note = Note.query.filter_by(title="Runbook").one()
+        note_id = note.id
+        stored = note.note_metadata["sections"]
+        assert [tuple(s) for s in stored] == split_sections(body, 500)
+
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        sa.event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            page = logged_in_client.get(f"/notes/{note_id}").get_data(as_text=True)
+        finally:
+            sa.event.remove(db.engine, "before_cursor_execute", record)
+    assert "Step 0" in page and "Step 19" not in page
+    assert not [s for s in statements if re.search(r"notes\.body AS", s)]
+    assert any("substr(notes.body" in s for s in statements)
+
+
+def test_short_notes_render_whole(app, logged_in_client):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        note = Note(title="Short", body=_runbook(3), created_by_id=user.id, updated_by_id=user.id)
+        db.session.add(note)
+        db.session.commit()
+        note_id = note.id
+
+    page = logged_in_client.get(f"/notes/{note_id}").get_data(as_text=True)
+    assert "Step 2" in page
+    assert "data-section-src" not in page
+    assert "sections.js" not in page
@@ -0,0 +1,87 @@
+# file: tests/test_similarity.py
+from app import similarity
+from app.extensions import db
+from app.models import Note, NoteSimilarity
+from app.utils import minhash
+
+VPN = "vpn client disconnects after sleep reconnect tunnel gateway certificate"
+VPN_2 = "vpn client disconnects after sleep reinstall tunnel driver gateway"
+VPN_3 = "vpn tunnel gateway certificate expired renew client profile"
+PRINTER = "printer queue stuck spooler service restart driver tray"
+
+
+def _create(client, title, body, tags=""):
+    client.post("/notes/new", data={"title": title, "body": body, "tags": tags})
+    return Note.query.filter_by(title=title).one().id
+
+
+def _related_titles(note_id):
+    return [row.title for row in similarity.related_notes(note_id, 10)]
+
+
+def test_minhash_estimates_jaccard():
+    left = {f"term{i}" for i in range(100)}
+    right = {f"term{i}" for i in range(50, 150)}
+    estimate = minhash.similarity(minhash.signature(left), minhash.signature(right))
+    assert abs(estimate - 1 / 3) < 0.15
+    assert minhash.similarity(minhash.signature(left), minhash.signature(left)) == 1.0
+    assert minhash.signature(set()) is None
+
+
+def test_saving_notes_links_related_notes(app, logged_in_client):
+    with app.app_context():
+        vpn_id = _create(logged_in_client, "VPN drops", VPN, "vpn")
+        _create(logged_in_client, "VPN after sleep", VPN_2, "vpn")
+        printer_id = _create(logged_in_client, "Printer stuck", PRINTER, "printing")
+
+        assert _related_titles(vpn_id) == ["VPN after sleep"]
+        assert _related_titles(printer_id) == []
+
+    page = logged_in_client.get(f"/notes/{vpn_id}").get_data(as_text=True)
+    assert "Related notes" in page
+    assert "VPN after sleep" in page
+    assert "Printer stuck" not in page
+
+
+def test_lists_are_trimmed_to_k(app, logged_in_client):
+    app.config["RELATED_NOTES_K"] = 2
+    with app.app_context():
+        ids = [
+            _create(logged_in_client, f"VPN {i}", f"{VPN} extra{i}", "vpn")
+            for i in range(5)
+        ]
+        for note_id in ids:
+            assert NoteSimilarity.query.filter_by(note_id=note_id).count() == 2
+
+
+def test_archived_notes_drop_out(app, logged_in_client):
+    with app.app_context():
+        vpn_id = _create(logged_in_client, "VPN drops", VPN, "vpn")
+        other_id = _create(logged_in_client, "VPN after sleep", VPN_2, "vpn")
+
+    logged_in_client.post(f"/notes/{other_id}/archive")
+    with app.app_context():
+        assert _related_titles(vpn_id) == []
+        assert NoteSimilarity.query.filter_by(note_id=other_id).count() == 0
+
+    logged_in_client.post(f"/notes/{other_id}/archive")
+    with app.app_context():
+        assert _related_titles(vpn_id) == ["VPN after sleep"]
+
+
+def test_rebuild_matches_incremental(app, logged_in_client):
+    with app.app_context():
+        for title, body in [("a", VPN), ("b", VPN_2), ("c", VPN_3), ("d", PRINTER)]:
+            _create(logged_in_client, title, body, "vpn" if body != PRINTER else "")
+
+        def links():
+            return {
+                (row.note_id, row.related_id, round(row.score, 6))
+                for row in NoteSimilarity.query.all()
+            }
+
+        incremental = links()
+        assert incremental
+        assert similarity.rebuild(batch_size=2) == (4, len(incremental))
+        db.session.expire_all()
+        assert links() == incremental
@@ -0,0 +1,59 @@
+# file: tests/test_startup.py
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Generous enough for a cold CI runner; lower it locally to catch regressions early.
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "1500"))
+
+# Loaded on first use, never at startup.
+LAZY_MODULES = ("markdown", "bleach", "markdownify")
+
+SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({"elapsed_ms": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure_startup(tmp_path):
+    env = dict(os.environ, LOG_FILE=str(tmp_path / "startup.log"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCRIPT],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=env,
+        check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, timings = line.split(":", 1)
+        _self_us, cumulative_us, name = (part.strip() for part in timings.split("|"))
+        import_times[name] = int(cumulative_us)
+    return report, import_times
+
+
+def test_heavy_modules_are_not_loaded_at_startup(tmp_path):
+    report, _ = measure_startup(tmp_path)
+
+    loaded = [name for name in report["modules"] if name.split(".")[0] in LAZY_MODULES]
+    assert loaded == []
+
+
+def test_startup_within_budget(tmp_path):
+    report, import_times = measure_startup(tmp_path)
+
+    assert import_times["app"] / 1000 < STARTUP_BUDGET_MS
+    assert report["elapsed_ms"] < STARTUP_BUDGET_MS
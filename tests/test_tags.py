@@ -0,0 +1,98 @@
+# file: tests/test_tags.py
+from app.extensions import db
+from app.models import Note, Tag, User, note_tags
+
+
+def _tagged_notes(user_id, spec):
+    """Create one note per ``(title, [tag names])`` pair."""
+    notes = []
+    for title, names in spec:
+        note = Note(title=title, body="Body", created_by_id=user_id, updated_by_id=user_id)
+        for name in names:
+            note.tags.append(Tag.get_or_create(name))
+            db.session.flush()
+        db.session.add(note)
+        db.session.flush()
+        note.sync_tag_ids()
+        notes.append(note)
+    db.session.commit()
+    return notes
+
+
+def _tags_of(title):
+    note = Note.query.filter_by(title=title).first()
+    return sorted(tag.name for tag in note.tags), note
+
+
+def test_rename_onto_existing_tag_merges(logged_in_client, app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        _tagged_notes(user.id, [("one", ["k8s"]), ("two", ["k8s", "kubernetes"])])
+        source = Tag.query.filter_by(name="k8s").first()
+
+        response = logged_in_client.post(
+            f"/tags/{source.id}/edit", data={"name": "kubernetes"}
+        )
+        assert response.status_code == 302
+        assert Tag.query.filter_by(name="k8s").first() is not None
+
+        response = logged_in_client.post(
+            f"/tags/{source.id}/edit", data={"name": "kubernetes", "merge": "1"}
+        )
+        assert response.status_code == 302
+        db.session.expire_all()
+
+        assert Tag.query.filter_by(name="k8s").first() is None
+        target = Tag.query.filter_by(name="kubernetes").first()
+        for title in ("one", "two"):
+            names, note = _tags_of(title)
+            assert names == ["kubernetes"]
+            assert note.tag_ids == [target.id]
+        assert db.session.query(note_tags).count() == 2
+
+
+def test_bulk_tag_applies_to_filtered_notes(logged_in_client, app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        notes = _tagged_notes(
+            user.id, [("a", ["vpn"]), ("b", ["vpn", "urgent"]), ("c", ["dns"])]
+        )
+        before = {note.title: note.updated_at for note in notes}
+
+        response = logged_in_client.post(
+            "/notes/bulk-tag?tag=vpn", data={"action": "add", "tag": "urgent"}
+        )
+        assert response.status_code == 302
+        assert "tag=vpn" in response.headers["Location"]
+        db.session.expire_all()
+
+        assert _tags_of("a")[0] == ["urgent", "vpn"]
+        assert _tags_of("b")[0] == ["urgent", "vpn"]
+        assert _tags_of("c")[0] == ["dns"]
+        # Only the note that actually changed is touched.
+        assert _tags_of("a")[1].updated_at > before["a"]
+        assert _tags_of("b")[1].updated_at == before["b"]
+
+        response = logged_in_client.post(
+            "/notes/bulk-tag?tag=urgent", data={"action": "remove", "tag": "vpn"}
+        )
+        assert response.status_code == 302
+        db.session.expire_all()
+
+        names, note = _tags_of("a")
+        assert names == ["urgent"]
+        assert note.tag_ids == [Tag.query.filter_by(name="urgent").first().id]
+        assert _tags_of("c")[0] == ["dns"]
+
+
+def test_merge_tags_cli(app):
+    with app.app_context():
+        user = User.query.filter_by(email="user@test.com").first()
+        _tagged_notes(user.id, [("one", ["db"]), ("two", ["postgres"])])
+
+        result = app.test_cli_runner().invoke(args=["merge-tags", "db", "postgres"])
+        assert result.exit_code == 0, result.output
+        assert "2 notes" not in result.output
+        assert "1 notes" in result.output
+        db.session.expire_all()
+        assert _tags_of("one")[0] == ["postgres"]
@@ -1,7 +1,9 @@
 # file: wsgi.py
+import os
+
 from app import create_app
 
-app = create_app()
+app = create_app(os.environ.get("FLASK_CONFIG", "production"))
 
 if __name__ == "__main__":
     app.run()